@@ -1,6 +1,10 @@
 from .chunking_embedding_agent import ChunkingEmbeddingAgent
+from .context_assembler import ContextAssembler
 from .crawler_agent import CrawlerAgent
+from .llm_client import AsyncOllamaClient
+from .mmr_reranker import MMRReranker
 from .parser_agent import ParserAgent
 from .query_agent import QueryAgent
+from .query_agent import LocalQueryExpander
 from .rag_agent import RAGAgent
 from .validation_qa_agent import ValidationQAAgent
\ No newline at end of file
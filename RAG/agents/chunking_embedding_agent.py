@@ -1,59 +1,136 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
+import asyncio
 import hashlib
+import itertools
+import logging
+import time
 import ollama
 
+from .llm_client import AsyncOllamaClient
+from .text_chunker import TextChunker
+
+logger = logging.getLogger(__name__)
+
 class ChunkingEmbeddingAgent:
     """
     The Chunking/Embedding Agent takes parsed text, breaks it into smaller,
     manageable chunks, and then generates vector embeddings for each chunk.
     These embeddings are numerical representations of the text's semantic meaning.
+
+    Chunks hold at most `chunk_size` tokens, follow the heading and paragraph
+    boundaries found by `ParserAgent`, and overlap by up to `chunk_overlap` tokens.
+
+    Chunks are embedded in batches of `embedding_batch_size` through Ollama's batch
+    embed API on an `AsyncOllamaClient`, which caps the requests in flight
+    (`max_concurrent_requests` when the agent creates its own client).
+    When an `EmbeddingCache` is supplied, only texts missing from the cache are sent
+    to the model.
+
+    When the model cannot be reached, queries get a crude placeholder embedding so a
+    search can still run, but chunks get no embedding at all (None): a placeholder
+    stored in the vector database would fix its dimension to the placeholder's.
     """
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, 
-                 embedding_model: str = "llama3.2"):
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 48,
+                 embedding_model: str = "llama3.2", embedding_batch_size: int = 16,
+                 max_concurrent_requests: int = 4, ollama_host: Optional[str] = None,
+                 cache: Optional[Any] = None, llm_client: Optional[AsyncOllamaClient] = None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.chunker = TextChunker(max_tokens=chunk_size, overlap_tokens=chunk_overlap)
         self.embedding_model = embedding_model
+        self.embedding_batch_size = max(1, embedding_batch_size)
+        self.max_concurrent_requests = max(1, max_concurrent_requests)
+        self.client = ollama.Client(host=ollama_host)
+        self.llm_client = llm_client or AsyncOllamaClient(host=ollama_host, max_concurrent_requests=self.max_concurrent_requests)
+        self.cache = cache
+        self.last_run_stats: Dict[str, float] = {}
 
-    def _chunk_text(self, text: str) -> List[str]:
+    def _chunk_text(self, text: str, blocks: Optional[Sequence[Tuple[str, str]]] = None) -> List[str]:
         """
-        Breaks down a long text into smaller chunks with optional overlap.
-        This is a simple character-based chunking. More advanced methods
-        might consider sentences, paragraphs, or token limits.
+        Breaks down a long text into chunks of at most `chunk_size` tokens, following
+        the document's headings and paragraphs (see `TextChunker`).
 
         Args:
             text (str): The input text to be chunked.
+            blocks (Optional[Sequence[Tuple[str, str]]]): The (tag, text) blocks from `ParserAgent`.
 
         Returns:
-            List[str]: A list of text chunks.
+            List[str]: A list of unique text chunks.
         """
-        chunks = []
-        if not text:
-            return chunks
-
-        start = 0
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start += (self.chunk_size - self.chunk_overlap)
-            if self.chunk_overlap > 0 and start >= len(text):
-                break
+        return [chunk for chunk, _ in self.chunker.chunks(text, blocks)]
 
-        if start - (self.chunk_size - self.chunk_overlap) < len(text) and text[start-(self.chunk_size - self.chunk_overlap):] not in chunks:
-             if len(text) > start - (self.chunk_size - self.chunk_overlap):
-                chunks.append(text[start-(self.chunk_size - self.chunk_overlap):])
+    def _fallback_embedding(self, text_chunk: str) -> List[float]:
+        """A crude character-based embedding used when the embedding model is unreachable."""
+        return [float(ord(c)) / 100 for c in text_chunk[:100]] + [0.0] * max(0, 100 - len(text_chunk))
 
-        seen_chunks = set()
-        unique_chunks = []
-        for chunk in chunks:
-            if chunk not in seen_chunks:
-                unique_chunks.append(chunk)
-                seen_chunks.add(chunk)
-        return unique_chunks
+    def _valid_embeddings(self, response: Any, text_chunks: List[str]) -> Optional[List[List[float]]]:
+        embeddings = [list(embedding) for embedding in response['embeddings']]
+        return embeddings if len(embeddings) == len(text_chunks) else None
+
+    async def _generate_embeddings_batch(self, text_chunks: List[str],
+                                         fallback: bool = False) -> List[Optional[List[float]]]:
+        """
+        Generates embeddings for a batch of text chunks with a single Ollama request.
+        Model embeddings are written to the cache; fallback embeddings are not.
+
+        Args:
+            text_chunks (List[str]): The text chunks to embed.
+            fallback (bool): Whether to return placeholder embeddings if the model fails,
+                             rather than None.
+
+        Returns:
+            List[Optional[List[float]]]: One embedding per chunk, in the same order.
+        """
+        try:
+            response = await self.llm_client.embed(model=self.embedding_model, input=text_chunks)
+            embeddings = self._valid_embeddings(response, text_chunks)
+            if embeddings is not None:
+                if self.cache is not None:
+                    await asyncio.to_thread(self.cache.put_many, self.embedding_model, text_chunks, embeddings)
+                return embeddings
+            logger.warning("Embedding model %s returned %d embeddings for %d texts",
+                           self.embedding_model, len(response['embeddings']), len(text_chunks))
+        except Exception:
+            logger.exception("Embedding a batch of %d texts with %s failed", len(text_chunks), self.embedding_model)
+        if not fallback:
+            return [None] * len(text_chunks)
+        return [self._fallback_embedding(chunk) for chunk in text_chunks]
+
+    async def _embed_uncached(self, text_chunks: List[str], fallback: bool = False) -> List[Optional[List[float]]]:
+        """Embeds chunks in concurrent batches, preserving order; the client bounds the requests in flight."""
+        batches = [text_chunks[i:i + self.embedding_batch_size]
+                   for i in range(0, len(text_chunks), self.embedding_batch_size)]
+        batch_results = await asyncio.gather(*(self._generate_embeddings_batch(batch, fallback) for batch in batches))
+        return [embedding for batch_embeddings in batch_results for embedding in batch_embeddings]
+
+    async def _embed_with_cache(self, text_chunks: List[str],
+                                fallback: bool = False) -> Tuple[List[Optional[List[float]]], int]:
+        """
+        Embeds chunks, serving what it can from the cache and embedding each distinct
+        missing text once.
+
+        Returns:
+            Tuple[List[Optional[List[float]]], int]: The embeddings, in input order (None
+                                                     where the model failed, unless
+                                                     `fallback`), and the number of cache hits.
+        """
+        if self.cache is None:
+            return await self._embed_uncached(text_chunks, fallback), 0
+
+        embeddings = await asyncio.to_thread(self.cache.get_many, self.embedding_model, text_chunks)
+        missing_texts = list(dict.fromkeys(text for text, embedding in zip(text_chunks, embeddings) if embedding is None))
+        cache_hits = len(text_chunks) - sum(1 for embedding in embeddings if embedding is None)
+        if missing_texts:
+            fresh = dict(zip(missing_texts, await self._embed_uncached(missing_texts, fallback)))
+            embeddings = [embedding if embedding is not None else fresh[text]
+                          for text, embedding in zip(text_chunks, embeddings)]
+        return embeddings, cache_hits
 
     def _generate_embedding(self, text_chunk: str) -> List[float]:
         """
         Generates a vector embedding for a given text chunk using Ollama.
+        This is the blocking variant for synchronous callers; async code should
+        await `embed_query` instead.
 
         Args:
             text_chunk (str): The text chunk to embed.
@@ -61,42 +138,157 @@ class ChunkingEmbeddingAgent:
         Returns:
             List[float]: A list of floats representing the vector embedding.
         """
+        if self.cache is not None:
+            cached = self.cache.get(self.embedding_model, text_chunk)
+            if cached is not None:
+                return cached
         try:
-            response = ollama.embeddings(model=self.embedding_model, prompt=text_chunk)
-            return response['embedding']
-        except Exception as e:
-            return [float(ord(c)) / 100 for c in text_chunk[:100]] + [0.0] * max(0, 100 - len(text_chunk))
+            response = self.client.embed(model=self.embedding_model, input=[text_chunk])
+            embeddings = self._valid_embeddings(response, [text_chunk])
+            if embeddings is not None:
+                if self.cache is not None:
+                    self.cache.put(self.embedding_model, text_chunk, embeddings[0])
+                return embeddings[0]
+            logger.warning("Embedding model %s returned no embedding for a text", self.embedding_model)
+        except Exception:
+            logger.exception("Embedding a text with %s failed; using a placeholder embedding", self.embedding_model)
+        return self._fallback_embedding(text_chunk)
 
-    def process(self, parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def embed_query(self, query_text: str) -> List[float]:
         """
-        Processes parsed document data: chunks the text and generates embeddings.
+        Embeds a search query without blocking the event loop.
 
         Args:
-            parsed_data (Dict[str, Any]): A dictionary containing 'text' and 'metadata'.
+            query_text (str): The query to embed.
 
         Returns:
-            List[Dict[str, Any]]: A list of dictionaries, each containing 'chunk_id',
-                                  'text', 'embedding', and 'metadata'.
+            List[float]: The query embedding (a placeholder if the model is unreachable).
+        """
+        embeddings, _ = await self._embed_with_cache([query_text], fallback=True)
+        return embeddings[0]
+
+    async def embed_chunks(self, text_chunks: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds chunks in batches with a bounded number of concurrent requests.
+        The output order matches the input order. Throughput of the run is
+        recorded in `last_run_stats`.
+
+        Args:
+            text_chunks (List[str]): The text chunks to embed.
+
+        Returns:
+            List[Optional[List[float]]]: One embedding per chunk, in the same order; None
+                                         for chunks the model could not embed.
+        """
+        start = time.perf_counter()
+        embeddings, cache_hits = await self._embed_with_cache(text_chunks)
+        elapsed = time.perf_counter() - start
+        self.last_run_stats = {
+            "chunks": len(text_chunks),
+            "cache_hits": cache_hits,
+            "seconds": elapsed,
+            "chunks_per_second": len(text_chunks) / elapsed if elapsed > 0 else 0.0,
+        }
+        return embeddings
+
+    def iter_chunks(self, parsed_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Chunks parsed document data without embedding it, yielding each chunk as soon
+        as it is complete. Chunk IDs are derived from the document's 'source_url'
+        metadata (if any), the chunk text and how many identical chunks precede it, so
+        an unchanged chunk keeps its ID when the document is re-ingested, even after
+        text was inserted or removed before it. A chunk's metadata includes the
+        'heading' of its section, when there is one.
+
+        Args:
+            parsed_data (Dict[str, Any]): A dictionary containing 'text' and 'metadata',
+                                          and optionally the parser's 'blocks'.
+
+        Yields:
+            Dict[str, Any]: Chunks with 'chunk_id', 'text' and 'metadata'.
         """
         text = parsed_data.get("text", "")
         metadata = parsed_data.get("metadata", {})
-        chunks_with_embeddings = []
-
         if not text:
-            return chunks_with_embeddings
+            return
 
-        text_chunks = self._chunk_text(text)
+        source_url = metadata.get("source_url", "")
+        occurrences: Dict[str, int] = {}
+        for i, (chunk, heading) in enumerate(self.chunker.chunks(text, parsed_data.get("blocks"))):
+            occurrence = occurrences.get(chunk, 0)
+            occurrences[chunk] = occurrence + 1
+            chunk_id = hashlib.md5((source_url + chunk + str(occurrence)).encode('utf-8')).hexdigest()
+            chunk_metadata = {**metadata, "chunk_index": i}
+            if heading:
+                chunk_metadata["heading"] = heading
+            yield {"chunk_id": chunk_id, "text": chunk, "metadata": chunk_metadata}
 
-        for i, chunk in enumerate(text_chunks):
-            embedding = self._generate_embedding(chunk)
-            chunk_id = hashlib.md5((chunk + str(i)).encode('utf-8')).hexdigest()
+    def prepare_chunks(self, parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Chunks parsed document data without embedding it (see `iter_chunks`).
 
-            chunk_info = {
-                "chunk_id": chunk_id,
-                "text": chunk,
-                "embedding": embedding,
-                "metadata": {**metadata, "chunk_index": i}
-            }
-            chunks_with_embeddings.append(chunk_info)
+        Args:
+            parsed_data (Dict[str, Any]): A dictionary containing 'text' and 'metadata'.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries, each containing 'chunk_id',
+                                  'text' and 'metadata'.
+        """
+        return list(self.iter_chunks(parsed_data))
+
+    async def attach_embeddings(self, chunks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Embeds chunks produced by `prepare_chunks` or `iter_chunks`. When given an
+        iterator, each batch of `embedding_batch_size` chunks is sent to the model as
+        soon as it has been produced, so chunking overlaps with embedding.
 
-        return chunks_with_embeddings
\ No newline at end of file
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Chunks with 'chunk_id', 'text' and 'metadata'.
+
+        Returns:
+            List[Dict[str, Any]]: The same chunks, each with an added 'embedding' (None if
+                                  the model could not embed it; such chunks must not be stored).
+        """
+        if isinstance(chunks, list):
+            embeddings = await self.embed_chunks([chunk["text"] for chunk in chunks])
+            return [{**chunk, "embedding": embedding} for chunk, embedding in zip(chunks, embeddings)]
+
+        start = time.perf_counter()
+        batches: List[List[Dict[str, Any]]] = []
+        tasks = []
+        iterator = iter(chunks)
+        while True:
+            batch = list(itertools.islice(iterator, self.embedding_batch_size))
+            if not batch:
+                break
+            batches.append(batch)
+            tasks.append(asyncio.ensure_future(self._embed_with_cache([chunk["text"] for chunk in batch])))
+            await asyncio.sleep(0)
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        count = sum(len(batch) for batch in batches)
+        self.last_run_stats = {
+            "chunks": count,
+            "cache_hits": sum(cache_hits for _, cache_hits in results),
+            "seconds": elapsed,
+            "chunks_per_second": count / elapsed if elapsed > 0 else 0.0,
+        }
+        return [{**chunk, "embedding": embedding}
+                for batch, (embeddings, _) in zip(batches, results)
+                for chunk, embedding in zip(batch, embeddings)]
+
+    async def process(self, parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Processes parsed document data: chunks the text and generates embeddings.
+
+        Args:
+            parsed_data (Dict[str, Any]): A dictionary containing 'text' and 'metadata'.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries, each containing 'chunk_id',
+                                  'text', 'embedding', and 'metadata'.
+        """
+        chunks = self.prepare_chunks(parsed_data)
+        if not chunks:
+            return []
+        return await self.attach_embeddings(chunks)
@@ -0,0 +1,168 @@
+import re
+from typing import List, Dict, Any, Callable, Tuple
+
+from .text_chunker import approximate_token_count
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class ContextAssembler:
+    """
+    Fits a RAG prompt into a token budget.
+
+    The system prompt and the current query are always sent. Conversation history is a
+    sliding window: the most recent turns are kept while they fit within
+    `max_history_tokens`, and older turns are replaced by a one-line summary of the
+    questions asked in them. The rest of the budget goes to the retrieved chunks, taken
+    in the order they are given (best first, e.g. the reranker's MMR order, which is not
+    necessarily descending score); sentences already included from a higher-ranked chunk
+    (the overlap between neighbouring chunks, for example) are removed, and a chunk that
+    crosses the budget is cut at a sentence boundary, or dropped if too little of it
+    would remain. The lowest-ranked chunks are therefore the first to go.
+
+    Token counts use `approximate_token_count`.
+    """
+    def __init__(self, max_prompt_tokens: int = 3072, max_history_tokens: int = 768,
+                 max_summary_tokens: int = 96, min_chunk_tokens: int = 32):
+        """
+        Args:
+            max_prompt_tokens (int): The budget for the whole prompt.
+            max_history_tokens (int): The most tokens spent on earlier turns, summary included.
+            max_summary_tokens (int): The most tokens spent on the summary of older turns.
+            min_chunk_tokens (int): A chunk is only cut to fit if at least this many of its
+                                    tokens remain; otherwise it is dropped.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def select_history(self, turns: List[Dict[str, str]], earlier_questions: List[str],
+                       budget: int) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Picks the most recent whole turns (user + assistant messages) that fit `budget`,
+        preceded by a summary message of the questions of every turn left out.
+
+        Returns:
+            Tuple[List[Dict[str, str]], int]: The messages to send and the number of turns left out.
+        """
+        selected: List[Dict[str, str]] = []
+        used = 0
+        kept_turns = 0
+        for start in range(len(turns) - 2, -1, -2):
+            turn = turns[start:start + 2]
+            tokens = sum(approximate_token_count(message["content"]) for message in turn)
+            if used + tokens > budget:
+                break
+            selected[:0] = turn
+            used += tokens
+            kept_turns += 1
+
+        dropped_turns = len(turns) // 2 - kept_turns
+        left_out = earlier_questions + [message["content"] for message in turns[:len(turns) - 2 * kept_turns]
+                                        if message["role"] == "user"]
+        if left_out:
+            summary = self._summarize(left_out, min(self.max_summary_tokens, budget - used))
+            if summary:
+                selected.insert(0, {"role": "system", "content": summary})
+        return selected, dropped_turns + len(earlier_questions)
+
+    def _summarize(self, questions: List[str], budget: int) -> str:
+        """Lists the most recent earlier questions that fit `budget`."""
+        prefix = "Earlier in this conversation the user asked: "
+        used = approximate_token_count(prefix)
+        kept: List[str] = []
+        for question in reversed(questions):
+            tokens = approximate_token_count(question) + 1
+            if used + tokens > budget:
+                break
+            kept.insert(0, question)
+            used += tokens
+        return prefix + "; ".join(kept) if kept else ""
+
+    def select_context(self, retrieved_chunks: List[Dict[str, Any]],
+                       budget: int) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, int]]:
+        """
+        Picks, deduplicates and trims chunk text to fit `budget`, keeping the chunks' order.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[str], Dict[str, int]]: The chunks used, the text
+            sent for each of them, and counts of dropped, trimmed and duplicate content.
+        """
+        seen = set()
+        used_chunks: List[Dict[str, Any]] = []
+        texts: List[str] = []
+        stats = {"chunks_dropped": 0, "chunks_trimmed": 0, "duplicate_tokens": 0}
+        used = 0
+        for chunk in retrieved_chunks:
+            # (line number, sentence, tokens, key) of the sentences not sent already.
+            sentences: List[Tuple[int, str, int, str]] = []
+            chunk_keys = set()
+            for line_number, line in enumerate(chunk.get("text", "").split("\n")):
+                for sentence in _SENTENCE_END.split(line):
+                    key = " ".join(sentence.lower().split())
+                    if not key:
+                        continue
+                    tokens = approximate_token_count(sentence)
+                    if key in seen or key in chunk_keys:
+                        stats["duplicate_tokens"] += tokens
+                        continue
+                    chunk_keys.add(key)
+                    sentences.append((line_number, sentence.strip(), tokens, key))
+
+            kept, kept_tokens = [], 0
+            for sentence in sentences:
+                if used + kept_tokens + sentence[2] > budget:
+                    break
+                kept.append(sentence)
+                kept_tokens += sentence[2]
+            if not kept or (len(kept) < len(sentences) and kept_tokens < self.min_chunk_tokens):
+                stats["chunks_dropped"] += 1
+                continue
+            if len(kept) < len(sentences):
+                stats["chunks_trimmed"] += 1
+
+            lines: Dict[int, List[str]] = {}
+            for line_number, sentence, _, key in kept:
+                lines.setdefault(line_number, []).append(sentence)
+                seen.add(key)
+            used_chunks.append(chunk)
+            texts.append("\n".join(" ".join(line) for line in lines.values()))
+            used += kept_tokens
+        return used_chunks, texts, stats
+
+    def assemble(self, system_message: Dict[str, str], turns: List[Dict[str, str]], earlier_questions: List[str],
+                 user_message: Callable[[str], str], retrieved_chunks: List[Dict[str, Any]],
+                 full_history_tokens: int) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Builds the messages of one generation within `max_prompt_tokens`.
+
+        Args:
+            system_message (Dict[str, str]): The system prompt message.
+            turns (List[Dict[str, str]]): Earlier user/assistant messages, oldest first.
+            earlier_questions (List[str]): Questions of turns no longer kept in `turns`.
+            user_message (Callable[[str], str]): Builds the current user message from the context text.
+            retrieved_chunks (List[Dict[str, Any]]): Retrieved chunks with 'text' and 'score'.
+            full_history_tokens (int): Tokens of the whole conversation so far, for the
+                                       "saved_tokens" statistic.
+
+        Returns:
+            Tuple[List[Dict[str, str]], List[Dict[str, Any]], Dict[str, int]]: The messages,
+            the chunks included in the context, and statistics: 'prompt_tokens',
+            'saved_tokens' (versus sending the whole history and every chunk in full),
+            'history_turns_dropped', 'chunks_dropped', 'chunks_trimmed' and 'duplicate_tokens'.
+        """
+        fixed_tokens = approximate_token_count(system_message["content"]) + approximate_token_count(user_message(""))
+        remaining = max(0, self.max_prompt_tokens - fixed_tokens)
+        history, turns_dropped = self.select_history(turns, earlier_questions, min(self.max_history_tokens, remaining))
+        history_tokens = sum(approximate_token_count(message["content"]) for message in history)
+        used_chunks, texts, stats = self.select_context(retrieved_chunks, remaining - history_tokens)
+        context = "\n\n".join(texts)
+
+        prompt_tokens = fixed_tokens + history_tokens + approximate_token_count(context)
+        unbounded_tokens = (fixed_tokens + full_history_tokens +
+                            approximate_token_count("\n\n".join(chunk.get("text", "") for chunk in retrieved_chunks)))
+        stats.update({"prompt_tokens": prompt_tokens, "saved_tokens": max(0, unbounded_tokens - prompt_tokens),
+                      "history_turns_dropped": turns_dropped})
+        messages = [system_message] + history + [{"role": "user", "content": user_message(context)}]
+        return messages, used_chunks, stats
@@ -1,10 +1,325 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, AsyncIterator, Union
+from urllib.parse import urljoin, urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
 import httpx
 
+logger = logging.getLogger(__name__)
+
+class _LinkExtractor(HTMLParser):
+    """Collects the href targets of <a> tags (and an optional <base href>) from an HTML page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base: Optional[str] = None
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" or (tag == "base" and self.base is None):
+            href = dict(attrs).get("href")
+            if href:
+                if tag == "a":
+                    self.links.append(href.strip())
+                else:
+                    self.base = href.strip()
+
+
+def normalize_url(url: str) -> str:
+    """Drops the fragment and fills in an empty path so equivalent URLs deduplicate."""
+    url = urldefrag(url)[0]
+    parts = urlsplit(url)
+    if not parts.path:
+        url = parts._replace(path="/").geturl()
+    return url
+
+
+def extract_links(html: Union[str, bytes], base_url: str, encoding: Optional[str] = None) -> List[str]:
+    """Returns the absolute http(s) URLs linked from an HTML page, in document order."""
+    if isinstance(html, bytes):
+        html = html.decode(encoding or "utf-8", errors="replace")
+    extractor = _LinkExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception:
+        logger.warning("Could not parse all links of %s", base_url, exc_info=True)
+    base = urljoin(base_url, extractor.base) if extractor.base else base_url
+    links = []
+    for href in extractor.links:
+        url = normalize_url(urljoin(base, href))
+        if urlsplit(url).scheme in ("http", "https"):
+            links.append(url)
+    return links
+
+
 class CrawlerAgent:
     """
     The Crawler Agent is responsible for fetching raw content from various sources,
     such as web pages, files, or APIs.
+
+    All fetches share one pooled `httpx.AsyncClient`, so connections to a host are kept
+    alive and reused across requests. Call `aclose()` when the agent is no longer needed.
+
+    `crawl_many` fetches several URLs concurrently and can follow same-site links
+    (see its docstring for the politeness rules it applies). The robots.txt of the
+    `max_robots` most recently crawled origins is cached for `robots_ttl_s` seconds.
     """
+    USER_AGENT = "rag-sys-crawler/1.0"
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None,
+                 max_connections: int = 20, timeout: float = 10.0,
+                 max_response_bytes: int = 10 * 1024 * 1024,
+                 max_robots: int = 256, robots_ttl_s: float = 3600.0):
+        """
+        Args:
+            http_client (Optional[httpx.AsyncClient]): A client to share; if omitted, one is
+                                                       created on first use and owned by the agent.
+            max_connections (int): Connection pool size of the owned client.
+            timeout (float): Request timeout in seconds.
+            max_response_bytes (int): Responses larger than this are abandoned and treated as failed.
+            max_robots (int): How many origins' robots.txt are cached.
+            robots_ttl_s (float): How long a cached robots.txt is used before it is fetched again.
+        """
+        self._http_client = http_client
+        self._owns_client = http_client is None
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_response_bytes = max_response_bytes
+        self.max_robots = max(1, max_robots)
+        self.robots_ttl_s = robots_ttl_s
+        # Origin -> (fetch time, parsed robots.txt), least recently used first.
+        self._robots: "OrderedDict[str, Tuple[float, RobotFileParser]]" = OrderedDict()
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={"User-Agent": self.USER_AGENT},
+            )
+        return self._http_client
+
+    async def aclose(self):
+        """Closes the owned HTTP client and its pooled connections."""
+        if self._owns_client and self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def fetch(self, source_url: str, etag: Optional[str] = None,
+                    last_modified: Optional[str] = None, decode: bool = True) -> Dict[str, Any]:
+        """
+        Fetches a URL with a conditional GET. When `etag` or `last_modified` from a
+        previous fetch are given and the server reports the page unchanged, the result
+        has status_code 304 and no content.
+
+        Args:
+            source_url (str): The URL or path to the document source.
+            etag (Optional[str]): The ETag header from the previous fetch.
+            last_modified (Optional[str]): The Last-Modified header from the previous fetch.
+            decode (bool): Whether to decode the body to str; if False, 'content' holds the
+                           raw bytes and 'encoding' the charset from the Content-Type header,
+                           so the parser can decode it lazily.
+
+        Returns:
+            Dict[str, Any]: A dictionary with 'status_code', 'content', 'content_type',
+                            'encoding', 'etag', 'last_modified' and 'error'. If the fetch
+                            failed or the response exceeded `max_response_bytes`, 'error'
+                            says why, 'content' is empty and 'status_code' is the HTTP
+                            error status (0 when there was no response).
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        result = {"status_code": 0, "content": "" if decode else b"", "content_type": "", "encoding": None,
+                  "etag": None, "last_modified": None, "error": None}
+        try:
+            async with self.http_client.stream("GET", source_url, headers=headers) as response:
+                if response.status_code != 304:
+                    response.raise_for_status()
+                    body = await self._read_capped(response)
+                    if body is None:
+                        logger.warning("Response from %s exceeds %d bytes; skipped", source_url, self.max_response_bytes)
+                        result["error"] = f"response exceeds {self.max_response_bytes} bytes"
+                        return result
+                    result["encoding"] = response.charset_encoding
+                    result["content"] = body.decode(response.charset_encoding or "utf-8", errors="replace") if decode else body
+                result["status_code"] = response.status_code
+                result["content_type"] = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                result["etag"] = response.headers.get("ETag", etag)
+                result["last_modified"] = response.headers.get("Last-Modified", last_modified)
+        except httpx.HTTPStatusError as e:
+            logger.warning("Fetching %s failed: HTTP %d", source_url, e.response.status_code)
+            result["status_code"] = e.response.status_code
+            result["error"] = f"HTTP {e.response.status_code}"
+        except httpx.RequestError as e:
+            logger.warning("Fetching %s failed: %r", source_url, e)
+            result["error"] = repr(e)
+        except Exception as e:
+            logger.exception("Fetching %s failed", source_url)
+            result["error"] = repr(e)
+        return result
+
+    async def _read_capped(self, response: httpx.Response) -> Optional[bytes]:
+        """Reads a streamed body, or returns None once it exceeds `max_response_bytes`."""
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_response_bytes:
+            return None
+        body = bytearray()
+        async for part in response.aiter_bytes():
+            body.extend(part)
+            if len(body) > self.max_response_bytes:
+                return None
+        return bytes(body)
+
+    async def _robots_for(self, url: str) -> RobotFileParser:
+        """
+        Fetches and caches robots.txt for the URL's origin, following the urllib.robotparser
+        rules. A robots.txt larger than `max_response_bytes` is treated as missing.
+        """
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        cached = self._robots.get(origin)
+        if cached is not None and time.monotonic() - cached[0] < self.robots_ttl_s:
+            self._robots.move_to_end(origin)
+            return cached[1]
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            async with self.http_client.stream("GET", origin + "/robots.txt") as response:
+                if response.status_code in (401, 403):
+                    parser.disallow_all = True
+                elif response.status_code >= 400:
+                    parser.allow_all = True
+                else:
+                    body = await self._read_capped(response)
+                    if body is None:
+                        parser.allow_all = True
+                    else:
+                        parser.parse(body.decode(response.charset_encoding or "utf-8", errors="replace").splitlines())
+        except Exception as e:
+            logger.warning("Could not fetch robots.txt of %s: %r", origin, e)
+            parser.allow_all = True
+        self._robots[origin] = (time.monotonic(), parser)
+        self._robots.move_to_end(origin)
+        while len(self._robots) > self.max_robots:
+            self._robots.popitem(last=False)
+        return parser
+
+    async def crawl_many(self, seed_urls: List[str], max_depth: int = 0, max_pages: int = 50,
+                         per_host_concurrency: int = 2, max_concurrency: int = 8,
+                         politeness_delay_s: float = 0.0, respect_robots: bool = True, decode: bool = True,
+                         validators: Optional[Callable[[str], Tuple[Optional[str], Optional[str]]]] = None
+                         ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Fetches several URLs concurrently and, when `max_depth` > 0, follows links to
+        pages on the same host as the seed they were found from. Pages are yielded as
+        soon as each one arrives, so callers can start processing before the crawl ends.
+
+        Every URL is fetched at most once (after dropping fragments), and no more than
+        `max_pages` URLs are fetched in total. At most `per_host_concurrency` requests
+        run against one host at a time, and requests to a host start at least
+        `politeness_delay_s` apart (or the host's robots.txt Crawl-delay, if larger).
+        Followed links are skipped when the host's robots.txt disallows them; the seed
+        URLs themselves were requested explicitly and are always fetched.
+
+        Args:
+            seed_urls (List[str]): The URLs to start from.
+            max_depth (int): How many links away from a seed to follow (0 fetches only the seeds).
+            max_pages (int): The page budget of the whole crawl.
+            per_host_concurrency (int): Concurrent requests allowed per host.
+            max_concurrency (int): Concurrent requests allowed overall.
+            politeness_delay_s (float): Minimum delay between request starts to one host.
+            respect_robots (bool): Whether to obey robots.txt for followed links.
+            decode (bool): Passed to `fetch`; False yields raw bytes content.
+            validators (Optional[Callable]): Returns the (etag, last_modified) of a previous
+                                             fetch of a URL, for conditional GETs. Pages at
+                                             the depth limit are fetched conditionally; pages
+                                             whose links are followed are fetched in full.
+
+        Yields:
+            Dict[str, Any]: The `fetch` result of each page, plus its 'url' and 'depth'.
+        """
+        seen: Set[str] = set()
+        frontier: asyncio.Queue = asyncio.Queue()
+        pages: asyncio.Queue = asyncio.Queue()
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        host_next_start: Dict[str, float] = {}
+
+        def schedule(url: str, depth: int, site: str):
+            if url in seen or len(seen) >= max_pages:
+                return
+            seen.add(url)
+            frontier.put_nowait((url, depth, site))
+
+        for seed in seed_urls:
+            seed = normalize_url(seed)
+            schedule(seed, 0, urlsplit(seed).netloc)
+
+        async def wait_for_turn(host: str, delay: float):
+            # Reserve the next start slot for this host synchronously, then sleep until it.
+            now = time.monotonic()
+            start = max(now, host_next_start.get(host, now))
+            host_next_start[host] = start + delay
+            if start > now:
+                await asyncio.sleep(start - now)
+
+        async def visit(url: str, depth: int, site: str) -> Optional[Dict[str, Any]]:
+            host = urlsplit(url).netloc
+            delay = politeness_delay_s
+            if respect_robots and depth > 0:
+                robots = await self._robots_for(url)
+                if not robots.can_fetch(self.USER_AGENT, url):
+                    return None
+                delay = max(delay, float(robots.crawl_delay(self.USER_AGENT) or 0))
+            async with host_limits.setdefault(host, asyncio.Semaphore(per_host_concurrency)):
+                await wait_for_turn(host, delay)
+                # A page whose links will be followed is fetched in full: a 304 would hide them.
+                expand = depth < max_depth
+                etag, last_modified = validators(url) if validators and not expand else (None, None)
+                page = await self.fetch(url, etag=etag, last_modified=last_modified, decode=decode)
+            if expand and page["content"] and page["content_type"] in ("", "text/html", "application/xhtml+xml"):
+                for link in extract_links(page["content"], url, page["encoding"]):
+                    if urlsplit(link).netloc == site:
+                        schedule(link, depth + 1, site)
+            return {**page, "url": url, "depth": depth}
+
+        async def worker():
+            while True:
+                url, depth, site = await frontier.get()
+                try:
+                    page = await visit(url, depth, site)
+                    if page is not None:
+                        pages.put_nowait(page)
+                except Exception:
+                    logger.exception("Crawling %s failed", url)
+                finally:
+                    frontier.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, max_concurrency))]
+        crawl_done = asyncio.create_task(frontier.join())
+        try:
+            while True:
+                next_page = asyncio.create_task(pages.get())
+                await asyncio.wait({next_page, crawl_done}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_page.done():
+                    next_page.cancel()
+                    break
+                yield next_page.result()
+            while not pages.empty():
+                yield pages.get_nowait()
+        finally:
+            crawl_done.cancel()
+            for task in workers:
+                task.cancel()
+
     async def crawl(self, source_url: str) -> str:
         """
         Fetches the raw content from a given URL.
@@ -17,13 +332,5 @@ class CrawlerAgent:
         Returns:
             str: The raw content as a string, or an empty string if failed.
         """
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(source_url, timeout=10)
-                response.raise_for_status()
-                content = response.text
-                return content
-        except httpx.RequestError as e:
-            return ""
-        except Exception as e:
-            return ""
\ No newline at end of file
+        result = await self.fetch(source_url)
+        return result["content"]
@@ -0,0 +1,111 @@
+import re
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_ABSTENTION = re.compile(
+    r"\b(?:do not|don't|does not|doesn't|could not|couldn't|cannot|can't|unable to)\b[^.]{0,40}?"
+    r"\b(?:enough information|information|answer|find)\b|\bnot (?:mentioned|covered|provided) in the (?:provided )?context\b",
+    re.IGNORECASE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have how i if in into is it its "
+    "may might more most no not of on or our so such than that the their them then there these they this "
+    "those to was were what when where which while who why will with would you your".split()
+)
+
+
+def _stem(token: str) -> str:
+    """A crude stem (the first six characters) so that inflections and derivations still match."""
+    return token[:6]
+
+
+def _terms(text: str) -> List[str]:
+    return [_stem(token) for token in _WORD.findall(text.lower())]
+
+
+def _hashes(terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes of a term sequence's content unigrams and of all its bigrams."""
+    unigrams = np.fromiter((hash(term) for term in terms if term not in STOPWORDS), dtype=np.int64)
+    bigrams = np.fromiter((hash((first, second)) for first, second in zip(terms, terms[1:])), dtype=np.int64)
+    return unigrams, bigrams
+
+
+class FaithfulnessScorer:
+    """
+    A fast, model-free estimate of how well an answer is supported by its context.
+
+    Every answer sentence is scored by the fraction of its content words and of its word
+    bigrams that also occur in the retrieved chunks (after crude stemming), and the
+    answer's faithfulness is the mean sentence score weighted by sentence length. The
+    membership tests for all sentences run as one vectorized `np.isin` per n-gram order.
+    Relevance is the fraction of the query's content words found in the answer, and
+    context coverage the fraction found in the chunks.
+
+    Answers that decline to answer ("I don't have enough information...") are
+    recognized separately: the answer then makes no claims to check, so the question
+    is only whether the context really lacked the answer.
+    """
+    def __init__(self, bigram_weight: float = 0.5, min_sentence_terms: int = 3):
+        """
+        Args:
+            bigram_weight (float): Weight of bigram support in a sentence's score; the
+                                   rest goes to unigram support.
+            min_sentence_terms (int): Sentences with fewer content words (e.g. "Yes.") are
+                                      not scored.
+        """
+        self.bigram_weight = bigram_weight
+        self.min_sentence_terms = min_sentence_terms
+
+    @staticmethod
+    def is_abstention(answer: str) -> bool:
+        """Whether the answer declines to answer for lack of information."""
+        return bool(_ABSTENTION.search(answer))
+
+    def score(self, answer: str, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Scores an answer against the chunks it was generated from.
+
+        Returns:
+            Dict[str, Any]: 'faithfulness_score', 'relevance_score' and 'context_coverage'
+                            (0-1), 'abstained', and 'unsupported_sentences', the sentences
+                            scoring below 0.5.
+        """
+        context_unigrams, context_bigrams = _hashes(_terms("\n".join(chunk.get("text", "") for chunk in retrieved_chunks)))
+
+        sentences, unigrams, bigrams = [], [], []
+        for sentence in _SENTENCE.split(answer):
+            sentence_unigrams, sentence_bigrams = _hashes(_terms(sentence))
+            if sentence_unigrams.shape[0] >= self.min_sentence_terms:
+                sentences.append(sentence.strip())
+                unigrams.append(sentence_unigrams)
+                bigrams.append(sentence_bigrams)
+
+        query_unigrams, _ = _hashes(_terms(user_query))
+        answer_unigrams, _ = _hashes(_terms(answer))
+        relevance, coverage = ((float(np.isin(query_unigrams, answer_unigrams).mean()),
+                                float(np.isin(query_unigrams, context_unigrams).mean()))
+                               if query_unigrams.shape[0] else (1.0, 1.0))
+        result = {"faithfulness_score": 1.0, "relevance_score": round(relevance, 4),
+                  "context_coverage": round(coverage, 4), "abstained": self.is_abstention(answer),
+                  "unsupported_sentences": []}
+        if not sentences:
+            return result
+
+        sentence_scores = ((1 - self.bigram_weight) * self._support(unigrams, context_unigrams) +
+                           self.bigram_weight * self._support(bigrams, context_bigrams))
+        lengths = np.asarray([sentence_unigrams.shape[0] for sentence_unigrams in unigrams], dtype=np.float64)
+        result["faithfulness_score"] = round(float(np.average(sentence_scores, weights=lengths)), 4)
+        result["unsupported_sentences"] = [sentence for sentence, score in zip(sentences, sentence_scores) if score < 0.5]
+        return result
+
+    @staticmethod
+    def _support(per_sentence: List[np.ndarray], context: np.ndarray) -> np.ndarray:
+        """The fraction of each sentence's n-grams found in the context."""
+        counts = np.asarray([ngrams.shape[0] for ngrams in per_sentence])
+        sentence_ids = np.repeat(np.arange(len(per_sentence)), counts)
+        found = np.isin(np.concatenate(per_sentence), context)
+        supported = np.bincount(sentence_ids, weights=found, minlength=len(per_sentence))
+        return np.divide(supported, counts, out=np.ones(len(per_sentence)), where=counts > 0)
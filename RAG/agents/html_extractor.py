@@ -0,0 +1,269 @@
+import codecs
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+# Mirrors the tree-building rules of BeautifulSoup's "html.parser" builder, so the
+# extracted text is identical to `soup.find_all([...])` + `get_text(' ', strip=True)`.
+VOID_ELEMENTS = frozenset([
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr",
+    "image", "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid",
+    "param", "source", "spacer", "track", "wbr",
+])
+# Text inside these tags is not ordinary text (scripts, styles, templates, ruby annotations).
+STRING_CONTAINERS = frozenset(["rt", "rp", "style", "script", "template"])
+TEXT_TAGS = frozenset(["p", "h1", "h2", "h3", "h4", "h5", "h6"])
+
+ENTITIES = {name.rstrip(";"): character for name, character in html5.items()}
+WINDOWS_1252 = {}
+for _code in range(0x80, 0xA0):
+    try:
+        WINDOWS_1252[_code] = bytes([_code]).decode("cp1252")
+    except UnicodeDecodeError:
+        pass
+
+_DECIMAL_REFERENCE = re.compile("^([0-9]+)(.*)")
+_HEX_REFERENCE = re.compile("^([0-9a-f]+)(.*)")
+_MALFORMED_CHARREF = re.compile(r"&#(?!(?:[0-9]+|[xX][0-9a-fA-F]+)[^0-9a-fA-F])")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_:.-]+)""", re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+
+def numeric_character_reference(name: str) -> Tuple[str, str]:
+    """
+    Resolves the body of a numeric character reference (e.g. "38" or "x26") the way the
+    HTML spec does. Returns the character and any trailing text that was not part of it.
+    """
+    base, pattern = 10, _DECIMAL_REFERENCE
+    if name[:1] in ("x", "X"):
+        name, base, pattern = name[1:], 16, _HEX_REFERENCE
+    extra = ""
+    try:
+        number = int(name, base)
+    except ValueError:
+        match = pattern.search(name)
+        if match is None:
+            return "", name
+        number, extra = int(match.group(1), base), match.group(2)
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return "\ufffd", extra
+    return WINDOWS_1252.get(number) or chr(number), extra
+
+
+def sniff_encoding(head: bytes, default: str = "utf-8") -> str:
+    """Picks a decoder for HTML bytes from a byte-order mark or a <meta charset> in the first 1KB."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _META_CHARSET.search(head[:1024])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return default
+
+
+class _Element:
+    __slots__ = ("name", "texts")
+
+    def __init__(self, name: str, texts: Optional[List[str]]):
+        self.name = name
+        self.texts = texts
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Extracts headings, paragraphs, the title and the meta description from HTML in one
+    streaming pass, without building a document tree.
+
+    It consumes the same tokenizer events as BeautifulSoup's "html.parser" builder and
+    replays just enough of its tree rules (the open-element stack, void elements, text
+    run boundaries and script/style/template text) to produce exactly the same output
+    as `ParserAgent`'s BeautifulSoup reference path, including on malformed markup.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self._stack: List[_Element] = []
+        self._open_counts: Dict[str, int] = {}
+        self._collectors: List[_Element] = []
+        self._containers = 0
+        self._already_closed: List[str] = []
+        self._data: List[str] = []
+        self.blocks: List[Tuple[str, List[str]]] = []
+        self.title: Optional[List[str]] = None
+        self.description: Optional[str] = None
+        self._description_seen = False
+
+    # Text runs: consecutive data events form one string, as in the BeautifulSoup tree.
+    def handle_data(self, data: str):
+        self._data.append(data)
+
+    def _flush(self, counts: bool = True):
+        if not self._data:
+            return
+        text = "".join(self._data).strip()
+        self._data = []
+        if text and counts:
+            for element in self._collectors:
+                element.texts.append(text)
+
+    def _flush_text(self):
+        self._flush(counts=not self._containers)
+
+    def handle_charref(self, name: str):
+        character, extra = numeric_character_reference(name)
+        self._data.append(character)
+        self._data.append(extra)
+
+    def handle_entityref(self, name: str):
+        self._data.append(ENTITIES.get(name, "&" + name))
+
+    def handle_comment(self, data: str):
+        self._flush_text()
+
+    def handle_decl(self, decl: str):
+        self._flush_text()
+
+    def handle_pi(self, data: str):
+        self._flush_text()
+
+    def unknown_decl(self, data: str):
+        self._flush_text()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections count as text even inside script-like containers.
+            self._data.append(data[len("CDATA["):])
+            self._flush(counts=True)
+
+    # Elements.
+    def _push(self, tag: str):
+        texts = None
+        if tag in TEXT_TAGS:
+            texts = []
+            self.blocks.append((tag, texts))
+        elif tag == "title" and self.title is None:
+            texts = self.title = []
+        element = _Element(tag, texts)
+        self._stack.append(element)
+        self._open_counts[tag] = self._open_counts.get(tag, 0) + 1
+        if texts is not None:
+            self._collectors.append(element)
+        if tag in STRING_CONTAINERS:
+            self._containers += 1
+
+    def _pop(self):
+        element = self._stack.pop()
+        self._open_counts[element.name] -= 1
+        if element.texts is not None:
+            self._collectors.pop()
+        if element.name in STRING_CONTAINERS:
+            self._containers -= 1
+
+    def _pop_to(self, tag: str):
+        if not self._open_counts.get(tag):
+            return
+        while self._stack:
+            name = self._stack[-1].name
+            self._pop()
+            if name == tag:
+                return
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]], void_check: bool = True):
+        self._flush_text()
+        if tag == "meta" and not self._description_seen:
+            attributes = {key: "" if value is None else value for key, value in attrs}
+            if attributes.get("name") == "description":
+                self._description_seen = True
+                content = attributes.get("content")
+                self.description = content.strip() if content else None
+        self._push(tag)
+        if void_check and tag in VOID_ELEMENTS:
+            self._pop_to(tag)
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self.handle_starttag(tag, attrs, void_check=False)
+        self._end(tag)
+
+    def handle_endtag(self, tag: str):
+        if tag in self._already_closed:
+            # The explicit end tag of a void element that was already closed.
+            self._already_closed.remove(tag)
+        else:
+            self._end(tag)
+
+    def _end(self, tag: str):
+        self._flush_text()
+        self._pop_to(tag)
+
+    def finish(self) -> Dict[str, Any]:
+        """Closes the parser and returns {"text", "blocks", "metadata"} like `ParserAgent.parse`."""
+        self.close()
+        self._flush_text()
+        metadata: Dict[str, Any] = {}
+        if self.title is not None:
+            metadata["title"] = "".join(self.title)
+        if self.description:
+            metadata["description"] = self.description
+        blocks = [(tag, " ".join(texts)) for tag, texts in self.blocks]
+        return {"text": "\n".join(text for _, text in blocks), "blocks": blocks, "metadata": metadata}
+
+
+def _text_chunks(raw_content: Union[str, bytes], encoding: Optional[str], chunk_size: int) -> Iterator[str]:
+    """Yields the page as text, `chunk_size` characters (or bytes, decoded lazily) at a time."""
+    if isinstance(raw_content, str):
+        for start in range(0, len(raw_content), chunk_size):
+            yield raw_content[start:start + chunk_size]
+        return
+    data = memoryview(raw_content)
+    decoder = codecs.getincrementaldecoder(encoding or sniff_encoding(bytes(data[:1024])))(errors="replace")
+    for start in range(0, len(data), chunk_size):
+        yield decoder.decode(data[start:start + chunk_size], final=start + chunk_size >= len(data))
+
+
+def _pieces(chunks: Iterator[str]) -> Iterator[str]:
+    """
+    Regroups text chunks into pieces that end just after a ";" (except for the last).
+    html.parser's handling of a "&#" that is not a valid character reference depends on
+    whether a ";" follows in its buffer; ending every piece at a ";" makes that decision
+    the same as for the whole page.
+    """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind(";") + 1
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+
+def extract_html(raw_content: Union[str, bytes], encoding: Optional[str] = None,
+                 chunk_size: int = 64 * 1024) -> Dict[str, Any]:
+    """
+    Runs `HTMLTextExtractor` over a page in pieces of about `chunk_size`. Bytes are
+    decoded incrementally as they are parsed, so a decoded copy of the whole page is
+    normally never built, and the parser's buffer stays small.
+
+    Args:
+        raw_content (Union[str, bytes]): The page.
+        encoding (Optional[str]): The charset of byte input (e.g. from Content-Type);
+                                  sniffed from the markup when omitted.
+        chunk_size (int): Characters (or bytes) parsed per step.
+
+    Returns:
+        Dict[str, Any]: {"text": str, "blocks": [(tag, text), ...], "metadata": {...}}.
+    """
+    extractor = HTMLTextExtractor()
+    pieces = _pieces(_text_chunks(raw_content, encoding, chunk_size))
+    for piece in pieces:
+        if _MALFORMED_CHARREF.search(piece):
+            # html.parser stops its current pass at a malformed "&#", so from here on the
+            # number of feed() calls changes the result; feed the rest in one call, as
+            # BeautifulSoup does with the whole page.
+            extractor.feed(piece + "".join(pieces))
+            break
+        extractor.feed(piece)
+    return extractor.finish()
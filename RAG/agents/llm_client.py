@@ -0,0 +1,58 @@
+import asyncio
+from typing import List, Dict, Any, Optional, Sequence, Union, AsyncIterator
+import ollama
+
+class AsyncOllamaClient:
+    """
+    A non-blocking client for the Ollama chat and embedding APIs.
+
+    Wraps `ollama.AsyncClient` so model calls never block the event loop, and caps the
+    number of requests in flight with a semaphore so a burst of users queues up here
+    instead of overloading the model server. One instance is meant to be shared by all
+    agents that talk to the same Ollama host.
+    """
+    def __init__(self, host: Optional[str] = None, max_concurrent_requests: int = 4):
+        """
+        Args:
+            host (Optional[str]): The Ollama host; defaults to `OLLAMA_HOST` or localhost.
+            max_concurrent_requests (int): The maximum number of requests in flight.
+        """
+        self.host = host
+        self.max_concurrent_requests = max(1, max_concurrent_requests)
+        self._client = ollama.AsyncClient(host=host)
+        self._limiter = asyncio.Semaphore(self.max_concurrent_requests)
+        self.in_flight = 0
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """Calls the chat API (non-streaming) once a concurrency slot is free."""
+        async with self._limiter:
+            self.in_flight += 1
+            try:
+                return await self._client.chat(model=model, messages=messages, **kwargs)
+            finally:
+                self.in_flight -= 1
+
+    async def chat_stream(self, model: str, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        Calls the chat API in streaming mode and yields the content tokens as they arrive.
+        The concurrency slot is held until the stream is exhausted or closed.
+        """
+        async with self._limiter:
+            self.in_flight += 1
+            try:
+                stream = await self._client.chat(model=model, messages=messages, stream=True, **kwargs)
+                async for part in stream:
+                    token = part['message']['content']
+                    if token:
+                        yield token
+            finally:
+                self.in_flight -= 1
+
+    async def embed(self, model: str, input: Union[str, Sequence[str]]) -> Any:
+        """Calls the batch embedding API once a concurrency slot is free."""
+        async with self._limiter:
+            self.in_flight += 1
+            try:
+                return await self._client.embed(model=model, input=input)
+            finally:
+                self.in_flight -= 1
@@ -0,0 +1,139 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .text_chunker import approximate_token_count
+
+
+def _overlap(text: str, following: str, probe_chars: int = 32) -> int:
+    """The length of the longest suffix of `text` that `following` starts with (at least `probe_chars` long)."""
+    probe = following[:probe_chars]
+    start = text.find(probe, max(0, len(text) - len(following)))
+    while start != -1:
+        if following.startswith(text[start:]):
+            return len(text) - start
+        start = text.find(probe, start + 1)
+    return 0
+
+
+class MMRReranker:
+    """
+    Re-ranks over-fetched retrieval candidates for diversity, then merges neighbouring
+    chunks into spans, so the prompt does not carry near-duplicate context.
+
+    Selection is maximal marginal relevance: each pick maximizes
+    `diversity_lambda * relevance - (1 - diversity_lambda) * max similarity to the picks so far`,
+    where relevance is the retrieval score scaled to [0, 1] (so hybrid rankings keep their
+    order) and similarity is the cosine between chunk embeddings. The similarity matrix
+    is computed with one matrix product and the greedy loop only updates a running
+    maximum, so selecting k of n candidates costs O(n^2 * dim + k * n).
+
+    Selected chunks of the same document with consecutive 'chunk_index' values are then
+    merged into one span, with the overlap the chunker repeats between them removed.
+    """
+    def __init__(self, diversity_lambda: float = 0.7, merge_adjacent: bool = True):
+        """
+        Args:
+            diversity_lambda (float): Weight of relevance against novelty; 1.0 keeps the
+                                      retrieval order.
+            merge_adjacent (bool): Whether to merge neighbouring chunks into spans.
+        """
+        self.diversity_lambda = diversity_lambda
+        self.merge_adjacent = merge_adjacent
+
+    def select(self, candidates: List[Dict[str, Any]], embeddings: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Picks `top_k` candidates by maximal marginal relevance.
+
+        Args:
+            candidates (List[Dict[str, Any]]): Retrieved chunks with a 'score'.
+            embeddings (np.ndarray): The candidates' unit-norm embeddings, one row each.
+            top_k (int): The number of chunks to pick.
+
+        Returns:
+            List[Dict[str, Any]]: The picked chunks, in pick order.
+        """
+        n = len(candidates)
+        if n <= 1 or top_k <= 0:
+            return candidates[:max(0, top_k)]
+        scores = np.asarray([chunk.get("score", 0.0) for chunk in candidates], dtype=np.float32)
+        spread = float(scores.max() - scores.min())
+        relevance = (scores - scores.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+        similarity = embeddings @ embeddings.T
+
+        picked: List[int] = []
+        max_similarity = np.full(n, -np.inf, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        for _ in range(min(top_k, n)):
+            novelty_penalty = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+            marginal = self.diversity_lambda * relevance - (1 - self.diversity_lambda) * novelty_penalty
+            marginal[~available] = -np.inf
+            best = int(np.argmax(marginal))
+            picked.append(best)
+            available[best] = False
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+        return [candidates[i] for i in picked]
+
+    def merge_spans(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merges chunks of the same document with consecutive 'chunk_index' values into one
+        span that takes the best score of its chunks, its place in the ranking and the
+        'chunk_id' of its first chunk; 'merged_chunk_ids' lists every chunk in the span.
+        """
+        def key(chunk: Dict[str, Any]) -> Optional[Tuple[Any, Any]]:
+            metadata = chunk.get("metadata", {})
+            if metadata.get("chunk_index") is None:
+                return None
+            return metadata.get("document_id"), metadata.get("source_url")
+
+        by_document: Dict[Tuple[Any, Any], List[Tuple[int, Dict[str, Any]]]] = {}
+        for rank, chunk in enumerate(chunks):
+            if key(chunk) is not None:
+                by_document.setdefault(key(chunk), []).append((rank, chunk))
+
+        replaced: Dict[int, Optional[Dict[str, Any]]] = {}
+        for members in by_document.values():
+            members.sort(key=lambda member: member[1]["metadata"]["chunk_index"])
+            run = [members[0]]
+            for member in members[1:] + [None]:
+                if member is not None and member[1]["metadata"]["chunk_index"] == run[-1][1]["metadata"]["chunk_index"] + 1:
+                    run.append(member)
+                    continue
+                if len(run) > 1:
+                    first_rank = min(rank for rank, _ in run)
+                    replaced[first_rank] = self._span([chunk for _, chunk in run])
+                    replaced.update({rank: None for rank, _ in run if rank != first_rank})
+                run = [member]
+        return [replaced.get(rank, chunk) for rank, chunk in enumerate(chunks) if replaced.get(rank, chunk) is not None]
+
+    @staticmethod
+    def _span(run: List[Dict[str, Any]]) -> Dict[str, Any]:
+        text = run[0].get("text", "")
+        for chunk in run[1:]:
+            following = chunk.get("text", "")
+            overlap = _overlap(text, following)
+            text += following[overlap:] if overlap else "\n" + following
+        first = run[0]
+        return {**first, "text": text, "score": max(chunk.get("score", 0.0) for chunk in run),
+                "metadata": {**first.get("metadata", {}),
+                             "chunk_span": [first["metadata"]["chunk_index"], run[-1]["metadata"]["chunk_index"]]},
+                "merged_chunk_ids": [chunk.get("chunk_id") for chunk in run]}
+
+    def rerank(self, candidates: List[Dict[str, Any]], embeddings: np.ndarray,
+               top_k: int) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Selects `top_k` diverse candidates and merges neighbouring ones.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, int]]: The chunks to use, and statistics:
+            'candidates', 'selected', 'merged' (chunks folded into a span) and 'saved_tokens'
+            (versus the `top_k` best-scored candidates).
+        """
+        selected = self.select(candidates, embeddings, top_k)
+        chunks = self.merge_spans(selected) if self.merge_adjacent else selected
+        baseline = sorted(candidates, key=lambda chunk: chunk.get("score", 0.0), reverse=True)[:top_k]
+        baseline_tokens = sum(approximate_token_count(chunk.get("text", "")) for chunk in baseline)
+        used_tokens = sum(approximate_token_count(chunk.get("text", "")) for chunk in chunks)
+        return chunks, {"candidates": len(candidates), "selected": len(selected),
+                        "merged": len(selected) - len(chunks),
+                        "saved_tokens": max(0, baseline_tokens - used_tokens)}
@@ -1,55 +1,101 @@
+import codecs
 from bs4 import BeautifulSoup
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
+
+from .html_extractor import extract_html, sniff_encoding
 
 class ParserAgent:
     """
     The Parser Agent is responsible for extracting meaningful text and metadata
     from the raw content obtained by the Crawler Agent.
     It can handle various formats (HTML, PDF, plain text, etc.).
+
+    HTML is parsed by one of these backends:
+      - "streaming" (default): a single pass over the tokenizer events that pulls out
+        headings, paragraphs, the title and the meta description without building a
+        document tree. Its output is identical to the "bs4" backend.
+      - "bs4": BeautifulSoup with the pure-Python "html.parser" tree builder (the reference).
+      - "lxml": BeautifulSoup with the lxml tree builder, when lxml is installed. It is the
+        faster tree builder, but it repairs malformed markup differently, so its output can
+        differ from the other two on such pages. Falls back to "streaming" without lxml.
     """
+    BACKENDS = ("streaming", "bs4", "lxml")
+
+    def __init__(self, backend: str = "streaming"):
+        """
+        Args:
+            backend (str): One of "streaming", "bs4" or "lxml".
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend must be one of {self.BACKENDS}, got {backend!r}")
+        if backend == "lxml":
+            try:
+                import lxml  # noqa: F401
+            except ImportError:
+                backend = "streaming"
+        self.backend = backend
 
-    def parse(self, raw_content: str, content_type: str = "text/html") -> Dict[str, Any]:
+    def parse(self, raw_content: Union[str, bytes], content_type: str = "text/html",
+              encoding: Optional[str] = None) -> Dict[str, Any]:
         """
         Parses the raw content based on its type and extracts structured data.
-        This example primarily focuses on HTML parsing using BeautifulSoup.
+        This example primarily focuses on HTML parsing.
         For other types (PDF, DOCX), you'd integrate libraries like `PyPDF2`, `python-docx`, etc.
 
         Args:
-            raw_content (str): The raw content string from the crawler.
+            raw_content (Union[str, bytes]): The raw content from the crawler. Bytes are
+                                             decoded lazily while parsing.
             content_type (str): The MIME type of the content (e.g., "text/html", "application/pdf").
+            encoding (Optional[str]): The charset of byte content, if known (e.g. from the
+                                      Content-Type header); otherwise it is sniffed.
 
         Returns:
-            Dict[str, Any]: A dictionary containing extracted text and metadata.
+            Dict[str, Any]: A dictionary containing extracted text and metadata. HTML results
+                            also carry 'blocks', the (tag, text) pairs of the headings and
+                            paragraphs that make up the text, in document order.
                             Returns an empty dict if parsing fails or content is empty.
         """
         if not raw_content:
             return {}
 
-        parsed_data = {"text": "", "metadata": {}}
-
         try:
             if content_type == "text/html":
-                soup = BeautifulSoup(raw_content, 'html.parser')
-
-                paragraphs = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-                text_content = "\n".join([p.get_text(separator=' ', strip=True) for p in paragraphs])
-                parsed_data["text"] = text_content
-
-                title_tag = soup.find('title')
-                if title_tag:
-                    parsed_data["metadata"]["title"] = title_tag.get_text(strip=True)
-
-                meta_description = soup.find('meta', attrs={'name': 'description'})
-                if meta_description and meta_description.get('content'):
-                    parsed_data["metadata"]["description"] = meta_description['content'].strip()
+                if self.backend == "streaming":
+                    return extract_html(raw_content, encoding)
+                if isinstance(raw_content, bytes):
+                    raw_content = self._decode(raw_content, encoding)
+                return self._parse_with_soup(raw_content, "lxml" if self.backend == "lxml" else "html.parser")
 
             elif content_type == "text/plain":
-                parsed_data["text"] = raw_content
+                if isinstance(raw_content, bytes):
+                    raw_content = codecs.decode(raw_content, encoding or "utf-8", errors="replace")
+                return {"text": raw_content, "metadata": {}}
 
             else:
                 return {}
 
-        except Exception as e:
+        except Exception:
             return {}
 
-        return parsed_data
\ No newline at end of file
+    def _decode(self, raw_content: bytes, encoding: Optional[str]) -> str:
+        return codecs.decode(raw_content, encoding or sniff_encoding(raw_content[:1024]), errors="replace")
+
+    def _parse_with_soup(self, raw_content: str, features: str) -> Dict[str, Any]:
+        """Parses HTML by building a BeautifulSoup tree; the reference implementation."""
+        parsed_data = {"text": "", "blocks": [], "metadata": {}}
+        soup = BeautifulSoup(raw_content, features)
+
+        paragraphs = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        blocks = [(p.name, p.get_text(separator=' ', strip=True)) for p in paragraphs]
+        parsed_data["blocks"] = blocks
+        parsed_data["text"] = "\n".join(text for _, text in blocks)
+
+        title_tag = soup.find('title')
+        if title_tag:
+            parsed_data["metadata"]["title"] = title_tag.get_text(strip=True)
+
+        meta_description = soup.find('meta', attrs={'name': 'description'})
+        if meta_description and meta_description.get('content'):
+            parsed_data["metadata"]["description"] = meta_description['content'].strip()
+
+        return parsed_data
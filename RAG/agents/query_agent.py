@@ -1,28 +1,156 @@
-import ollama
 from pydantic import BaseModel, Field, ValidationError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import asyncio
+import bisect
 import json
+import re
+from collections import OrderedDict
+
+from .llm_client import AsyncOllamaClient
 
 class ExpandedQueryResponse(BaseModel):
     expanded_terms: List[str] = Field(
         ..., description="A list of 3-5 alternative phrasings, synonyms, and related keywords for the user's query."
     )
 
+class LocalQueryExpander:
+    """
+    Expands a query without an LLM call, in microseconds. Each query word is expanded
+    with its entries in a synonym table and with corpus terms that share its stem
+    (e.g. "configuring" -> "configuration", "configured"), preferring terms that occur
+    in more chunks of the collection being queried.
+
+    The sorted vocabulary of a collection is built by `prepare` in a worker thread, and
+    only again when the collection's `vocabulary_version` changes.
+    """
+    SUFFIXES = ("ations", "ation", "ings", "ing", "ions", "ion", "ers", "er", "ies", "es", "ed", "s")
+
+    def __init__(self, synonyms: Optional[Dict[str, List[str]]] = None,
+                 vocabulary: Optional[Callable[[str], Dict[str, int]]] = None,
+                 vocabulary_version: Optional[Callable[[str], Any]] = None,
+                 terms_per_word: int = 2, max_terms: int = 5, min_stem_length: int = 4,
+                 max_vocabularies: int = 16):
+        """
+        Args:
+            synonyms (Optional[Dict[str, List[str]]]): Lower-case word -> synonyms or related phrases.
+            vocabulary (Optional[Callable[[str], Dict[str, int]]]): Returns the terms of a
+                                                                  collection with their
+                                                                  document frequencies.
+            vocabulary_version (Optional[Callable[[str], Any]]): Returns a cheap key that changes
+                                                               whenever a collection's vocabulary
+                                                               may have; without it the vocabulary
+                                                               is rebuilt on every `prepare`.
+            terms_per_word (int): The most corpus terms added per query word.
+            max_terms (int): The most expansion terms returned.
+            min_stem_length (int): Shorter stems are not expanded from the vocabulary.
+            max_vocabularies (int): The most collection vocabularies kept in memory.
+        """
+        self.synonyms = {word.lower(): list(related) for word, related in (synonyms or {}).items()}
+        self.vocabulary = vocabulary
+        self.vocabulary_version = vocabulary_version
+        self.terms_per_word = terms_per_word
+        self.max_terms = max_terms
+        self.min_stem_length = min_stem_length
+        self.max_vocabularies = max(1, max_vocabularies)
+        # collection -> (version, frequencies, sorted terms), least recently used first
+        self._vocabularies: "OrderedDict[str, Tuple[Any, Dict[str, int], List[str]]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    def _stem(self, word: str) -> str:
+        for suffix in self.SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= self.min_stem_length:
+                return word[:-len(suffix)]
+        return word
+
+    def _load(self, collection: str) -> Tuple[Dict[str, int], List[str]]:
+        frequencies = self.vocabulary(collection)
+        return frequencies, sorted(frequencies)
+
+    async def prepare(self, collection: str = "default"):
+        """Makes `expand` use the current vocabulary of `collection`, rebuilding it off the event loop if it changed."""
+        if self.vocabulary is None:
+            return
+        try:
+            version = self.vocabulary_version(collection) if self.vocabulary_version is not None else None
+            cached = self._vocabularies.get(collection)
+            if cached is not None and version is not None and cached[0] == version:
+                self._vocabularies.move_to_end(collection)
+                return
+            loading = self._loading.get(collection)
+            if loading is None:
+                loading = self._loading[collection] = asyncio.ensure_future(asyncio.to_thread(self._load, collection))
+                loading.add_done_callback(
+                    lambda task: self._loading.pop(collection) if self._loading.get(collection) is task else None)
+            frequencies, sorted_terms = await asyncio.shield(loading)
+        except Exception:
+            return  # expand with the vocabulary we have
+        self._vocabularies[collection] = (version, frequencies, sorted_terms)
+        self._vocabularies.move_to_end(collection)
+        while len(self._vocabularies) > self.max_vocabularies:
+            self._vocabularies.popitem(last=False)
+
+    def _corpus_terms(self, word: str, frequencies: Dict[str, int], sorted_terms: List[str]) -> List[str]:
+        stem = self._stem(word)
+        if len(stem) < self.min_stem_length:
+            return []
+        start = bisect.bisect_left(sorted_terms, stem)
+        end = bisect.bisect_left(sorted_terms, stem + "\uffff")
+        related = [term for term in sorted_terms[start:end] if term != word]
+        related.sort(key=lambda term: frequencies[term], reverse=True)
+        return related[:self.terms_per_word]
+
+    def expand(self, cleaned_query: str, collection: str = "default") -> List[str]:
+        """
+        Returns up to `max_terms` expansion terms for a lower-cased query, using the
+        vocabulary of `collection` last loaded by `prepare` (none if it never was).
+        """
+        _, frequencies, sorted_terms = self._vocabularies.get(collection, (None, {}, []))
+        terms: List[str] = []
+        for word in re.findall(r"\w+", cleaned_query):
+            terms.extend(self.synonyms.get(word, []))
+            terms.extend(self._corpus_terms(word, frequencies, sorted_terms))
+        return [term for term in dict.fromkeys(terms) if term != cleaned_query][:self.max_terms]
+
+
 class QueryAgent:
     """
     The Query Agent is responsible for processing the user's raw query.
     It uses the Ollama Llama3.2 model for structured query expansion.
+
+    Expansions depend only on the cleaned query, the model and the temperature, so when
+    a `cache` (see `ExpansionCache`) is given, each distinct query reaches the LLM only
+    once per cache lifetime. When `latency_budget_ms` is set, the LLM is skipped
+    entirely: a cached expansion is used if there is one, and otherwise the query is
+    expanded by the `local_expander`. `process_query` reports which of "llm", "cache"
+    or "local" produced the expansion under "expansion_mode".
     """
-    def __init__(self, model_name: str = "llama3.2", temperature: float = 0.7):
+    def __init__(self, model_name: str = "llama3.2", temperature: float = 0.7,
+                 llm_client: Optional[AsyncOllamaClient] = None, cache: Optional[Any] = None,
+                 local_expander: Optional[LocalQueryExpander] = None,
+                 latency_budget_ms: Optional[float] = None):
+        """
+        Args:
+            model_name (str): The Ollama model used for expansion.
+            temperature (float): Sampling temperature of the expansion call.
+            llm_client (Optional[AsyncOllamaClient]): Shared non-blocking Ollama client.
+            cache (Optional[Any]): An `ExpansionCache` for LLM expansions.
+            local_expander (Optional[LocalQueryExpander]): The expander used in fast mode.
+            latency_budget_ms (Optional[float]): When set, expansion must not wait for the
+                                                 LLM (fast mode).
+        """
         self.model_name = model_name
         self.temperature = temperature
+        self.llm_client = llm_client or AsyncOllamaClient()
+        self.cache = cache
+        self.local_expander = local_expander or LocalQueryExpander()
+        self.latency_budget_ms = latency_budget_ms
 
     async def _call_ollama_llama3_structured(self, prompt_message: str) -> List[str]:
         """
         Makes an asynchronous call to the Ollama Llama3 model for structured text generation.
         """
         try:
-            response = ollama.chat(
+            response = await self.llm_client.chat(
                 model=self.model_name,
                 messages=[{'role': 'user', 'content': prompt_message}],
                 format='json',  # Request JSON-structured output
@@ -36,19 +164,35 @@ class QueryAgent:
                 try:
                     parsed_response = ExpandedQueryResponse.model_validate_json(raw_json_content)
                     return [term.strip() for term in parsed_response.expanded_terms if term.strip()]
-                except ValidationError as e:
+                except ValidationError:
                     return []
-                except json.JSONDecodeError as e:
+                except json.JSONDecodeError:
                     return []
             else:
                 return []
 
-        except Exception as e:
+        except Exception:
             return []
 
-    async def process_query(self, user_query: str) -> Dict[str, Any]:
+    async def _expand(self, cleaned_query: str, prompt: str, collection: str) -> Tuple[List[str], str]:
+        """Returns the expansion terms and the mode ("cache", "local" or "llm") that produced them."""
+        if self.cache is not None:
+            cached_terms = await asyncio.to_thread(self.cache.get, self.model_name, self.temperature, cleaned_query)
+            if cached_terms is not None:
+                return cached_terms, "cache"
+        if self.latency_budget_ms is not None:
+            await self.local_expander.prepare(collection)
+            return self.local_expander.expand(cleaned_query, collection), "local"
+
+        expanded_terms = await self._call_ollama_llama3_structured(prompt)
+        if expanded_terms and self.cache is not None:
+            await asyncio.to_thread(self.cache.put, self.model_name, self.temperature, cleaned_query, expanded_terms)
+        return expanded_terms, "llm"
+
+    async def process_query(self, user_query: str, collection: str = "default") -> Dict[str, Any]:
         """
         Processes the raw user query, expanding it using Llama3 for better retrieval.
+        In fast mode the local expansion draws on the vocabulary of `collection`.
         """
 
         cleaned_query = user_query.strip().lower()
@@ -69,7 +213,7 @@ class QueryAgent:
             f"Your output JSON:"
         )
 
-        expanded_terms_list = await self._call_ollama_llama3_structured(prompt)
+        expanded_terms_list, expansion_mode = await self._expand(cleaned_query, prompt, collection)
         enhanced_query_text = cleaned_query
 
         if expanded_terms_list:
@@ -80,6 +224,8 @@ class QueryAgent:
             "original_query": user_query,
             "cleaned_query": cleaned_query,
             "enhanced_query": enhanced_query_text,
+            "expanded_terms": [term for term in dict.fromkeys(term.lower() for term in expanded_terms_list) if term != cleaned_query],
+            "expansion_mode": expansion_mode,
             "detected_intent": "general_qa"  # Placeholder for more advanced intent detection
         }
         return processed_info
\ No newline at end of file
@@ -1,21 +1,49 @@
-from typing import List, Dict, Any
-import ollama
+import logging
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+
+from .context_assembler import ContextAssembler
+from .llm_client import AsyncOllamaClient
+from .text_chunker import approximate_token_count
+
+logger = logging.getLogger(__name__)
 
 class RAGAgent:
     """
     The RAG (Retrieval-Augmented Generation) Agent takes the user query
     and retrieved relevant document chunks, and then uses a local Ollama Llama3.2 model
     to synthesize a coherent and informative answer based on the provided context.
+
+    Prompts are fitted to a token budget by a `ContextAssembler`, and the stored
+    conversation is bounded: past `max_stored_turns` turns, the oldest turn is dropped
+    and only its question is kept (up to `max_stored_turns` of them) for the history
+    summary.
     """
-    def __init__(self, model_name: str = "llama3.2"):
+    NO_CONTEXT_RESPONSE = "I couldn't find enough information in the provided context to answer your question."
+    LLM_ERROR_RESPONSE = "Error: Could not get response from the LLM."
+
+    def __init__(self, model_name: str = "llama3.2", llm_client: Optional[AsyncOllamaClient] = None,
+                 context_assembler: Optional[ContextAssembler] = None, max_stored_turns: int = 20,
+                 collection: str = "default"):
         """
         Initialize the RAG Agent with a specific Ollama model and an empty conversation history.
         
         Args:
             model_name (str): Name of the Ollama model to use (default: "llama3.2")
+            llm_client (Optional[AsyncOllamaClient]): Shared non-blocking Ollama client.
+            context_assembler (Optional[ContextAssembler]): Enforces the prompt token budget.
+            max_stored_turns (int): The most turns kept in `conversation_history`.
+            collection (str): The vector store collection this conversation's documents
+                              are stored in and retrieved from.
         """
         self.model_name = model_name
+        self.llm_client = llm_client or AsyncOllamaClient()
+        self.context_assembler = context_assembler or ContextAssembler()
+        self.max_stored_turns = max(1, max_stored_turns)
+        self.collection = collection
         self.conversation_history: List[Dict[str, str]] = []
+        self.earlier_questions: List[str] = []
+        self.conversation_tokens = 0
+        self.last_context_stats: Dict[str, int] = {}
         self._initialize_system_prompt()
 
     def _initialize_system_prompt(self):
@@ -38,7 +66,66 @@ class RAGAgent:
         )
         self.conversation_history.append({"role": "system", "content": system_prompt})
 
-    def generate_response(self, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _user_message(self, user_query: str, context_str: str) -> str:
+        """
+        Formulates a rich user message for the current turn, combining the retrieved context
+        and the user's actual query. This message is what the LLM will primarily act upon
+        for this specific generation.
+        """
+        return (
+            f"Based on the following context, please answer the user's query. "
+            f"If the information is not in the context, state that you don't have enough information.\n\n"
+            f"Context:\n{context_str}\n\n"
+            f"User Query: {user_query}\n\n"
+            f"Answer:"
+        )
+
+    def _build_messages(self, user_query: str,
+                        retrieved_chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """
+        Builds the messages for the current turn: the system prompt, as much recent history
+        as the token budget allows, and a rich user message carrying the retrieved context.
+        The context is consolidated into a single block without explicit "Source X" labels,
+        which can sometimes lead to the model treating them as separate, atomic pieces.
+
+        Returns:
+            Tuple[List[Dict[str, str]], List[Dict[str, Any]]]: The messages and the chunks
+            that made it into the context. Token statistics are stored in `last_context_stats`.
+        """
+        messages, used_chunks, stats = self.context_assembler.assemble(
+            self.conversation_history[0], self.conversation_history[1:], self.earlier_questions,
+            lambda context_str: self._user_message(user_query, context_str), retrieved_chunks,
+            self.conversation_tokens)
+        self.last_context_stats = stats
+        return messages, used_chunks
+
+    def record_turn(self, user_query: str, response_text: str):
+        """
+        Updates the permanent conversation history with the original user query and the
+        assistant response. This keeps the history clean for subsequent conversational turns.
+        Beyond `max_stored_turns`, the oldest turn is reduced to its question.
+        """
+        self.conversation_history.append({"role": "user", "content": user_query})
+        self.conversation_history.append({"role": "assistant", "content": response_text})
+        self.conversation_tokens += approximate_token_count(user_query) + approximate_token_count(response_text)
+        while len(self.conversation_history) - 1 > 2 * self.max_stored_turns:
+            self.earlier_questions.append(self.conversation_history[1]["content"])
+            del self.conversation_history[1:3]
+        del self.earlier_questions[:-self.max_stored_turns]
+
+    def _build_sources(self, retrieved_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        sources = []
+        for chunk in retrieved_chunks:
+            source_info = {
+                "chunk_id": chunk.get("chunk_id"),
+                "document_id": chunk.get("metadata", {}).get("document_id"),
+                "page": chunk.get("metadata", {}).get("page"),
+                "text_snippet": chunk.get("text", "")[:100] + "..." # Small snippet for reference
+            }
+            sources.append(source_info)
+        return sources
+
+    async def generate_response(self, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generates a response using Ollama Llama3.2, conditioned on the user query and
         the retrieved document chunks. The conversation history is maintained for context.
@@ -52,60 +139,59 @@ class RAGAgent:
             Dict[str, Any]: A dictionary containing the generated response text and
                             references to the source chunks.
         """
-        
-        # Create a copy of the conversation history to pass to Ollama for the current turn.
-        # This allows us to inject context for the current generation without permanently
-        # altering the clean conversational flow in self.conversation_history.
-        messages_for_ollama = list(self.conversation_history)
-
         if not retrieved_chunks:
-            response_text = "I couldn't find enough information in the provided context to answer your question."
+            response_text = self.NO_CONTEXT_RESPONSE
             # Append the actual user query and the assistant's response to history for continuity.
-            self.conversation_history.append({"role": "user", "content": user_query})
-            self.conversation_history.append({"role": "assistant", "content": response_text})
+            self.record_turn(user_query, response_text)
             return {"response_text": response_text, "sources": []}
 
-        context_texts = [chunk["text"] for chunk in retrieved_chunks]
-        # Consolidate context into a single block without explicit "Source X" labels,
-        # which can sometimes lead to the model treating them as separate, atomic pieces.
-        context_str = "\n\n".join(context_texts)
+        # Call Ollama with the budgeted history + the current rich user message.
+        messages, used_chunks = self._build_messages(user_query, retrieved_chunks)
+        generated_text = await self._call_ollama(messages)
 
-        # Formulate a rich user message for the current turn, combining the retrieved context
-        # and the user's actual query. This message is what the LLM will primarily act upon
-        # for this specific generation.
-        rich_user_message = (
-            f"Based on the following context, please answer the user's query. "
-            f"If the information is not in the context, state that you don't have enough information.\n\n"
-            f"Context:\n{context_str}\n\n"
-            f"User Query: {user_query}\n\n"
-            f"Answer:"
-        )
-        
-        # Add this richly formatted user message to the messages list that will be sent to Ollama.
-        messages_for_ollama.append({"role": "user", "content": rich_user_message})
+        # History is only updated after a successful generation.
+        self.record_turn(user_query, generated_text)
+        return {"response_text": generated_text, "sources": self._build_sources(used_chunks),
+                "context": self.last_context_stats}
 
-        # Call Ollama with the full history + the current rich user message.
-        generated_text = self._call_ollama(messages_for_ollama)
+    async def stream_response(self, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of `generate_response`: yields tokens as the model produces them.
 
-        # After a successful generation, update the actual, permanent conversation history
-        # with the original user query and the generated assistant response. This keeps
-        # the history clean for subsequent conversational turns.
-        self.conversation_history.append({"role": "user", "content": user_query}) # Store the original user query
-        self.conversation_history.append({"role": "assistant", "content": generated_text})
+        Args:
+            user_query (str): The original query from the user.
+            retrieved_chunks (List[Dict[str, Any]]): A list of relevant document chunks,
+                                                     each containing 'text' and 'metadata'.
 
-        sources = []
-        for chunk in retrieved_chunks:
-            source_info = {
-                "chunk_id": chunk.get("chunk_id"),
-                "document_id": chunk.get("metadata", {}).get("document_id"),
-                "page": chunk.get("metadata", {}).get("page"),
-                "text_snippet": chunk.get("text", "")[:100] + "..." # Small snippet for reference
-            }
-            sources.append(source_info)
+        Yields:
+            Dict[str, Any]: `{"type": "token", "token": str}` events while generating, then a
+                            single `{"type": "response", "response": {...}}` event carrying the
+                            same dictionary `generate_response` returns.
+        """
+        if not retrieved_chunks:
+            self.record_turn(user_query, self.NO_CONTEXT_RESPONSE)
+            yield {"type": "token", "token": self.NO_CONTEXT_RESPONSE}
+            yield {"type": "response", "response": {"response_text": self.NO_CONTEXT_RESPONSE, "sources": []}}
+            return
 
-        return {"response_text": generated_text, "sources": sources}
+        messages, used_chunks = self._build_messages(user_query, retrieved_chunks)
+        tokens: List[str] = []
+        try:
+            async for token in self.llm_client.chat_stream(model=self.model_name, messages=messages):
+                tokens.append(token)
+                yield {"type": "token", "token": token}
+        except Exception:
+            logger.exception("Error calling Ollama")
+            if not tokens:
+                tokens = [self.LLM_ERROR_RESPONSE]
+                yield {"type": "token", "token": self.LLM_ERROR_RESPONSE}
+
+        generated_text = "".join(tokens)
+        self.record_turn(user_query, generated_text)
+        yield {"type": "response", "response": {"response_text": generated_text, "sources": self._build_sources(used_chunks),
+                                                "context": self.last_context_stats}}
 
-    def _call_ollama(self, messages: List[Dict[str, str]]) -> str:
+    async def _call_ollama(self, messages: List[Dict[str, str]]) -> str:
         """
         Internal method to call the local Ollama model using the chat API.
         
@@ -116,17 +202,22 @@ class RAGAgent:
             str: The generated response from the model.
         """
         try:
-            response = ollama.chat(
+            response = await self.llm_client.chat(
                 model=self.model_name,
                 messages=messages,
                 stream=False
             )
             return response['message']['content']
-        except Exception as e:
+        except Exception:
             # Removed the problematic pop from self.conversation_history on error,
             # as the permanent history is only updated *after* a successful LLM call.
-            print(f"Error calling Ollama: {e}") # Log the actual error for debugging
-            return "Error: Could not get response from the LLM."
+            logger.exception("Error calling Ollama")
+            return self.LLM_ERROR_RESPONSE
+
+    @property
+    def has_history(self) -> bool:
+        """Whether earlier turns of the conversation are part of the next prompt."""
+        return len(self.conversation_history) > 1 or bool(self.earlier_questions)
 
     def get_conversation_history(self) -> List[Dict[str, str]]:
         """
@@ -139,4 +230,6 @@ class RAGAgent:
         Clears the conversation history, resetting it to only the initial system prompt.
         """
         self.conversation_history = []
+        self.earlier_questions = []
+        self.conversation_tokens = 0
         self._initialize_system_prompt()
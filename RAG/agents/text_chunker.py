@@ -0,0 +1,142 @@
+import hashlib
+import re
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Estimates the number of model tokens in `text` by counting words and punctuation
+    marks, which tracks subword tokenizers closely enough for budgeting chunks.
+    """
+    return len(_TOKEN.findall(text))
+
+
+class TextChunker:
+    """
+    Splits a document into chunks of at most `max_tokens` tokens along its structure.
+
+    Chunks never span a heading: each heading starts a new chunk and is attached to
+    the chunks of its section. Within a section, whole paragraphs are packed into a
+    chunk; a paragraph that does not fit on its own is split into sentences, and a
+    sentence that does not fit into words. Consecutive chunks of a section share up
+    to `overlap_tokens` tokens of trailing paragraphs or sentences.
+
+    Chunking is a single pass that yields chunks as they are completed, and duplicate
+    chunks are dropped by comparing fixed-size hashes of their text.
+    """
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 48):
+        """
+        Args:
+            max_tokens (int): The token budget of a chunk.
+            overlap_tokens (int): The most tokens a chunk repeats from the previous one.
+        """
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+
+    def chunks(self, text: str, blocks: Optional[Sequence[Tuple[str, str]]] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Chunks a document.
+
+        Args:
+            text (str): The document text; used when `blocks` is not given, with each
+                        line treated as a paragraph.
+            blocks (Optional[Sequence[Tuple[str, str]]]): The (tag, text) headings and
+                        paragraphs found by `ParserAgent`, in document order.
+
+        Yields:
+            Tuple[str, Optional[str]]: Each unique chunk's text and the heading of the
+                                       section it belongs to, if any.
+        """
+        if blocks is None:
+            blocks = (("p", line) for line in text.split("\n"))
+        seen = set()
+        for chunk, heading in self._pack(blocks):
+            digest = hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).digest()
+            if digest not in seen:
+                seen.add(digest)
+                yield chunk, heading
+
+    def _sentences(self, text: str) -> Iterator[Tuple[str, int]]:
+        """Breaks an oversized paragraph into sentences, and oversized sentences into word windows."""
+        for sentence in _SENTENCE_END.split(text):
+            sentence_tokens = approximate_token_count(sentence)
+            if sentence_tokens <= self.max_tokens:
+                yield sentence, sentence_tokens
+                continue
+            words: List[str] = []
+            window_tokens = 0
+            for word in sentence.split():
+                word_tokens = approximate_token_count(word)
+                if words and window_tokens + word_tokens > self.max_tokens:
+                    yield " ".join(words), window_tokens
+                    words, window_tokens = [], 0
+                words.append(word)
+                window_tokens += word_tokens
+            if words:
+                yield " ".join(words), window_tokens
+
+    def _units(self, text: str) -> Iterator[Tuple[str, int, str]]:
+        """Yields (text, tokens, separator) units of an oversized paragraph that each fit the budget."""
+        separator = "\n"
+        for sentence, tokens in self._sentences(text):
+            yield sentence, tokens, separator
+            separator = " "
+
+    def _pack(self, blocks: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, Optional[str]]]:
+        heading: Optional[str] = None
+        # Units of the chunk being built: (text, tokens, separator before it).
+        units: List[Tuple[str, int, str]] = []
+        used = 0
+        fresh = 0  # units not carried over from the previous chunk
+        heading_only = False  # the chunk holds nothing but headings so far
+
+        def emit() -> str:
+            return "".join(separator + unit for unit, _, separator in units).lstrip()
+
+        for tag, block in blocks:
+            block = block.strip()
+            if not block:
+                continue
+            tokens = approximate_token_count(block)
+            if tag in HEADING_TAGS and tokens <= self.max_tokens:
+                if heading_only and used + tokens <= self.max_tokens:
+                    # Consecutive headings ("Chapter 2", "2.1 Setup") introduce the same text.
+                    units.append((block, tokens, "\n"))
+                    used += tokens
+                    fresh += 1
+                    heading = block
+                    continue
+                if fresh:
+                    yield emit(), heading
+                heading = block
+                units, used, fresh, heading_only = [(block, tokens, "\n")], tokens, 1, True
+                continue
+
+            pieces = [(block, tokens, "\n")] if tokens <= self.max_tokens else self._units(block)
+            for piece in pieces:
+                if used + piece[1] > self.max_tokens:
+                    if fresh and not heading_only:
+                        yield emit(), heading
+                        # Carry trailing units over, within the overlap budget.
+                        carried, carried_tokens = [], 0
+                        for unit in reversed(units):
+                            if carried_tokens + unit[1] > self.overlap_tokens:
+                                break
+                            carried.append(unit)
+                            carried_tokens += unit[1]
+                        units, used = carried[::-1], carried_tokens
+                    # Drop carried units that leave no room for the new one.
+                    while units and used + piece[1] > self.max_tokens:
+                        used -= units.pop(0)[1]
+                    fresh = 0
+                units.append(piece)
+                used += piece[1]
+                fresh += 1
+                heading_only = False
+        if fresh:
+            yield emit(), heading
@@ -1,7 +1,10 @@
-import ollama
 from pydantic import BaseModel, Field, ValidationError
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
+import random
+
+from .faithfulness import FaithfulnessScorer
+from .llm_client import AsyncOllamaClient
 
 class OllamaValidationResult(BaseModel):
     is_valid: bool = Field(..., description="True if the AI's answer is valid, faithful, and relevant; False otherwise.")
@@ -14,17 +17,37 @@ class ValidationQAAgent:
     The Validation/QA Agent is responsible for evaluating the quality, accuracy,
     and faithfulness of the RAG Agent's generated response to the provided context
     using an Ollama Llama3.2 model.
+
+    In "tiered" mode (the default) a response is first checked locally with a
+    `FaithfulnessScorer`: a faithfulness score of at least `accept_threshold` passes and
+    one below `reject_threshold` fails without a model call, and only the ambiguous
+    scores in between are escalated to the LLM judge. "local" mode never calls the model
+    (ambiguous scores pass if they reach the midpoint of the two thresholds) and "llm"
+    mode always does. A fraction `audit_sample_rate` of the local decisions is also sent
+    to the LLM judge, and its verdict is attached under "audit" to measure agreement.
     """
-    def __init__(self):
+    MODES = ("tiered", "local", "llm")
+
+    def __init__(self, llm_client: Optional[AsyncOllamaClient] = None, mode: str = "tiered",
+                 accept_threshold: float = 0.7, reject_threshold: float = 0.35, audit_sample_rate: float = 0.0,
+                 scorer: Optional[FaithfulnessScorer] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}, got {mode!r}")
         self.model_name = "llama3.2"
         self.temperature = 0.1
+        self.llm_client = llm_client or AsyncOllamaClient()
+        self.mode = mode
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.audit_sample_rate = audit_sample_rate
+        self.scorer = scorer or FaithfulnessScorer()
 
     async def _call_ollama_llama3_2_structured(self, prompt_message: str) -> OllamaValidationResult:
         """
         Makes an asynchronous call to the Ollama Llama3.2 model for structured validation.
         """
         try:
-            response_structured = ollama.chat(
+            response_structured = await self.llm_client.chat(
                 model=self.model_name,
                 messages=[
                     {'role': 'user', 'content': prompt_message}
@@ -50,10 +73,34 @@ class ValidationQAAgent:
             return OllamaValidationResult(is_valid=False, reason=f"Ollama API call failed: {e}")
 
 
+    def local_judgment(self, response_text: str, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        The local tier: judges a response from its `FaithfulnessScorer` scores.
+
+        Returns:
+            Dict[str, Any]: The validation result; 'is_valid' is None when the score is
+                            ambiguous and the LLM judge should decide.
+        """
+        scores = self.scorer.score(response_text, user_query, retrieved_chunks)
+        faithfulness = scores["faithfulness_score"]
+        result = {"faithfulness_score": faithfulness, "relevance_score": scores["relevance_score"], "tier": "local"}
+        if scores["abstained"]:
+            # Abstaining is valid when the context really lacks the answer; when it covers
+            # the whole query the model may have missed something.
+            if scores["context_coverage"] >= self.accept_threshold:
+                return {**result, "is_valid": None, "reason": "The response abstains although the context covers the query."}
+            return {**result, "is_valid": True, "reason": "The response abstains and the context does not cover the query."}
+        if faithfulness >= self.accept_threshold:
+            return {**result, "is_valid": True, "reason": "The response is supported by the retrieved context."}
+        unsupported = "; ".join(scores["unsupported_sentences"][:3])
+        if faithfulness < self.reject_threshold:
+            return {**result, "is_valid": False, "reason": f"The response is not supported by the retrieved context: {unsupported}"}
+        return {**result, "is_valid": None, "reason": f"Partly unsupported by the retrieved context: {unsupported}"}
+
     async def validate(self, rag_response: Dict[str, Any], user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Validates the RAG Agent's response against the user query and retrieved context
-        using the Llama3.2 model.
+        Validates the RAG Agent's response against the user query and retrieved context,
+        locally and/or with the Llama3.2 model depending on `mode`.
 
         Args:
             rag_response (Dict[str, Any]): The response generated by the RAG Agent,
@@ -62,14 +109,32 @@ class ValidationQAAgent:
             retrieved_chunks (List[Dict[str, Any]]): The chunks used to generate the response.
 
         Returns:
-            Dict[str, Any]: A dictionary indicating if the response is valid and a reason if not.
-                            Example: {"is_valid": True, "reason": "Response is relevant and grounded."}
+            Dict[str, Any]: A dictionary indicating if the response is valid and a reason if not,
+                            and the 'tier' ("local" or "llm") that decided.
+                            Example: {"is_valid": True, "reason": "Response is relevant and grounded.", "tier": "llm"}
         """
 
         response_text = rag_response.get("response_text", "")
         if not response_text.strip():
-            return {"is_valid": False, "reason": "Response is empty."}
+            return {"is_valid": False, "reason": "Response is empty.", "tier": "local"}
+        if self.mode == "llm":
+            return {**await self.llm_judgment(response_text, user_query, retrieved_chunks), "tier": "llm"}
+
+        result = self.local_judgment(response_text, user_query, retrieved_chunks)
+        if result["is_valid"] is None:
+            if self.mode == "tiered":
+                llm_result = await self.llm_judgment(response_text, user_query, retrieved_chunks)
+                return {**llm_result, "tier": "llm", "local_faithfulness_score": result["faithfulness_score"]}
+            result["is_valid"] = result["faithfulness_score"] >= (self.accept_threshold + self.reject_threshold) / 2
+
+        if self.audit_sample_rate and random.random() < self.audit_sample_rate:
+            llm_result = await self.llm_judgment(response_text, user_query, retrieved_chunks)
+            result["audit"] = {"is_valid": llm_result["is_valid"], "reason": llm_result["reason"],
+                               "agrees": llm_result["is_valid"] == result["is_valid"]}
+        return result
 
+    async def llm_judgment(self, response_text: str, user_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """The LLM tier: asks the model to judge the response against the context."""
         context_texts = [chunk["text"] for chunk in retrieved_chunks]
         context_str = "\n".join([f"Chunk {i+1}:\n{text}" for i, text in enumerate(context_texts)])
         if not context_str:
@@ -0,0 +1,279 @@
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from search_engine import ExactSearchEngine, select_top_k
+from vector_store import GrowableArray, MemmapVectorStore, normalize_rows
+
+
+class IVFIndex:
+    """
+    An inverted-file (IVF) approximate nearest-neighbour index over a MemmapVectorStore,
+    implemented in pure NumPy.
+
+    Rows are clustered around `nlist` spherical k-means centroids. A search only scores
+    the rows of the `nprobe` lists whose centroids are closest to the query, so raising
+    `nprobe` trades speed for recall. Until the store holds `min_train_rows` rows the
+    index is untrained and searches fall back to exact search.
+
+    The index is persisted next to the store: `ivf_centroids.npy` holds the centroids and
+    `ivf_assignments.i32` holds the list id of every store row. Assignments are appended as
+    `update` runs, so the index is built incrementally without rewriting existing data.
+    As with `BM25Index`, the files are written under the store's lock and rows assigned
+    by another process are loaded rather than assigned again. When the store is
+    compacted, the rows of the new generation are reassigned to the same centroids.
+
+    Centroids trained on a small store fit a large one poorly, and lists grow long: once
+    the store holds `retrain_growth` times the rows the centroids were trained on, the
+    index is retrained (with a larger `nlist`, unless it was given).
+    """
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ASSIGNMENTS_FILE = "ivf_assignments.i32"
+    CONFIG_FILE = "ivf_config.json"
+
+    def __init__(self, store: MemmapVectorStore, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_train_rows: int = 10000, kmeans_iterations: int = 10, seed: int = 0,
+                 retrain_growth: float = 4.0):
+        self.store = store
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.retrain_growth = retrain_growth
+        self.exact_engine = ExactSearchEngine(store)
+        self.centroids: Optional[np.ndarray] = None
+        self._generation = store.generation
+        self._trained_rows = 0
+        self._assignments = GrowableArray(np.int32)
+        self._lists: List[GrowableArray] = []
+        self.update()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store.data_dir, name)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _load_trained_rows(self) -> int:
+        try:
+            with open(self._path(self.CONFIG_FILE), 'r', encoding='utf-8') as f:
+                return int(json.load(f).get("trained_rows", 0))
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _load(self):
+        """Loads a persisted index; assignments beyond the store's committed rows are dropped."""
+        try:
+            centroids = np.load(self._path(self.CENTROIDS_FILE))
+            assignments = np.fromfile(self._path(self.ASSIGNMENTS_FILE), dtype=np.int32)
+        except (FileNotFoundError, ValueError):
+            self.centroids = None
+            return
+        if centroids.shape[1] != self.store.dim:
+            self.centroids = None
+            return
+        self.centroids = centroids
+        self._trained_rows = self._load_trained_rows()
+        self._set_assignments(assignments[:self.store.row_count])
+
+    def _load_tail(self):
+        """
+        Loads the assignments appended to disk by other processes since the last load,
+        or the whole index if another process retrained it.
+        """
+        if self._load_trained_rows() != self._trained_rows:
+            self._load()
+            return
+        try:
+            assignments = np.fromfile(self._path(self.ASSIGNMENTS_FILE), dtype=np.int32,
+                                      offset=len(self._assignments) * 4)
+        except (FileNotFoundError, ValueError):
+            return
+        assignments = assignments[:max(0, self.store.row_count - len(self._assignments))]
+        if assignments.shape[0]:
+            self._add_assignments(assignments)
+
+    def _add_assignments(self, new_assignments: np.ndarray):
+        indexed = len(self._assignments)
+        self._assignments.extend(new_assignments)
+        new_rows = np.arange(indexed, indexed + new_assignments.shape[0], dtype=np.int64)
+        for list_id in np.unique(new_assignments):
+            self._lists[list_id].extend(new_rows[new_assignments == list_id])
+
+    def _save(self, trained_rows: int):
+        self._trained_rows = trained_rows
+        np.save(self._path(self.CENTROIDS_FILE), self.centroids)
+        self._assignments.view.tofile(self._path(self.ASSIGNMENTS_FILE))
+        with open(self._path(self.CONFIG_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"nlist": self.centroids.shape[0], "trained_rows": trained_rows}, f)
+
+    def _set_assignments(self, assignments: np.ndarray):
+        """Replaces every row's assignment and rebuilds the inverted lists."""
+        self._assignments = GrowableArray(np.int32, values=assignments)
+        order = np.argsort(assignments, kind='stable')
+        boundaries = np.searchsorted(assignments[order], np.arange(self.centroids.shape[0] + 1))
+        self._lists = [GrowableArray(np.int64, values=order[boundaries[i]:boundaries[i + 1]])
+                       for i in range(self.centroids.shape[0])]
+
+    def _assign(self, vectors: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], block_rows):
+            block = np.asarray(vectors[start:start + block_rows])
+            assignments[start:start + block_rows] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self):
+        """
+        (Re)trains the centroids with spherical k-means on a sample of the store and
+        reassigns every row. Called automatically once the store reaches `min_train_rows`.
+        """
+        matrix = self.store.matrix()
+        n = matrix.shape[0]
+        if n == 0:
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * 256)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, size=sample_size, replace=False))])
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids.astype(np.float32)
+        self._set_assignments(self._assign(matrix))
+        with self.store.locked():
+            self._save(n)
+
+    def update(self):
+        """
+        Indexes the rows appended to the store since the last call. Rows are assigned to
+        their nearest centroid and the assignments are appended to disk.
+        """
+        with self.store.locked():
+            self.store.refresh()
+            if self._generation != self.store.generation:
+                self._generation = self.store.generation
+                self._assignments = GrowableArray(np.int32)
+                previous_centroids, self.centroids = self.centroids, None
+                self._load()
+                if not self.is_trained and previous_centroids is not None and self.store.row_count:
+                    self.centroids = previous_centroids
+                    self._set_assignments(self._assign(self.store.matrix()))
+                    self._save(self._trained_rows)
+            elif not self.is_trained:
+                self._load()
+            else:
+                self._load_tail()
+
+            if not self.is_trained:
+                if self.store.row_count >= self.min_train_rows:
+                    self.train()
+                return
+
+            if self.store.row_count >= self.retrain_growth * max(1, self._trained_rows):
+                self.train()
+                return
+
+            indexed = len(self._assignments)
+            if self.store.row_count <= indexed:
+                return
+            new_assignments = self._assign(self.store.matrix()[indexed:])
+            with open(self._path(self.ASSIGNMENTS_FILE), 'ab') as f:
+                f.write(new_assignments.tobytes())
+            self._add_assignments(new_assignments)
+
+    def search(self, queries: np.ndarray, top_k: int = 5,
+               mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Approximate search with the same contract as `ExactSearchEngine.search`.
+
+        Args:
+            queries (np.ndarray): A single query of shape (dim,) or a batch of shape (batch, dim).
+            top_k (int): The number of rows to return per query.
+            mask (Optional[np.ndarray]): Boolean mask over physical rows; defaults to live rows.
+            nprobe (Optional[int]): Overrides the configured number of lists probed.
+
+        Returns:
+            List[List[Tuple[int, float]]]: For each query, (row, score) pairs sorted by
+                                           descending score.
+        """
+        if not self.is_trained:
+            return self.exact_engine.search(queries, top_k=top_k, mask=mask)
+
+        queries = normalize_rows(np.atleast_2d(queries))
+        if mask is None:
+            mask = self.store.live_mask()
+        matrix = self.store.matrix()
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probe in zip(queries, probes):
+            candidates = np.concatenate([self._lists[list_id].view for list_id in probe])
+            candidates = np.sort(candidates[mask[candidates]])
+            if candidates.shape[0] == 0:
+                results.append([])
+                continue
+            scores = matrix[candidates] @ query
+            hits = select_top_k(scores[np.newaxis, :], top_k)[0]
+            results.append([(int(candidates[i]), score) for i, score in hits])
+        return results
+
+
+def recall_at_k(index: Any, exact_engine: ExactSearchEngine, queries: np.ndarray,
+                k: int = 10, **search_kwargs) -> float:
+    """
+    Measures the mean recall@k of an approximate index against exact search:
+    the fraction of each query's true top-k rows that the index also returns.
+
+    Args:
+        index (Any): An index with a `search(queries, top_k, ...)` method (e.g. IVFIndex).
+        exact_engine (ExactSearchEngine): The exact reference engine.
+        queries (np.ndarray): Query vectors of shape (batch, dim).
+        k (int): The cut-off.
+        **search_kwargs: Extra arguments for `index.search`, e.g. `nprobe=16`.
+
+    Returns:
+        float: Mean recall@k in [0, 1].
+    """
+    approximate = index.search(queries, top_k=k, **search_kwargs)
+    exact = exact_engine.search(queries, top_k=k)
+    recalls = []
+    for approx_hits, exact_hits in zip(approximate, exact):
+        truth = {row for row, _ in exact_hits}
+        if truth:
+            recalls.append(len(truth & {row for row, _ in approx_hits}) / len(truth))
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def tune_nprobe(index: IVFIndex, queries: np.ndarray, k: int = 10,
+                nprobe_values: Tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64)) -> List[Dict[str, Any]]:
+    """
+    Reports recall@k and mean query latency for each nprobe setting, so the
+    recall/speed trade-off can be picked for a given corpus.
+    """
+    report = []
+    for nprobe in nprobe_values:
+        start = time.perf_counter()
+        index.search(queries, top_k=k, nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        report.append({
+            "nprobe": nprobe,
+            "recall_at_k": recall_at_k(index, index.exact_engine, queries, k=k, nprobe=nprobe),
+            "latency_ms": 1000 * elapsed / max(1, len(queries)),
+        })
+    return report
@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Set
+
+import numpy as np
+
+from telemetry import metrics
+from vector_store import normalize_rows
+
+metrics.describe("rag_answer_cache_lookups_total", "Semantic answer cache lookups by result (hit or miss).")
+metrics.describe("rag_answer_cache_evictions_total", "Answer cache entries dropped, by reason (ttl, lru or invalidated).")
+
+
+class SemanticAnswerCache:
+    """
+    An in-memory cache of validated answers, looked up by query similarity.
+
+    A query hits when the cosine similarity between its embedding and that of a cached
+    query is at least `similarity_threshold`; the most similar live entry is returned.
+    Entries belong to a scope (e.g. the collection the answer was retrieved from) and
+    only match queries in the same scope. Each entry remembers the sources
+    (`source_url` metadata) of the chunks its answer was generated from, and `invalidate_sources` drops every entry that used a source
+    when that source is re-ingested with new content.
+
+    Entries expire `ttl_s` seconds after they were stored, and past `max_entries` the
+    least recently used entry is evicted. Safe to use from several threads.
+    """
+    def __init__(self, similarity_threshold: float = 0.95, ttl_s: float = 3600.0, max_entries: int = 1024):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_source: Dict[str, Set[int]] = {}
+        self._ids = itertools.count()
+        # Embeddings of the entries, rebuilt lazily after the entries change.
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self._matrix_scopes: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        metrics.gauge_callback("rag_answer_cache_entries", lambda: len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int, reason: str):
+        entry = self._entries.pop(entry_id)
+        for source in entry["sources"]:
+            entry_ids = self._by_source.get(source)
+            if entry_ids is not None:
+                entry_ids.discard(entry_id)
+                if not entry_ids:
+                    del self._by_source[source]
+        self._matrix = None
+        metrics.inc("rag_answer_cache_evictions_total", reason=reason)
+
+    def _expire(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry["stored_at"] > self.ttl_s]
+        for entry_id in expired:
+            self._remove(entry_id, "ttl")
+
+    def lookup(self, query_embedding: List[float], scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Finds the cached answer of the most similar earlier query.
+
+        Args:
+            query_embedding (List[float]): The embedding of the new query.
+            scope (str): Only entries stored under this scope are considered.
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored entry ('query', 'answer', 'similarity', ...)
+                                      on a hit, otherwise None.
+        """
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32)[np.newaxis, :])[0]
+        with self._lock:
+            self._expire(time.time())
+            entry = None
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_ids = list(self._entries)
+                    self._matrix = np.stack([self._entries[entry_id]["embedding"] for entry_id in self._matrix_ids])
+                    self._matrix_scopes = np.asarray([self._entries[entry_id]["scope"] for entry_id in self._matrix_ids],
+                                                     dtype=object)
+                if self._matrix.shape[1] == query.shape[0]:
+                    similarities = self._matrix @ query
+                    similarities[self._matrix_scopes != scope] = -np.inf
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        entry_id = self._matrix_ids[best]
+                        self._entries.move_to_end(entry_id)
+                        entry = {**self._entries[entry_id], "similarity": float(similarities[best])}
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.inc("rag_answer_cache_lookups_total", result="miss" if entry is None else "hit")
+        return entry
+
+    def put(self, query_embedding: List[float], query: str, answer: Dict[str, Any], sources: Iterable[str],
+            scope: str = ""):
+        """
+        Stores a validated answer.
+
+        Args:
+            query_embedding (List[float]): The embedding of the query that was answered.
+            query (str): The query text.
+            answer (Dict[str, Any]): What to return on a hit (e.g. the response, its source
+                                     chunks and the validation result).
+            sources (Iterable[str]): The sources of the chunks the answer was generated from.
+            scope (str): The scope the entry belongs to.
+        """
+        sources = set(source for source in sources if source)
+        embedding = normalize_rows(np.asarray(query_embedding, dtype=np.float32)[np.newaxis, :])[0]
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {"query": query, "answer": answer, "sources": sources, "scope": scope,
+                                       "embedding": embedding, "stored_at": time.time()}
+            for source in sources:
+                self._by_source.setdefault(source, set()).add(entry_id)
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), "lru")
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        """Drops every entry whose answer used one of `sources`; returns how many were dropped."""
+        with self._lock:
+            entry_ids = set()
+            for source in sources:
+                entry_ids.update(self._by_source.get(source, ()))
+            for entry_id in entry_ids:
+                self._remove(entry_id, "invalidated")
+        return len(entry_ids)
+
+    def invalidate_scope(self, scope: str) -> int:
+        """Drops every entry stored under `scope`; returns how many were dropped."""
+        with self._lock:
+            entry_ids = [entry_id for entry_id, entry in self._entries.items() if entry["scope"] == scope]
+            for entry_id in entry_ids:
+                self._remove(entry_id, "invalidated")
+        return len(entry_ids)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the current hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,105 @@
+"""
+Benchmark for document chunking.
+
+Builds documentation-style pages of several sizes (see `parser_bench`), parses them
+with `ParserAgent`, and chunks the result with both the structure-aware `TextChunker`
+used by `ChunkingEmbeddingAgent` and the fixed character-window chunker it replaced.
+For each it reports throughput, the time until the first chunk is available, chunk
+sizes in tokens, and how many chunks start and end on a sentence boundary.
+
+Usage (from the RAG directory):
+    python -m benchmarks.chunker_bench --megabytes 1 4 8
+"""
+import argparse
+import json
+import time
+from typing import List, Dict, Any, Callable, Iterator
+
+import numpy as np
+
+from agents.parser_agent import ParserAgent
+from agents.text_chunker import TextChunker, approximate_token_count
+from .parser_bench import documentation_page
+
+SECTION_BYTES = 820  # average size of a generated section
+
+
+def character_chunks(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    """The previous chunker: fixed character windows, then a second pass to drop duplicates."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - chunk_overlap
+        if chunk_overlap > 0 and start >= len(text):
+            break
+    step = chunk_size - chunk_overlap
+    if start - step < len(text) and text[start - step:] not in chunks:
+        chunks.append(text[start - step:])
+    seen, unique = set(), []
+    for chunk in chunks:
+        if chunk not in seen:
+            unique.append(chunk)
+            seen.add(chunk)
+    return unique
+
+
+def _clean_start(chunk: str) -> bool:
+    return chunk[:1].isupper() or chunk[:1].isdigit()
+
+
+def _clean_end(chunk: str) -> bool:
+    return chunk.rstrip()[-1:] in ".!?:)" or chunk.rstrip().endswith("</code>")
+
+
+def measure(chunker: Callable[[], Iterator[str]], text_bytes: int, repeat: int) -> Dict[str, Any]:
+    latencies, first_chunk = [], []
+    chunks: List[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        iterator = iter(chunker())
+        first = next(iterator, None)
+        first_chunk.append(time.perf_counter() - start)
+        chunks = ([first] if first is not None else []) + list(iterator)
+        latencies.append(time.perf_counter() - start)
+    tokens = np.asarray([approximate_token_count(chunk) for chunk in chunks])
+    p50 = float(np.median(latencies))
+    return {
+        "p50_ms": round(p50 * 1000, 2),
+        "mb_per_s": round(text_bytes / p50 / 1e6, 2),
+        "first_chunk_ms": round(float(np.median(first_chunk)) * 1000, 3),
+        "chunks": len(chunks),
+        "tokens_mean": round(float(tokens.mean()), 1) if len(chunks) else 0.0,
+        "tokens_max": int(tokens.max()) if len(chunks) else 0,
+        "clean_start_pct": round(100 * sum(map(_clean_start, chunks)) / max(1, len(chunks)), 1),
+        "clean_end_pct": round(100 * sum(map(_clean_end, chunks)) / max(1, len(chunks)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text_chunker = TextChunker(args.max_tokens, args.overlap_tokens)
+    results = []
+    for megabytes in args.megabytes:
+        page = documentation_page(max(1, int(megabytes * 1e6 / SECTION_BYTES)))
+        parsed = ParserAgent().parse(page)
+        text, blocks = parsed["text"], parsed["blocks"]
+        text_bytes = len(text.encode('utf-8'))
+        results.append({
+            "page_mb": round(len(page) / 1e6, 2),
+            "text_mb": round(text_bytes / 1e6, 2),
+            "structured": measure(lambda: (chunk for chunk, _ in text_chunker.chunks(text, blocks)),
+                                  text_bytes, args.repeat),
+            "character": measure(lambda: character_chunks(text), text_bytes, args.repeat),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
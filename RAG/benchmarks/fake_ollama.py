@@ -0,0 +1,173 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int = 64) -> List[float]:
+    """
+    A deterministic bag-of-words hashing embedding: texts sharing words get similar
+    vectors, so retrieval against it behaves plausibly in benchmarks.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], 'little') % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+class FakeOllamaServer:
+    """
+    A local stand-in for the Ollama HTTP API, for exercising the embedding and chat
+    paths without a model. Runs a threaded HTTP server in a background thread.
+
+    Supported endpoints: `/api/embed` (batch), `/api/embeddings` (single) and `/api/chat`.
+    Embedding requests sleep `latency_s` plus `per_item_latency_s` per input; chat
+    requests sleep `chat_latency_s` before the first token and, when streamed
+    (`"stream": true`), `token_latency_s` between tokens. Chat replies follow the requested `format`: a JSON
+    list of expansion terms for `format="json"`, a passing validation result for a JSON
+    schema, and otherwise the first sentence of the prompt's context as the answer.
+    The server tracks the request count and the peak number of requests in flight.
+
+    Usage:
+        with FakeOllamaServer(latency_s=0.05) as server:
+            agent = ChunkingEmbeddingAgent(ollama_host=server.url)
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dim: int = 64,
+                 latency_s: float = 0.0, per_item_latency_s: float = 0.0,
+                 chat_latency_s: float = 0.0, token_latency_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.per_item_latency_s = per_item_latency_s
+        self.chat_latency_s = chat_latency_s
+        self.token_latency_s = token_latency_s
+        self.request_count = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _enter_request(self):
+        with self._lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _leave_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def handle(self, path: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Builds the JSON response for an endpoint, or None for an unknown path."""
+        model = payload.get("model", "")
+        if path == "/api/embed":
+            inputs = payload.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+            time.sleep(self.latency_s + self.per_item_latency_s * len(inputs))
+            return {"model": model, "embeddings": [fake_embedding(text, self.dim) for text in inputs]}
+        if path == "/api/embeddings":
+            time.sleep(self.latency_s + self.per_item_latency_s)
+            return {"embedding": fake_embedding(payload.get("prompt", ""), self.dim)}
+        if path == "/api/chat":
+            time.sleep(self.chat_latency_s)
+            return {"model": model, "created_at": "1970-01-01T00:00:00Z", "done": True,
+                    "message": {"role": "assistant", "content": self.chat_reply(payload)}}
+        return None
+
+    def stream_chat(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yields streamed /api/chat parts, one word per part, then a final `done` part."""
+        model = payload.get("model", "")
+        time.sleep(self.chat_latency_s)
+        for i, token in enumerate(re.findall(r"\S+\s*", self.chat_reply(payload))):
+            if i:
+                time.sleep(self.token_latency_s)
+            yield {"model": model, "created_at": "1970-01-01T00:00:00Z", "done": False,
+                   "message": {"role": "assistant", "content": token}}
+        yield {"model": model, "created_at": "1970-01-01T00:00:00Z", "done": True,
+               "message": {"role": "assistant", "content": ""}}
+
+    def chat_reply(self, payload: Dict[str, Any]) -> str:
+        """Builds a deterministic chat reply for the request's output format."""
+        messages = payload.get("messages") or [{"content": ""}]
+        prompt = messages[-1].get("content", "")
+        response_format = payload.get("format")
+        if response_format == "json":
+            words = re.findall(r"\w+", prompt.split("User Query:")[-1].lower())[:4]
+            return json.dumps({"expanded_terms": [" ".join(words[i:]) for i in range(len(words))] or ["query"]})
+        if isinstance(response_format, dict):
+            return json.dumps({"is_valid": True, "reason": "Answer is supported by the context.",
+                               "faithfulness_score": 1.0, "relevance_score": 1.0})
+        context = prompt.split("Context:", 1)[-1].split("User Query:", 1)[0].strip()
+        return (context.split(". ")[0] or "I don't have enough information.").strip()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                server._enter_request()
+                try:
+                    if self.path == "/api/chat" and payload.get("stream"):
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        for part in server.stream_chat(payload):
+                            self.wfile.write(json.dumps(part).encode('utf-8') + b"\n")
+                            self.wfile.flush()
+                        return
+                    body = server.handle(self.path, payload)
+                finally:
+                    server._leave_request()
+                if body is None:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on the request, e.g. a cancelled call
+
+        return Handler
@@ -0,0 +1,114 @@
+"""
+Benchmark for the HTML parsing backends of `ParserAgent`.
+
+Generates documentation-style pages (navigation, headings, paragraphs with inline
+markup and entities, code blocks, tables, scripts and styles), parses each one with
+every available backend, and reports throughput and latency. It also checks that the
+"streaming" backend, given both str and bytes input, produces exactly the same output
+as the BeautifulSoup reference.
+
+Usage (from the RAG directory):
+    python -m benchmarks.parser_bench --sections 2000 --repeat 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import List, Dict, Any
+
+import numpy as np
+
+from agents.parser_agent import ParserAgent
+
+WORDS = ("index vector query chunk embedding model latency cache request token stream "
+         "parser crawler server client retrieval context answer document").split()
+
+
+def documentation_page(sections: int, seed: int = 0) -> str:
+    """Builds a documentation-like HTML page with `sections` sections."""
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+        if rng.random() < 0.3:
+            words[rng.randrange(len(words))] = f"<code>{rng.choice(WORDS)}()</code>"
+        if rng.random() < 0.2:
+            words[rng.randrange(len(words))] = f'<a href="#s{rng.randrange(sections)}">{rng.choice(WORDS)}</a>'
+        if rng.random() < 0.2:
+            words.append("&amp; &lt;more&gt; &#8212; &nbsp;")
+        return " ".join(words).capitalize() + "."
+
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Reference manual</title>',
+             '<meta name="description" content=" Generated benchmark page ">',
+             '<style>body { font-family: sans-serif; } p { margin: 0; }</style>',
+             '<script>window.analytics = {"enabled": true};</script></head><body>',
+             '<nav><ul>' + "".join(f'<li><a href="#s{i}">Section {i}</a></li>' for i in range(min(sections, 50))) + '</ul></nav>']
+    for i in range(sections):
+        parts.append(f'<section id="s{i}"><h2>Section {i}: {rng.choice(WORDS)}</h2>')
+        for _ in range(rng.randint(1, 4)):
+            parts.append("<p>" + " ".join(sentence() for _ in range(rng.randint(1, 4))) + "</p>")
+        if rng.random() < 0.3:
+            parts.append("<pre><code>for item in items:\n    process(item)  # &lt;tag&gt;</code></pre>")
+        if rng.random() < 0.2:
+            parts.append("<table><tr><th>Name</th><th>Value</th></tr>" + "".join(
+                f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(0, 999)}</td></tr>" for _ in range(5)) + "</table>")
+        if rng.random() < 0.1:
+            parts.append(f"<h3>Notes</h3><!-- generated --><p>{sentence()}<br>{sentence()}</p>")
+        parts.append("</section>")
+    parts.append("<footer><p>Copyright &copy; 2024</p></footer></body></html>")
+    return "".join(parts)
+
+
+def time_backend(agent: ParserAgent, page: Any, repeat: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        agent.parse(page)
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    agent.parse(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(page.encode('utf-8')) if isinstance(page, str) else len(page)
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "min_ms": round(float(values.min()), 2),
+        "mb_per_s": round(size / (float(np.median(latencies)) * 1e6), 2),
+        "peak_alloc_mb": round(peak / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    page = documentation_page(args.sections, args.seed)
+    page_bytes = page.encode('utf-8')
+    reference = ParserAgent(backend="bs4").parse(page)
+    streaming = ParserAgent(backend="streaming")
+    identical = streaming.parse(page) == reference and streaming.parse(page_bytes) == reference
+
+    results: Dict[str, Any] = {"page_mb": round(len(page_bytes) / 1e6, 2), "identical_output": identical,
+                               "backends": {}}
+    for backend in ParserAgent.BACKENDS:
+        agent = ParserAgent(backend=backend)
+        if agent.backend != backend:
+            continue  # optional dependency (lxml) not installed
+        results["backends"][backend] = time_backend(agent, page, args.repeat)
+    results["backends"]["streaming_bytes"] = time_backend(streaming, page_bytes, args.repeat)
+    reference_ms = results["backends"]["bs4"]["p50_ms"]
+    for timing in results["backends"].values():
+        timing["speedup_vs_bs4"] = round(reference_ms / timing["p50_ms"], 2)
+
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Offline benchmark for the ingestion and query paths.
+
+Runs entirely on localhost: pages are served by a static fixture server, model calls go
+to `FakeOllamaServer` with configurable latency, and all state (vector store, caches,
+ingestion registry) lives in a scratch directory. The stages measured are:
+
+    chunking      `ChunkingEmbeddingAgent.prepare_chunks` on synthetic documents
+    store_append  `VectorDatabaseConnector.add_documents` building a synthetic corpus
+    search        `VectorDatabaseConnector.search` against that corpus
+    ingest        `OrchestrationLayer.ingest_document_workflow` over fixture pages
+    query         `OrchestrationLayer.handle_query_workflow` against the corpus
+
+Each stage reports throughput, latency percentiles (and, for the workflows, the
+percentiles of every sub-stage from the request trace) and the process's peak RSS
+after the stage. Synthetic corpus embeddings are computed with the same hashing
+embedding the fake server uses, so queries embedded by the server retrieve
+sensibly from them.
+
+Results are written as JSON. With `--baseline`, each metric is compared against a
+previously saved result and the command exits with status 1 if any metric got worse
+by more than `--tolerance` (throughputs must not drop, latencies and memory must not
+grow).
+
+Usage (from the RAG directory):
+    python -m benchmarks.pipeline_bench --corpus-chunks 100000 --output bench.json
+    python -m benchmarks.pipeline_bench --corpus-chunks 100000 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .fake_ollama import FakeOllamaServer, fake_embedding
+from .ws_load_test import serve_directory
+
+PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Summarizes latencies (in seconds) as mean and percentiles in milliseconds."""
+    if not seconds:
+        return {}
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    summary = {f"p{p}_ms": round(float(v), 3) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary["mean_ms"] = round(float(values.mean()), 3)
+    return summary
+
+
+def peak_rss_mb() -> float:
+    """The peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class SyntheticCorpus:
+    """
+    Generates chunks of random words from a fixed vocabulary, together with their
+    embeddings. A chunk's embedding equals `fake_embedding(text)`, but is computed in
+    bulk from per-word vectors so that corpora of a million chunks build in seconds.
+    """
+    def __init__(self, vocabulary_size: int = 5000, words_per_chunk: int = 40, dim: int = 64, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.words = [f"w{i}" for i in range(vocabulary_size)]
+        self.words_per_chunk = words_per_chunk
+        # fake_embedding of a single word is exactly that word's (unit) contribution to a
+        # text's unnormalized vector, so summing rows and normalizing reproduces it.
+        self.word_vectors = np.asarray([fake_embedding(word, dim) for word in self.words], dtype=np.float32)
+
+    def batch(self, size: int) -> Tuple[List[str], np.ndarray]:
+        """Returns `size` chunk texts and their L2-normalized embeddings."""
+        word_ids = self.rng.integers(len(self.words), size=(size, self.words_per_chunk))
+        vectors = self.word_vectors[word_ids].sum(axis=1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+        texts = [" ".join(self.words[i] for i in row) for row in word_ids]
+        return texts, vectors
+
+    def document(self, sentences: int) -> str:
+        """Returns a plain-text document of `sentences` sentences."""
+        texts, _ = self.batch(sentences)
+        return "\n".join(text.capitalize() + "." for text in texts)
+
+    def page(self, sections: int) -> str:
+        """Returns an HTML page with `sections` headed paragraphs."""
+        texts, _ = self.batch(sections)
+        return "<html><head><title>Fixture</title></head><body>" + "".join(
+            f"<h2>Section {i}</h2><p>{text}.</p>" for i, text in enumerate(texts)) + "</body></html>"
+
+    def query(self) -> str:
+        texts, _ = self.batch(1)
+        return " ".join(texts[0].split()[:6])
+
+
+def bench_chunking(orchestrator, corpus: SyntheticCorpus, documents: int, sentences: int) -> Dict[str, Any]:
+    agent = orchestrator.chunking_embedding_agent
+    parsed = [{"text": corpus.document(sentences), "metadata": {"source_url": f"synthetic://{i}"}}
+              for i in range(documents)]
+    latencies, chunk_count = [], 0
+    start = time.perf_counter()
+    for parsed_data in parsed:
+        t = time.perf_counter()
+        chunk_count += len(agent.prepare_chunks(parsed_data))
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(p["text"].encode('utf-8')) for p in parsed)
+    return {"documents": documents, "chunks": chunk_count,
+            "chunks_per_s": round(chunk_count / elapsed, 1),
+            "mb_per_s": round(total_bytes / elapsed / 1e6, 3),
+            **latency_summary(latencies), "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_store_append(orchestrator, corpus: SyntheticCorpus, chunks: int, batch_size: int) -> Dict[str, Any]:
+    connector = orchestrator.vector_db_connector
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, chunks, batch_size):
+        texts, vectors = corpus.batch(min(batch_size, chunks - offset))
+        batch = [{"chunk_id": f"synthetic-{offset + i}", "text": text, "embedding": vector,
+                  "metadata": {"source_url": "synthetic://corpus"}}
+                 for i, (text, vector) in enumerate(zip(texts, vectors))]
+        t = time.perf_counter()
+        if not connector.add_documents("synthetic", batch):
+            raise RuntimeError("add_documents failed while building the synthetic corpus")
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return {"chunks": chunks, "batch_size": batch_size,
+            "chunks_per_s": round(chunks / sum(latencies), 1),
+            "wall_seconds": round(elapsed, 3),
+            **latency_summary(latencies), "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_search(orchestrator, corpus: SyntheticCorpus, queries: int, top_k: int) -> Dict[str, Any]:
+    connector = orchestrator.vector_db_connector
+    query_vectors = [fake_embedding(corpus.query(), corpus.word_vectors.shape[1]) for _ in range(queries)]
+    connector.search(query_vectors[0], top_k)  # warm the memory map
+    latencies = []
+    for vector in query_vectors:
+        t = time.perf_counter()
+        connector.search(vector, top_k)
+        latencies.append(time.perf_counter() - t)
+    return {"queries": queries, "corpus_chunks": len(connector.store),
+            "queries_per_s": round(queries / sum(latencies), 1),
+            **latency_summary(latencies), "peak_rss_mb": peak_rss_mb()}
+
+
+def _trace_percentiles(traces: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    stages: Dict[str, List[float]] = {}
+    for timings in traces:
+        for stage, ms in timings.items():
+            stages.setdefault(stage, []).append(ms / 1000)
+    return {stage: latency_summary(values) for stage, values in sorted(stages.items())}
+
+
+async def bench_ingest(orchestrator, page_urls: List[str], concurrency: int) -> Dict[str, Any]:
+    from telemetry import RequestTrace
+
+    limiter = asyncio.Semaphore(concurrency)
+    latencies, traces, failures = [], [], 0
+
+    async def ingest(i: int, url: str):
+        nonlocal failures
+        trace = RequestTrace()
+        async with limiter:
+            t = time.perf_counter()
+            success = await orchestrator.ingest_document_workflow(url, f"page-{i}", trace)
+            latencies.append(time.perf_counter() - t)
+        failures += not success
+        traces.append(trace.as_dict())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ingest(i, url) for i, url in enumerate(page_urls)))
+    elapsed = time.perf_counter() - start
+    return {"pages": len(page_urls), "failures": failures, "concurrency": concurrency,
+            "pages_per_s": round(len(page_urls) / elapsed, 2),
+            **latency_summary(latencies), "stages": _trace_percentiles(traces),
+            "peak_rss_mb": peak_rss_mb()}
+
+
+async def bench_query(orchestrator, corpus: SyntheticCorpus, queries: int, concurrency: int) -> Dict[str, Any]:
+    limiter = asyncio.Semaphore(concurrency)
+    latencies, traces, statuses = [], [], {}
+
+    async def ask(question: str):
+        async with limiter:
+            t = time.perf_counter()
+            result = await orchestrator.handle_query_workflow(question)
+            latencies.append(time.perf_counter() - t)
+        statuses[result.get("status")] = statuses.get(result.get("status"), 0) + 1
+        traces.append(result.get("timings", {}))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(corpus.query()) for _ in range(queries)))
+    elapsed = time.perf_counter() - start
+    return {"queries": queries, "statuses": statuses, "concurrency": concurrency,
+            "queries_per_s": round(queries / elapsed, 2),
+            **latency_summary(latencies), "stages": _trace_percentiles(traces),
+            "peak_rss_mb": peak_rss_mb()}
+
+
+async def _bench_workflows(orchestrator, corpus: SyntheticCorpus, page_urls: List[str],
+                           queries: int, concurrency: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # One event loop for both workflows: the orchestrator's pooled clients are bound to it.
+    try:
+        ingest = await bench_ingest(orchestrator, page_urls, concurrency)
+        query = await bench_query(orchestrator, corpus, queries, concurrency)
+    finally:
+        await orchestrator.aclose()
+    return ingest, query
+
+
+def flatten_metrics(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flattens nested results into {"stage.metric": value} for the comparable metrics."""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, name + "."))
+        elif isinstance(value, (int, float)) and key.endswith(("_per_s", "_ms", "_mb")):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        min_delta_ms: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Compares the metrics of two runs.
+
+    Args:
+        results (Dict[str, Any]): The current run's results.
+        baseline (Dict[str, Any]): A previously saved run's results.
+        tolerance (float): The allowed relative change before a metric counts as a regression.
+        min_delta_ms (float): Latency changes smaller than this are never regressions, so
+                              sub-millisecond stages do not flag on timer noise.
+
+    Returns:
+        List[Dict[str, Any]]: One entry per metric present in both runs, with the relative
+                              change and whether it is a regression.
+    """
+    current, previous = flatten_metrics(results["stages"]), flatten_metrics(baseline["stages"])
+    comparison = []
+    for name in sorted(current.keys() & previous.keys()):
+        before, after = previous[name], current[name]
+        change = (after - before) / before if before else 0.0
+        higher_is_better = name.endswith("_per_s")
+        regression = change < -tolerance if higher_is_better else change > tolerance
+        if name.endswith("_ms") and abs(after - before) < min_delta_ms:
+            regression = False
+        comparison.append({"metric": name, "baseline": before, "current": after,
+                           "change": round(change, 4), "regression": regression})
+    return comparison
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    site_dir = os.path.join(workdir, "site")
+    os.makedirs(site_dir)
+    corpus = SyntheticCorpus(dim=args.dim, seed=args.seed)
+    for i in range(args.pages):
+        with open(os.path.join(site_dir, f"page{i}.html"), "w", encoding="utf-8") as f:
+            f.write(corpus.page(args.sections_per_page))
+
+    with FakeOllamaServer(dim=args.dim, latency_s=args.embed_latency, per_item_latency_s=args.embed_item_latency,
+                          chat_latency_s=args.chat_latency) as ollama_server:
+        os.environ["OLLAMA_HOST"] = ollama_server.url
+        site = serve_directory(site_dir)
+        from orchestration_layer import OrchestrationLayer
+        from vector_database_connector import VectorDatabaseConnector
+        os.chdir(workdir)
+
+        orchestrator = OrchestrationLayer(validation_mode=args.validation_mode)
+        if args.index != "exact":
+            orchestrator.vector_db_connector = VectorDatabaseConnector(
+                index=args.index, embedding_agent=orchestrator.chunking_embedding_agent)
+
+        page_urls = [f"http://127.0.0.1:{site.server_address[1]}/page{i}.html" for i in range(args.pages)]
+        stages: Dict[str, Any] = {}
+        stages["chunking"] = bench_chunking(orchestrator, corpus, args.chunk_documents, args.sentences_per_document)
+        stages["store_append"] = bench_store_append(orchestrator, corpus, args.corpus_chunks, args.append_batch_size)
+        stages["search"] = bench_search(orchestrator, corpus, args.search_queries, orchestrator.top_k)
+        stages["ingest"], stages["query"] = asyncio.run(
+            _bench_workflows(orchestrator, corpus, page_urls, args.queries, args.concurrency))
+        site.shutdown()
+        ollama_requests = ollama_server.request_count
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance", "min_delta_ms")},
+        "environment": {"python": sys.version.split()[0], "numpy": np.__version__, "platform": sys.platform},
+        "ollama_requests": ollama_requests,
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-chunks", type=int, default=10000, help="synthetic corpus size (1k to 1M)")
+    parser.add_argument("--append-batch-size", type=int, default=10000)
+    parser.add_argument("--index", choices=("exact", "ivf", "int8", "pq"), default="exact")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--search-queries", type=int, default=200)
+    parser.add_argument("--chunk-documents", type=int, default=50)
+    parser.add_argument("--sentences-per-document", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--sections-per-page", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--validation-mode", choices=("sync", "async", "sampled"), default="sync")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="fake Ollama seconds per embed call")
+    parser.add_argument("--embed-item-latency", type=float, default=0.001, help="fake Ollama seconds per embedded text")
+    parser.add_argument("--chat-latency", type=float, default=0.05, help="fake Ollama seconds per chat call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the results saved in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes below this")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    results = run_benchmark(args)
+
+    exit_code = 0
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            comparison = compare_to_baseline(results, json.load(f), args.tolerance, args.min_delta_ms)
+        results["comparison"] = comparison
+        regressions = [entry for entry in comparison if entry["regression"]]
+        for entry in regressions:
+            print(f"REGRESSION {entry['metric']}: {entry['baseline']} -> {entry['current']} "
+                  f"({entry['change']:+.1%})", file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Memory and recall report for the quantized vector indexes.
+
+Builds a synthetic corpus (see `pipeline_bench.SyntheticCorpus`) in a scratch vector
+store, trains a `QuantizedIndex` for each encoding and compares it with exact search.
+For each encoding the report gives the training time, the bytes held in memory per
+vector (next to the 4 * dim bytes of a float32 row) and, for each re-scoring factor,
+recall@k against exact search and the mean query latency. A factor of 1 measures the
+compressed codes alone; larger factors re-score a bigger shortlist with the float rows.
+
+Usage (from the RAG directory):
+    python -m benchmarks.quantization_bench --corpus-chunks 200000 --dim 384
+    python -m benchmarks.quantization_bench --pq-subspaces 16 32 --rescore-factors 1 4 16
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+
+from ann_index import recall_at_k
+from quantized_index import ProductQuantizer, QuantizedIndex
+from search_engine import ExactSearchEngine
+from vector_store import MemmapVectorStore
+from .fake_ollama import fake_embedding
+from .pipeline_bench import SyntheticCorpus, latency_summary
+
+
+def build_store(corpus: SyntheticCorpus, chunks: int, batch_size: int = 50000) -> MemmapVectorStore:
+    store = MemmapVectorStore(tempfile.mkdtemp(prefix="rag_quant_bench_"))
+    for offset in range(0, chunks, batch_size):
+        texts, vectors = corpus.batch(min(batch_size, chunks - offset))
+        store.append([(f"synthetic-{offset + i}", vector, text, {}) for i, (text, vector) in enumerate(zip(texts, vectors))])
+    return store
+
+
+def bench_index(index: QuantizedIndex, exact_engine: ExactSearchEngine, queries: np.ndarray,
+                top_k: int, rescore_factors: List[int], sample_rows: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    index.train(sample_rows)
+    report = {
+        "train_seconds": round(time.perf_counter() - start, 3),
+        "bytes_per_vector": index.bytes_per_vector,
+        "compression": round(4 * index.store.dim / index.bytes_per_vector, 1),
+        "codes_mb": round(index.bytes_per_vector * index.store.row_count / 2 ** 20, 2),
+        "rescore": {},
+    }
+    for factor in rescore_factors:
+        latencies = []
+        for query in queries:
+            t = time.perf_counter()
+            index.search(query, top_k=top_k, rescore_factor=factor)
+            latencies.append(time.perf_counter() - t)
+        report["rescore"][factor] = {
+            "recall_at_k": round(recall_at_k(index, exact_engine, queries, k=top_k, rescore_factor=factor), 4),
+            "latency": latency_summary(latencies),
+        }
+    return report
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    corpus = SyntheticCorpus(dim=args.dim, seed=args.seed)
+    store = build_store(corpus, args.corpus_chunks)
+    exact_engine = ExactSearchEngine(store)
+    queries = np.asarray([fake_embedding(corpus.query(), args.dim) for _ in range(args.queries)], dtype=np.float32)
+
+    latencies = []
+    for query in queries:
+        t = time.perf_counter()
+        exact_engine.search(query, top_k=args.top_k)
+        latencies.append(time.perf_counter() - t)
+    report: Dict[str, Any] = {
+        "config": vars(args),
+        "exact": {"bytes_per_vector": 4 * args.dim,
+                  "matrix_mb": round(4 * args.dim * store.row_count / 2 ** 20, 2),
+                  "latency": latency_summary(latencies)},
+    }
+
+    indexes = {"int8": QuantizedIndex(store, encoding="int8", min_train_rows=store.row_count + 1)}
+    for subspaces in args.pq_subspaces or [ProductQuantizer.default_subspaces(args.dim)]:
+        indexes[f"pq{subspaces}"] = QuantizedIndex(store, encoding="pq", pq_subspaces=subspaces,
+                                                   min_train_rows=store.row_count + 1)
+    for name, index in indexes.items():
+        report[name] = bench_index(index, exact_engine, queries, args.top_k, args.rescore_factors, args.train_sample_rows)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--pq-subspaces", type=int, nargs="*", help="PQ code sizes to compare (default: dim / 8)")
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--train-sample-rows", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Prompt-size and retrieval-quality report for MMR re-ranking with span merging.
+
+Fixture manuals for a few products are chunked with `ChunkingEmbeddingAgent` (small,
+overlapping chunks, so neighbouring chunks repeat text) and stored in a scratch
+vector store with the hashing embedding of `FakeOllamaServer`. Each fixture query
+lists the fact sentences a good context must contain; some need one fact, others
+facts from several sections or products.
+
+For each query, `mmr_candidates` chunks are retrieved; the baseline keeps the `top_k`
+best, and `MMRReranker` picks `top_k` of them for diversity and merges neighbours.
+Both contexts go through `ContextAssembler` (which also removes repeated sentences)
+and the report gives, per setting: the raw and the assembled prompt tokens, the
+duplicate tokens removed by the assembler, the fraction of expected facts present
+(fact recall), the fraction of queries with every fact present, and the number of
+distinct documents in the context.
+
+Usage (from the RAG directory):
+    python -m benchmarks.rerank_bench
+    python -m benchmarks.rerank_bench --lambdas 0.5 0.7 0.9 --candidates 30 --top-k 5
+"""
+import argparse
+import json
+import tempfile
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from agents import ChunkingEmbeddingAgent, ContextAssembler, MMRReranker
+from agents.text_chunker import approximate_token_count
+from vector_database_connector import VectorDatabaseConnector
+from .fake_ollama import fake_embedding
+
+DIM = 256
+
+PRODUCTS = {
+    "atlas router": {
+        "warranty": "The Atlas router warranty lasts two years from the date of purchase.",
+        "reset": "To reset the Atlas router, hold the recessed button for ten seconds until the light blinks amber.",
+        "power": "The Atlas router draws 12 watts and ships with a 12 volt adapter.",
+        "install": "Mount the Atlas router at least one metre above the floor for the best coverage.",
+    },
+    "borealis camera": {
+        "warranty": "The Borealis camera warranty lasts one year and covers the lens assembly.",
+        "reset": "To reset the Borealis camera, remove the battery and hold the shutter button while reinserting it.",
+        "power": "The Borealis camera battery lasts about 400 shots per charge.",
+        "install": "Install the Borealis companion app before pairing the Borealis camera over Bluetooth.",
+    },
+    "cirrus thermostat": {
+        "warranty": "The Cirrus thermostat warranty lasts five years when installed by a certified technician.",
+        "reset": "To reset the Cirrus thermostat, open Settings, choose Maintenance and select Factory reset.",
+        "power": "The Cirrus thermostat needs a common C wire for continuous power.",
+        "install": "Turn off the heating circuit breaker before installing the Cirrus thermostat.",
+    },
+    "dyna speaker": {
+        "warranty": "The Dyna speaker warranty lasts eighteen months and excludes water damage.",
+        "reset": "To reset the Dyna speaker, press volume up and power together for five seconds.",
+        "power": "The Dyna speaker charges over USB-C and plays for twenty hours.",
+        "install": "Place the Dyna speaker away from walls to reduce boomy bass.",
+    },
+}
+
+SECTIONS = {
+    "warranty": ("Warranty", "warranty coverage repair replacement claim receipt"),
+    "reset": ("Resetting", "reset restore settings factory button"),
+    "power": ("Power", "power battery adapter charge watts"),
+    "install": ("Installation", "install setup mount placement location"),
+}
+
+# (query, [(product, fact)])
+QUERIES = [
+    ("How long is the Atlas router warranty?", [("atlas router", "warranty")]),
+    ("How do I reset the Borealis camera?", [("borealis camera", "reset")]),
+    ("What power does the Cirrus thermostat need?", [("cirrus thermostat", "power")]),
+    ("Where should I place the Dyna speaker?", [("dyna speaker", "install")]),
+    ("What is the Atlas router warranty and how do I reset the Atlas router?",
+     [("atlas router", "warranty"), ("atlas router", "reset")]),
+    ("How do I install and power the Cirrus thermostat?",
+     [("cirrus thermostat", "install"), ("cirrus thermostat", "power")]),
+    ("Compare the warranty of the Atlas router and the Borealis camera.",
+     [("atlas router", "warranty"), ("borealis camera", "warranty")]),
+    ("How do I reset the Dyna speaker and the Cirrus thermostat?",
+     [("dyna speaker", "reset"), ("cirrus thermostat", "reset")]),
+    ("Battery and charging of the Borealis camera and the Dyna speaker",
+     [("borealis camera", "power"), ("dyna speaker", "power")]),
+    ("Warranty terms for the Cirrus thermostat, the Dyna speaker and the Borealis camera",
+     [("cirrus thermostat", "warranty"), ("dyna speaker", "warranty"), ("borealis camera", "warranty")]),
+]
+
+
+def manual(product: str, facts: Dict[str, str]) -> str:
+    """A manual with one section per fact, padded with product-specific filler sentences."""
+    name = product.title()
+    lines = []
+    for key, (heading, vocabulary) in SECTIONS.items():
+        lines.append(f"{heading}")
+        words = vocabulary.split()
+        for i in range(6):
+            lines.append(f"This part of the {name} manual explains {words[i % len(words)]} and "
+                         f"{words[(i + 2) % len(words)]} for the {name}. Read it before contacting support about the {name}.")
+            if i == 2:
+                lines.append(facts[key])
+    return "\n".join(lines)
+
+
+def build_connector(chunk_size: int, chunk_overlap: int) -> VectorDatabaseConnector:
+    connector = VectorDatabaseConnector(db_path=tempfile.mkdtemp(prefix="rag_rerank_bench_"), legacy_json_path="")
+    agent = ChunkingEmbeddingAgent(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for product, facts in PRODUCTS.items():
+        chunks = agent.prepare_chunks({"text": manual(product, facts),
+                                       "metadata": {"source_url": f"fixture://{product.replace(' ', '-')}"}})
+        for chunk in chunks:
+            chunk["embedding"] = fake_embedding(chunk["text"], DIM)
+        connector.add_documents(product, chunks)
+    return connector
+
+
+def evaluate(chunks: List[Dict[str, Any]], expected: List[Tuple[str, str]]) -> Dict[str, float]:
+    used, texts, stats = ContextAssembler().select_context(chunks, budget=10 ** 6)
+    context = "\n".join(texts)
+    found = sum(PRODUCTS[product][fact] in context for product, fact in expected)
+    return {
+        "raw_tokens": sum(approximate_token_count(chunk["text"]) for chunk in chunks),
+        "prompt_tokens": approximate_token_count(context),
+        "duplicate_tokens": stats["duplicate_tokens"],
+        "fact_recall": found / len(expected),
+        "all_facts": float(found == len(expected)),
+        "documents": len({chunk["metadata"].get("document_id") for chunk in chunks}),
+    }
+
+
+def summarize(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: round(float(np.mean([row[key] for row in rows])), 3) for key in rows[0]}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    connector = build_connector(args.chunk_size, args.chunk_overlap)
+    settings: Dict[str, List[Dict[str, float]]] = {"baseline": []}
+    rerankers = {f"mmr_{diversity_lambda}": MMRReranker(diversity_lambda, merge_adjacent=True)
+                 for diversity_lambda in args.lambdas}
+    rerankers.update({f"mmr_{diversity_lambda}_no_merge": MMRReranker(diversity_lambda, merge_adjacent=False)
+                      for diversity_lambda in args.lambdas})
+    for query, expected in QUERIES:
+        candidates = connector.search(fake_embedding(query, DIM), top_k=args.candidates)
+        settings["baseline"].append(evaluate(candidates[:args.top_k], expected))
+        embeddings = connector.get_embeddings([chunk["chunk_id"] for chunk in candidates])
+        for name, reranker in rerankers.items():
+            chunks, _ = reranker.rerank(candidates, embeddings, args.top_k)
+            settings.setdefault(name, []).append(evaluate(chunks, expected))
+    return {"config": vars(args), "queries": len(QUERIES), "chunks": len(connector.store),
+            **{name: summarize(rows) for name, rows in settings.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.5, 0.7])
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--chunk-overlap", type=int, default=24)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
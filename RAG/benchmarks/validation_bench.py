@@ -0,0 +1,149 @@
+"""
+Agreement report for the tiered response validator.
+
+Judges a fixture set of (query, context, answer) cases with `ValidationQAAgent` in
+"local", "tiered" and "llm" modes and compares each verdict with the verdict of the
+LLM judge ("llm" mode) and with the fixture's expected label. The fixtures cover
+answers copied or paraphrased from the context, answers with invented details,
+off-topic answers, and justified and unjustified abstentions.
+
+For each mode the report gives the agreement rates, the fraction of cases escalated
+to the LLM, the number of model calls and the validation latency. Agreement with the
+LLM judge needs a real model: point `--ollama-host` at an Ollama server with the
+validator's model pulled. `--fake-ollama` runs against `FakeOllamaServer` instead,
+whose judge passes every answer, which only exercises the code paths.
+
+Usage (from the RAG directory):
+    python -m benchmarks.validation_bench --ollama-host http://localhost:11434
+    python -m benchmarks.validation_bench --fake-ollama
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Dict, Any
+
+from agents.llm_client import AsyncOllamaClient
+from agents.validation_qa_agent import ValidationQAAgent
+from .fake_ollama import FakeOllamaServer
+from .pipeline_bench import latency_summary
+
+CONTEXTS = {
+    "timeouts": (
+        "The client retries a failed request up to three times. Each retry waits twice as long as the previous one, "
+        "starting at 500 milliseconds. Requests that time out raise ERR_TIMEOUT after 30 seconds. "
+        "The timeout can be changed with the request_timeout setting in config.yaml."
+    ),
+    "install": (
+        "Install the package with pip install ragkit. Python 3.9 or newer is required. "
+        "On Windows, the Visual C++ build tools must be installed first. "
+        "GPU support is optional and is enabled by installing the ragkit[gpu] extra."
+    ),
+    "auth": (
+        "API keys are created in the dashboard under Settings > Keys. A key is shown only once, when it is created. "
+        "Keys expire after 90 days and can be rotated at any time. Requests without a valid key receive a 401 response."
+    ),
+}
+
+# (query, context, answer, expected verdict)
+FIXTURES = [
+    ("How many times does the client retry?", "timeouts",
+     "The client retries a failed request up to three times, and each retry waits twice as long as the previous one.", True),
+    ("What happens when a request times out?", "timeouts",
+     "Requests that time out raise ERR_TIMEOUT after 30 seconds.", True),
+    ("How do I change the timeout?", "timeouts",
+     "You can change the timeout with the request_timeout setting in config.yaml.", True),
+    ("How long is the first retry delay?", "timeouts",
+     "The first retry waits 500 milliseconds, and every later retry doubles the previous wait.", True),
+    ("How many times does the client retry?", "timeouts",
+     "The client retries up to ten times with a fixed delay of two seconds, and gives up after a minute.", False),
+    ("How do I change the timeout?", "timeouts",
+     "Set the CLIENT_TIMEOUT environment variable or pass --timeout on the command line.", False),
+    ("What happens when a request times out?", "timeouts",
+     "Requests that time out raise ERR_TIMEOUT after 30 seconds. The client then switches to a backup region "
+     "and opens a support ticket automatically.", False),
+    ("How do I install the package?", "install",
+     "Install it with pip install ragkit. You need Python 3.9 or newer.", True),
+    ("Do I need anything special on Windows?", "install",
+     "On Windows, the Visual C++ build tools must be installed first.", True),
+    ("How do I enable GPU support?", "install",
+     "GPU support is optional; install the ragkit[gpu] extra to enable it.", True),
+    ("How do I install the package?", "install",
+     "Install it with conda install ragkit from the conda-forge channel; Python 3.7 is supported.", False),
+    ("How do I enable GPU support?", "install",
+     "GPU support is enabled automatically whenever CUDA 12 drivers are detected at startup.", False),
+    ("Which Python versions are supported?", "install",
+     "Python 3.9 or newer is required to install ragkit.", True),
+    ("Where do I create an API key?", "auth",
+     "API keys are created in the dashboard under Settings > Keys, and a key is shown only once.", True),
+    ("How long are keys valid?", "auth",
+     "Keys expire after 90 days, and you can rotate them at any time.", True),
+    ("What happens without a key?", "auth",
+     "Requests without a valid key receive a 401 response.", True),
+    ("How long are keys valid?", "auth",
+     "Keys never expire unless an administrator revokes them from the audit log.", False),
+    ("What happens without a key?", "auth",
+     "Requests without a key are rate limited to 10 per minute and receive a 429 response.", False),
+    ("Where do I create an API key?", "auth",
+     "Email the support team with your account number and they will send you a key within two days.", False),
+    ("What is the pricing of the enterprise plan?", "auth",
+     "I don't have enough information in the provided context to answer this question.", True),
+    ("Does ragkit support ARM processors?", "install",
+     "I couldn't find enough information in the provided context to answer your question.", True),
+    ("How many times does the client retry a failed request?", "timeouts",
+     "I don't have enough information to answer that.", False),
+    ("Where do I create an API key?", "auth",
+     "The capital of France is Paris, which is known for the Eiffel Tower and its museums.", False),
+    ("How do I install the package?", "install",
+     "Install ragkit using pip, on Python 3.9 or later; Windows users first need the Visual C++ build tools.", True),
+]
+
+
+async def run_mode(mode: str, llm_client: AsyncOllamaClient, llm_verdicts: List[bool]) -> Dict[str, Any]:
+    agent = ValidationQAAgent(llm_client=llm_client, mode=mode)
+    latencies, verdicts, escalated = [], [], 0
+    for query, context, answer, _ in FIXTURES:
+        chunks = [{"text": sentence.strip() + ".", "score": 1.0} for sentence in CONTEXTS[context].split(". ") if sentence]
+        start = time.perf_counter()
+        result = await agent.validate({"response_text": answer}, query, chunks)
+        latencies.append(time.perf_counter() - start)
+        verdicts.append(bool(result["is_valid"]))
+        escalated += int(mode != "llm" and result.get("tier") == "llm")
+    labels = [label for *_, label in FIXTURES]
+    return {
+        "verdicts": verdicts,
+        "agreement_with_llm": round(sum(v == l for v, l in zip(verdicts, llm_verdicts or verdicts)) / len(FIXTURES), 3),
+        "agreement_with_labels": round(sum(v == l for v, l in zip(verdicts, labels)) / len(FIXTURES), 3),
+        "escalation_rate": round(escalated / len(FIXTURES), 3),
+        "llm_calls": len(FIXTURES) if mode == "llm" else escalated,
+        "latency": latency_summary(latencies),
+    }
+
+
+async def run(ollama_host: str) -> Dict[str, Any]:
+    llm_client = AsyncOllamaClient(host=ollama_host)
+    report = {"cases": len(FIXTURES)}
+    report["llm"] = await run_mode("llm", llm_client, [])
+    for mode in ("local", "tiered"):
+        report[mode] = await run_mode(mode, llm_client, report["llm"]["verdicts"])
+    for mode in ("llm", "local", "tiered"):
+        report[mode].pop("verdicts")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-host", default=None)
+    parser.add_argument("--fake-ollama", action="store_true")
+    args = parser.parse_args()
+
+    if args.fake_ollama:
+        with FakeOllamaServer() as server:
+            report = asyncio.run(run(server.url))
+    else:
+        report = asyncio.run(run(args.ollama_host))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Load test for the /chat WebSocket endpoint.
+
+Starts a fake Ollama server, a static page server and the FastAPI app in-process, then
+opens N WebSocket clients that each send one question at the same moment. If model
+calls blocked the event loop, the slowest client would wait for every other client's
+pipeline (wall time ~ N x single-request latency); with non-blocking calls the wall
+time stays close to a single request's latency (bounded by the LLM concurrency limit).
+Clients beyond the scheduler's running and queued capacity get a fast "busy" answer;
+they are counted separately and left out of the latency statistics.
+
+Usage (from the RAG directory):
+    python -m benchmarks.ws_load_test --clients 20 --chat-latency 0.2
+    python -m benchmarks.ws_load_test --clients 60
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Tuple
+
+from .fake_ollama import FakeOllamaServer
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory: str) -> ThreadingHTTPServer:
+    """Serves a directory over HTTP on a free localhost port in a background thread."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+async def _one_client(ws_url: str, question: str) -> Tuple[float, Any]:
+    import websockets
+
+    async with websockets.connect(ws_url) as websocket:
+        start = time.perf_counter()
+        await websocket.send(json.dumps({"query": question}))
+        while True:
+            frame = json.loads(await websocket.recv())
+            if frame.get("type", "final") == "final":
+                return time.perf_counter() - start, frame.get("status")
+
+
+async def run_load_test(clients: int, ws_url: str, page_url: str) -> Dict[str, Any]:
+    """Sends one question per client concurrently and reports latency statistics."""
+    # Distinct questions, so clients are not answered from each other's cached answers.
+    questions = [f"{page_url} what does the page say about topic {i % 50} and property {i * 7}?" for i in range(clients)]
+    start = time.perf_counter()
+    results: List[Tuple[float, Any]] = await asyncio.gather(*(_one_client(ws_url, question) for question in questions))
+    wall = time.perf_counter() - start
+    latencies = [latency for latency, status in results if status != "busy"]
+    busy = [latency for latency, status in results if status == "busy"]
+    return {
+        "clients": clients,
+        "wall_seconds": wall,
+        "mean_latency_seconds": statistics.mean(latencies),
+        "max_latency_seconds": max(latencies),
+        "min_latency_seconds": min(latencies),
+        "busy": len(busy),
+        "max_busy_latency_seconds": max(busy, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_load_test_")
+    site_dir = os.path.join(workdir, "site")
+    os.makedirs(site_dir)
+    with open(os.path.join(site_dir, "page.html"), "w", encoding="utf-8") as f:
+        f.write("<title>Fixture</title>" + "".join(
+            f"<h2>Topic {i}</h2><p>Topic {i} is described here. It has property {i * 7}.</p>" for i in range(50)))
+
+    with FakeOllamaServer(chat_latency_s=args.chat_latency) as ollama_server:
+        os.environ["OLLAMA_HOST"] = ollama_server.url
+        site = serve_directory(site_dir)
+
+        import uvicorn
+        # main.py resolves its templates relative to the RAG directory at import time;
+        # the vector store and caches are then created in the scratch directory.
+        rag_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(rag_dir)
+        import main as app_module
+        os.chdir(workdir)
+
+        config = uvicorn.Config(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+        server = uvicorn.Server(config)
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+        page_url = f"http://127.0.0.1:{site.server_address[1]}/page.html"
+        ws_url = f"ws://127.0.0.1:{args.port}/chat"
+        asyncio.run(_one_client(ws_url, f"{page_url} warm up"))
+        single = asyncio.run(run_load_test(1, ws_url, page_url))
+        loaded = asyncio.run(run_load_test(args.clients, ws_url, page_url))
+        server.should_exit = True
+        site.shutdown()
+
+    print(json.dumps({"single": single, "loaded": loaded,
+                      "serialization_ratio": loaded["wall_seconds"] / (single["wall_seconds"] * args.clients)},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
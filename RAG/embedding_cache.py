@@ -0,0 +1,189 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from telemetry import metrics
+
+
+class EmbeddingCache:
+    """
+    A two-tier, content-addressed cache of embeddings keyed on (model name, text hash).
+
+    The first tier is an in-memory LRU of up to `memory_entries` embeddings. The second
+    tier is a SQLite file that survives restarts; when it grows past `max_disk_bytes`
+    the least recently used entries are evicted. Both tiers hold float32 embeddings (as
+    arrays in memory, as blobs on disk); they are lists of floats only at the API.
+    Both tiers are safe to use from several threads.
+    """
+    def __init__(self, disk_path: Optional[str] = "embedding_cache.sqlite3",
+                 memory_entries: int = 10000, max_disk_bytes: int = 512 * 1024 * 1024):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+            self._db.commit()
+            self._disk_bytes = self._stored_bytes()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Builds the cache key for a text embedded by a given model."""
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{model_name}:{text_hash}"
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Looks up the embeddings of several texts.
+
+        Args:
+            model_name (str): The embedding model name.
+            texts (List[str]): The texts to look up.
+
+        Returns:
+            List[Optional[List[float]]]: The cached embedding for each text, or None on a miss.
+        """
+        keys = [self.make_key(model_name, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        memory_hits = disk_hits = 0
+        with self._lock:
+            disk_lookups: Dict[str, List[int]] = {}
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[i] = self._memory[key].tolist()
+                    memory_hits += 1
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+            if disk_lookups and self._db is not None:
+                found = self._read_disk(list(disk_lookups))
+                for key, embedding in found.items():
+                    self._remember(key, embedding)
+                    for i in disk_lookups.pop(key):
+                        results[i] = embedding.tolist()
+                        disk_hits += 1
+            misses = sum(len(positions) for positions in disk_lookups.values())
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+        metrics.inc("rag_embedding_cache_lookups_total", memory_hits, result="memory")
+        metrics.inc("rag_embedding_cache_lookups_total", disk_hits, result="disk")
+        metrics.inc("rag_embedding_cache_lookups_total", misses, result="miss")
+        return results
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+            self._db.commit()
+        return found
+
+    def put_many(self, model_name: str, texts: List[str], embeddings: List[List[float]]):
+        """
+        Stores embeddings in both tiers.
+
+        Args:
+            model_name (str): The embedding model name.
+            texts (List[str]): The embedded texts.
+            embeddings (List[List[float]]): The embedding of each text.
+        """
+        entries: List[Tuple[str, bytes, float]] = []
+        now = time.time()
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.make_key(model_name, text)
+                vector = np.array(embedding, dtype=np.float32)
+                self._remember(key, vector)
+                entries.append((key, vector.tobytes(), now))
+            if entries and self._db is not None:
+                replaced = self._stored_bytes([key for key, _, _ in entries])
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, embedding, last_access) VALUES (?, ?, ?)", entries
+                )
+                self._db.commit()
+                self._disk_bytes += sum(len(blob) for _, blob, _ in entries) - replaced
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+
+    def _stored_bytes(self, keys: Optional[List[str]] = None) -> int:
+        """The bytes of embeddings stored on disk, for the given keys or for all entries."""
+        if keys is None:
+            return self._db.execute("SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings").fetchone()[0]
+        total = 0
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            total += self._db.execute(
+                f"SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchone()[0]
+        return total
+
+    def _evict_disk(self):
+        """
+        Drops least recently used disk entries until the tier is back under 90% of its
+        budget. The running byte total is recounted first, since other processes may
+        share the file.
+        """
+        total_bytes = self._disk_bytes = self._stored_bytes()
+        if total_bytes <= self.max_disk_bytes:
+            return
+        target_bytes = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute("SELECT key, LENGTH(embedding) FROM embeddings ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total_bytes <= target_bytes:
+                break
+            evicted.append((key,))
+            total_bytes -= size
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._db.commit()
+        self._disk_bytes = total_bytes
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_name, [text])[0]
+
+    def put(self, model_name: str, text: str, embedding: List[float]):
+        self.put_many(model_name, [text], [embedding])
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the current hit rate."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+from telemetry import metrics
+
+metrics.describe("rag_expansion_cache_lookups_total", "Query expansion cache lookups by result tier.")
+
+
+class ExpansionCache:
+    """
+    A two-tier cache of LLM query expansions keyed on (model, temperature, cleaned query).
+
+    Like `EmbeddingCache`, the first tier is an in-memory LRU of up to `memory_entries`
+    expansions and the optional second tier is a SQLite file that survives restarts.
+    When the file holds more than `max_disk_entries` expansions, the least recently
+    used ones are dropped until 90% of that budget is left. An expansion older
+    than `ttl_s` is treated as a miss and dropped from both tiers. Safe to use from
+    several threads.
+    """
+    def __init__(self, disk_path: Optional[str] = "expansion_cache.sqlite3", memory_entries: int = 4096,
+                 max_disk_entries: int = 100000, ttl_s: float = 7 * 24 * 3600.0):
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_s = ttl_s
+        self._memory: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_entries = 0  # an upper bound: replaced keys are counted again
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS expansions ("
+                "key TEXT PRIMARY KEY, terms TEXT NOT NULL, stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS expansions_last_access ON expansions (last_access)")
+            self._db.commit()
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, temperature: float, query: str) -> str:
+        """Builds the cache key of a query expanded by a given model and temperature."""
+        query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        return f"{model_name}:{temperature}:{query_hash}"
+
+    def _remember(self, key: str, terms: List[str], stored_at: float):
+        self._memory[key] = (terms, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model_name: str, temperature: float, query: str) -> Optional[List[str]]:
+        """
+        Looks up the expansion terms of a query.
+
+        Returns:
+            Optional[List[str]]: The cached terms, or None on a miss or an expired entry.
+        """
+        key = self.make_key(model_name, temperature, query)
+        now = time.time()
+        result, tier = None, "miss"
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT terms, stored_at FROM expansions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    tier = "disk"
+            elif entry is not None:
+                tier = "memory"
+
+            if entry is not None and now - entry[1] > self.ttl_s:
+                self._memory.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM expansions WHERE key = ?", (key,))
+                    self._db.commit()
+                entry, tier = None, "miss"
+
+            if entry is not None:
+                result = list(entry[0])
+                self._remember(key, entry[0], entry[1])
+                if tier == "disk":
+                    self._db.execute("UPDATE expansions SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self.disk_hits += 1
+                else:
+                    self.memory_hits += 1
+            else:
+                self.misses += 1
+        metrics.inc("rag_expansion_cache_lookups_total", result=tier)
+        return result
+
+    def put(self, model_name: str, temperature: float, query: str, terms: List[str]):
+        """Stores the expansion terms of a query in both tiers."""
+        key = self.make_key(model_name, temperature, query)
+        now = time.time()
+        with self._lock:
+            self._remember(key, list(terms), now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO expansions (key, terms, stored_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(terms), now, now)
+                )
+                self._db.commit()
+                self._disk_entries += 1
+                if self._disk_entries > self.max_disk_entries:
+                    self._evict_disk()
+
+    def _evict_disk(self):
+        """Drops least recently used disk entries until the tier is back under 90% of its budget."""
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+        if self._disk_entries <= self.max_disk_entries:
+            return
+        keep = int(self.max_disk_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM expansions WHERE key IN (SELECT key FROM expansions ORDER BY last_access DESC "
+            "LIMIT -1 OFFSET ?)", (keep,)
+        )
+        self._db.commit()
+        self._disk_entries = keep
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the current hit rate."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
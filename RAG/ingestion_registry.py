@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import time
+from typing import List, Dict, Any, Optional
+
+
+class IngestionRegistry:
+    """
+    Records what was ingested from each source so unchanged documents can be skipped.
+
+    For every (document_id, source_url) pair it keeps the SHA-256 of the fetched content,
+    the ETag and Last-Modified headers for conditional GETs, and the chunk IDs that the
+    ingestion produced, which is what lets a re-ingestion delete stale chunks.
+    """
+    def __init__(self, db_path: str = "ingestion_registry.sqlite3"):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "document_id TEXT NOT NULL, source_url TEXT NOT NULL, content_hash TEXT, "
+            "etag TEXT, last_modified TEXT, chunk_ids TEXT NOT NULL, ingested_at REAL NOT NULL, "
+            "PRIMARY KEY (document_id, source_url))"
+        )
+        self._db.commit()
+
+    def get(self, document_id: str, source_url: str) -> Optional[Dict[str, Any]]:
+        """Returns the last ingestion record for a source, or None if it was never ingested."""
+        row = self._db.execute(
+            "SELECT content_hash, etag, last_modified, chunk_ids, ingested_at FROM sources "
+            "WHERE document_id = ? AND source_url = ?", (document_id, source_url)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "document_id": document_id,
+            "source_url": source_url,
+            "content_hash": row[0],
+            "etag": row[1],
+            "last_modified": row[2],
+            "chunk_ids": json.loads(row[3]),
+            "ingested_at": row[4],
+        }
+
+    def record(self, document_id: str, source_url: str, content_hash: str, chunk_ids: List[str],
+               etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Stores the result of a successful ingestion, replacing any previous record."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO sources "
+            "(document_id, source_url, content_hash, etag, last_modified, chunk_ids, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (document_id, source_url, content_hash, etag, last_modified, json.dumps(chunk_ids), time.time())
+        )
+        self._db.commit()
+
+    def touch(self, document_id: str, source_url: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None):
+        """Marks an unchanged source as re-checked, refreshing its validators if the server sent new ones."""
+        self._db.execute(
+            "UPDATE sources SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+            "ingested_at = ? WHERE document_id = ? AND source_url = ?",
+            (etag, last_modified, time.time(), document_id, source_url)
+        )
+        self._db.commit()
+
+    def forget_prefix(self, prefix: str) -> int:
+        """Deletes the records of every document ID starting with `prefix`; returns how many were deleted."""
+        cursor = self._db.execute("DELETE FROM sources WHERE substr(document_id, 1, ?) = ?", (len(prefix), prefix))
+        self._db.commit()
+        return cursor.rowcount
@@ -0,0 +1,240 @@
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from search_engine import select_top_k
+from vector_store import MemmapVectorStore
+
+_TERM = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; identifiers such as `ERR_TIMEOUT` or `0x80070005` stay whole."""
+    return _TERM.findall(text.lower())
+
+
+class BM25Index:
+    """
+    An inverted index over the text of a MemmapVectorStore's rows, scored with Okapi BM25.
+
+    Like `IVFIndex`, it is keyed by the store's physical rows, is updated incrementally
+    by `update` after rows are appended, and is persisted next to the store:
+    `bm25_terms.txt` holds the vocabulary (a term's id is its line number),
+    `bm25_postings.i32` holds (term id, row, term frequency) triples and
+    `bm25_lengths.i32` holds the token count of every indexed row. All three are only
+    ever appended to, and `bm25_lengths.i32` is written last, so its length is the
+    number of committed rows. A store without these files (e.g. one created before the
+    index existed) is indexed from its records on first use.
+
+    The files live in the store's `data_dir`, and are written while holding the store's
+    lock, so when several processes share a store, `update` picks up the rows another
+    process already indexed from disk instead of indexing them again. After the store
+    is compacted the index is rebuilt for the new generation.
+
+    Deleted and superseded rows stay in the postings but are excluded by the search
+    mask; document frequencies and the average row length are computed over live rows
+    only, so scores match an index of the live rows.
+    """
+    TERMS_FILE = "bm25_terms.txt"
+    POSTINGS_FILE = "bm25_postings.i32"
+    LENGTHS_FILE = "bm25_lengths.i32"
+
+    def __init__(self, store: MemmapVectorStore, k1: float = 1.2, b: float = 0.75, update_batch_rows: int = 4096):
+        self.store = store
+        self.k1 = k1
+        self.b = b
+        self.update_batch_rows = update_batch_rows
+        self._lock = threading.Lock()
+        self._reset()
+        self.update()
+
+    def _reset(self):
+        self._generation = self.store.generation
+        self._terms: Dict[str, int] = {}
+        self._terms_bytes = 0
+        # term id -> segments of (rows, term frequencies); merged into one on first use.
+        self._postings: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._postings_count = 0
+        self._lengths = np.empty(0, dtype=np.int32)
+        self._frequencies: Dict[str, int] = {}
+        self._frequencies_rows = -1
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store.data_dir, name)
+
+    @property
+    def row_count(self) -> int:
+        """Number of store rows indexed so far."""
+        return self._lengths.shape[0]
+
+    def _load(self):
+        """
+        Loads the persisted index past what is already in memory (all of it on the first
+        call), dropping anything past its last commit or the store's rows.
+        """
+        try:
+            with open(self._path(self.TERMS_FILE), 'rb') as f:
+                f.seek(self._terms_bytes)
+                terms_blob = f.read()
+            lengths = np.fromfile(self._path(self.LENGTHS_FILE), dtype=np.int32, offset=self.row_count * 4)
+            triples = np.fromfile(self._path(self.POSTINGS_FILE), dtype=np.int32, offset=self._postings_count * 12)
+        except FileNotFoundError:
+            for name in (self.TERMS_FILE, self.POSTINGS_FILE, self.LENGTHS_FILE):
+                open(self._path(name), 'wb').close()
+            return
+        except ValueError:  # the files were truncated below what is in memory: reload them
+            self._reset()
+            self._load()
+            return
+
+        complete_terms = terms_blob[:terms_blob.rfind(b"\n") + 1]
+        if len(complete_terms) != len(terms_blob):
+            with open(self._path(self.TERMS_FILE), 'r+b') as f:
+                f.truncate(self._terms_bytes + len(complete_terms))
+        for term in complete_terms.decode('utf-8').splitlines():
+            self._terms[term] = len(self._terms)
+        self._terms_bytes += len(complete_terms)
+
+        rows = min(self.row_count + lengths.shape[0], self.store.row_count)
+        triples = triples[:triples.shape[0] - triples.shape[0] % 3].reshape(-1, 3)
+        triples = triples[(triples[:, 1] < rows) & (triples[:, 0] < len(self._terms))]
+        self._lengths = np.concatenate([self._lengths, lengths[:rows - self.row_count]])
+        self._postings_count += triples.shape[0]
+        self._truncate_files(rows, self._postings_count)
+        self._add_postings(triples)
+
+    def _truncate_files(self, rows: int, postings: int):
+        for name, size in ((self.LENGTHS_FILE, rows * 4), (self.POSTINGS_FILE, postings * 12)):
+            if os.path.getsize(self._path(name)) > size:
+                with open(self._path(name), 'r+b') as f:
+                    f.truncate(size)
+
+    def _add_postings(self, triples: np.ndarray):
+        if triples.shape[0] == 0:
+            return
+        triples = triples[np.argsort(triples[:, 0], kind='stable')]
+        term_ids, starts = np.unique(triples[:, 0], return_index=True)
+        ends = np.append(starts[1:], triples.shape[0])
+        for term_id, start, end in zip(term_ids.tolist(), starts.tolist(), ends.tolist()):
+            segment = (triples[start:end, 1].astype(np.int64), triples[start:end, 2].astype(np.float32))
+            self._postings.setdefault(term_id, []).append(segment)
+
+    def _posting(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        segments = self._postings[term_id]
+        if len(segments) > 1:
+            segments[:] = [(np.concatenate([rows for rows, _ in segments]),
+                            np.concatenate([frequencies for _, frequencies in segments]))]
+        return segments[0]
+
+    def update(self):
+        """
+        Indexes the rows appended to the store since the last call and appends them to
+        disk; rows already indexed on disk by another process are loaded instead.
+        """
+        with self.store.locked(), self._lock:
+            self.store.refresh()
+            if self._generation != self.store.generation:
+                self._reset()
+            self._load()
+            while self.row_count < self.store.row_count:
+                first = self.row_count
+                rows = list(range(first, min(self.store.row_count, first + self.update_batch_rows)))
+                self._index_rows(first, [record["text"] for record in self.store.get_records(rows)])
+
+    def _index_rows(self, first_row: int, texts: List[str]):
+        new_terms: List[str] = []
+        triples: List[Tuple[int, int, int]] = []
+        lengths = np.empty(len(texts), dtype=np.int32)
+        for offset, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[offset] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = self._terms[term] = len(self._terms)
+                    new_terms.append(term)
+                triples.append((term_id, first_row + offset, frequency))
+        triple_array = np.asarray(triples, dtype=np.int32).reshape(-1, 3)
+
+        terms_blob = "".join(term + "\n" for term in new_terms).encode('utf-8')
+        with open(self._path(self.TERMS_FILE), 'ab') as f:
+            f.write(terms_blob)
+        with open(self._path(self.POSTINGS_FILE), 'ab') as f:
+            f.write(triple_array.tobytes())
+        with open(self._path(self.LENGTHS_FILE), 'ab') as f:
+            f.write(lengths.tobytes())
+        self._terms_bytes += len(terms_blob)
+        self._postings_count += triple_array.shape[0]
+        self._add_postings(triple_array)
+        self._lengths = np.concatenate([self._lengths, lengths])
+
+    def document_frequencies(self) -> Dict[str, int]:
+        """
+        The number of indexed rows containing each term (including deleted rows), e.g. to
+        expand queries with the corpus vocabulary. The same dictionary is returned until
+        more rows are indexed.
+        """
+        with self._lock:
+            if self._frequencies_rows != self.row_count:
+                counts = {term_id: sum(rows.shape[0] for rows, _ in segments)
+                          for term_id, segments in self._postings.items()}
+                self._frequencies = {term: counts[term_id] for term, term_id in self._terms.items() if term_id in counts}
+                self._frequencies_rows = self.row_count
+            return self._frequencies
+
+    def search(self, queries: List[str], top_k: int = 5,
+               mask: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Scores the indexed rows against each text query with BM25.
+
+        Args:
+            queries (List[str]): The query texts.
+            top_k (int): The number of rows to return per query.
+            mask (Optional[np.ndarray]): Boolean mask over physical rows; rows marked False
+                                         are never returned. Defaults to the store's live rows.
+
+        Returns:
+            List[List[Tuple[int, float]]]: For each query, (row, score) pairs sorted by
+                                           descending score; rows sharing no term with the
+                                           query are not returned.
+        """
+        with self._lock:
+            rows = self.row_count
+            if mask is None:
+                mask = self.store.live_mask()
+            live = mask[:rows]
+            live_count = int(live.sum())
+            if rows == 0 or live_count == 0 or top_k <= 0:
+                return [[] for _ in queries]
+            average_length = float(self._lengths[live].mean()) or 1.0
+
+            results = []
+            for query in queries:
+                # Only rows in the query terms' postings can score, so accumulate over those.
+                matched_parts, score_parts = [], []
+                for term in set(tokenize(query)):
+                    term_id = self._terms.get(term)
+                    if term_id is None or term_id not in self._postings:
+                        continue
+                    posting_rows, frequencies = self._posting(term_id)
+                    keep = live[posting_rows]
+                    posting_rows, frequencies = posting_rows[keep], frequencies[keep]
+                    df = posting_rows.shape[0]
+                    if df == 0:
+                        continue
+                    idf = np.log1p((live_count - df + 0.5) / (df + 0.5))
+                    length_norm = self.k1 * (1 - self.b + self.b * self._lengths[posting_rows] / average_length)
+                    matched_parts.append(posting_rows)
+                    score_parts.append(idf * frequencies * (self.k1 + 1) / (frequencies + length_norm))
+                if not matched_parts:
+                    results.append([])
+                    continue
+                matched_rows, positions = np.unique(np.concatenate(matched_parts), return_inverse=True)
+                scores = np.bincount(positions, weights=np.concatenate(score_parts), minlength=matched_rows.shape[0])
+                top = select_top_k(scores.astype(np.float32)[np.newaxis, :], top_k)[0]
+                results.append([(int(matched_rows[position]), score) for position, score in top])
+            return results
@@ -1,14 +1,35 @@
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from fastapi.staticfiles import StaticFiles
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Set
+import asyncio
+import logging
+import uuid
 
 from urls import extract_urls_from_text
 from orchestration_layer import OrchestrationLayer
+from scheduler import RequestScheduler, SchedulerBusy, RequestSuperseded
+from telemetry import metrics
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the process-wide services once at startup (agents, pooled HTTP and model
+    clients, the loaded vector index and caches) and releases them at shutdown.
+    """
+    app.state.orchestrator = OrchestrationLayer()
+    app.state.scheduler = RequestScheduler()
+    try:
+        yield
+    finally:
+        await app.state.orchestrator.aclose()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory='templates')
 app.mount("/static", StaticFiles(directory="templates"), name="static")
 
@@ -34,7 +55,7 @@ class ConnectionManager:
         try:
             await websocket.send_json(dict(message))
         except Exception as e:
-            print(f"Could not send message to a client: {e}")
+            logger.warning("Could not send message to a client: %s", e)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -45,7 +66,66 @@ async def root(request: Request):
         context=context
     )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Exposes per-stage latencies, throughput, cache and error counters for Prometheus."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 manager = ConnectionManager()
+metrics.describe("rag_active_connections", "Open /chat WebSocket connections.")
+metrics.gauge_callback("rag_active_connections", lambda: len(manager.active_connections))
+
+async def respond(orchestrator: OrchestrationLayer, user_query: Dict[str, Any], query: str, urls: List[str],
+                  session: Any, websocket: WebSocket):
+    """Runs one chat request and sends its response frames."""
+    collection = orchestrator.source_collection(urls)
+    if user_query.get('stream'):
+        async for frame in orchestrator.stream_query_workflow(query, document_source=urls, document_id="user_docs",
+                                                              session=session, collection=collection):
+            if frame["type"] == "final":
+                await manager.send_personal_message({
+                    "type": "final",
+                    "message": frame.get("response") or "I couldn't generate a response for your query. Please try rephrasing.",
+                    "status": frame.get("status"),
+                    "sources": frame.get("sources", []),
+                    "validation": frame.get("validation"),
+                    "timings": frame.get("timings", {}),
+                    **({"trace": frame.get("trace")} if user_query.get('trace') else {}),
+                }, websocket)
+            else:
+                await manager.send_personal_message(frame, websocket)
+        return
+
+    response_data = await orchestrator.handle_query_workflow(query, document_source=urls, document_id="user_docs",
+                                                             session=session, collection=collection)
+
+    if response_data and response_data.get('response'):
+        message = {"message": response_data['response'], "timings": response_data.get("timings", {})}
+        if user_query.get('trace'):
+            message["trace"] = response_data.get("trace")
+        await manager.send_personal_message(message, websocket)
+    else:
+        await manager.send_personal_message({"message": "I couldn't generate a response for your query. Please try rephrasing."}, websocket)
+
+
+async def schedule(scheduler: RequestScheduler, orchestrator: OrchestrationLayer, user_query: Dict[str, Any],
+                   query: str, urls: List[str], session: Any, connection_id: str, websocket: WebSocket):
+    """Runs one chat request through the scheduler and reports rejection, supersession or failure."""
+    try:
+        # Fewer pages to ingest means a shorter request: run those first.
+        await scheduler.run(connection_id,
+                            lambda: respond(orchestrator, user_query, query, urls, session, websocket),
+                            priority=len(urls))
+    except SchedulerBusy:
+        await manager.send_personal_message({"type": "final", "status": "busy",
+                                             "message": "The server is busy; please try again shortly."}, websocket)
+    except RequestSuperseded:
+        await manager.send_personal_message({"type": "cancelled", "status": "cancelled",
+                                             "message": "This request was cancelled by a newer message."}, websocket)
+    except Exception:
+        logger.exception("An unexpected error occurred during message processing")
+        await manager.send_personal_message({"message": "An internal server error occurred while processing your request."}, websocket)
+
 
 @app.websocket("/chat")
 async def websocket_endpoint(websocket: WebSocket):
@@ -55,9 +135,36 @@ async def websocket_endpoint(websocket: WebSocket):
     This revised structure uses a `try...finally` block to guarantee that the
     `manager.disconnect()` cleanup logic is always executed, whether the client
     disconnects gracefully, an error occurs, or the server is shut down.
+
+    Messages with `"stream": true` receive the answer as incremental
+    `{"type": "token", "token": ...}` frames followed by one `{"type": "final", ...}`
+    frame with the formatted message, sources, validation result and per-stage
+    timings (plus a `{"type": "validation"}` frame when validation runs after the
+    answer). Other messages receive a single `{"message": ..., "timings": ...}` frame.
+    Messages with `"trace": true` additionally get the request's full stage trace
+    (timings, item counts, bytes and cache hits) under `"trace"` in the final frame.
+
+    All connections share the app's `OrchestrationLayer`; each connection only gets its
+    own conversation session. A message only searches the pages of the URLs it names:
+    they are stored in a collection keyed by that set of URLs (see
+    `OrchestrationLayer.source_collection`), which outlives the connection, so another
+    client asking about the same pages skips their ingestion and can be served from the
+    answer cache.
+
+    All URLs in the message are ingested concurrently, and their ingestion overlaps
+    with query expansion (see `OrchestrationLayer.handle_query_workflow`).
+
+    Requests run through the app's `RequestScheduler` while the connection keeps
+    reading: a new message cancels the connection's request still in flight, which is
+    answered with a `{"type": "cancelled"}` frame, and when the server's queue is full
+    the message is answered at once with `{"type": "final", "status": "busy"}`.
     """
     await manager.connect(websocket)
-    orchestrator = OrchestrationLayer()
+    orchestrator: OrchestrationLayer = websocket.app.state.orchestrator
+    scheduler: RequestScheduler = websocket.app.state.scheduler
+    session = orchestrator.new_session()
+    connection_id = uuid.uuid4().hex
+    in_flight: Set[asyncio.Task] = set()
     
     try:
         while True:
@@ -75,29 +182,25 @@ async def websocket_endpoint(websocket: WebSocket):
                     await manager.send_personal_message({"message": "You did not provide any URLs in your query. Please provide at least one URL for ingestion."}, websocket)
                     continue
 
-                ingestion_success = await orchestrator.ingest_document_workflow(urls[0], "user_docs")
-                
-                if not ingestion_success:
-                    await manager.send_personal_message({"message": f"Could not get data from the provided URL: {urls[0]}. Please check the URL and try again."}, websocket)
-                    continue
-
-                response_data = await orchestrator.handle_query_workflow(query)
-                
-                if response_data and response_data.get('response'):
-                    await manager.send_personal_message({"message": response_data['response']}, websocket)
-                else:
-                    await manager.send_personal_message({"message": "I couldn't generate a response for your query. Please try rephrasing."}, websocket)
+                task = asyncio.create_task(schedule(scheduler, orchestrator, user_query, query, urls, session,
+                                                    connection_id, websocket))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
 
             except WebSocketDisconnect:
                 print("Client disconnected gracefully.")
                 break
 
-            except Exception as e:
-                print(f"An unexpected error occurred during message processing: {e}")
+            except Exception:
+                logger.exception("An unexpected error occurred during message processing")
                 await manager.send_personal_message({"message": "An internal server error occurred while processing your request."}, websocket)
 
-    except Exception as e:
-        print(f"A critical WebSocket error occurred: {e}")
+    except Exception:
+        logger.exception("A critical WebSocket error occurred")
     
     finally:
-        manager.disconnect(websocket)
\ No newline at end of file
+        manager.disconnect(websocket)
+        scheduler.close_session(connection_id)
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
@@ -0,0 +1,98 @@
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+from vector_store import MemmapVectorStore
+
+
+class MetadataIndex:
+    """
+    An in-memory index from metadata values to the rows of a MemmapVectorStore, used to
+    restrict a search to matching rows before any of them is scored.
+
+    Like `BM25Index`, it is keyed by the store's physical rows and is updated by `update`
+    after rows are appended. It is not persisted: it is built from the store's records
+    when opened, which reads the records sidecar once. Only the `fields` given are
+    indexed; values are compared for equality, and list values index each element.
+    """
+    def __init__(self, store: MemmapVectorStore, fields: Tuple[str, ...] = ("source_url", "document_id", "title"),
+                 update_batch_rows: int = 4096):
+        self.store = store
+        self.fields = tuple(fields)
+        self.update_batch_rows = update_batch_rows
+        self._lock = threading.Lock()
+        self._generation = store.generation
+        self._rows = 0
+        # field -> value -> rows in ascending order (a list until first used in a mask).
+        self._postings: Dict[str, Dict[Any, Any]] = {field: {} for field in self.fields}
+        self.update()
+
+    def update(self):
+        """Indexes the rows appended to the store since the last call; rebuilds after a compaction."""
+        with self._lock:
+            if self._generation != self.store.generation:
+                self._generation = self.store.generation
+                self._rows = 0
+                self._postings = {field: {} for field in self.fields}
+            while self._rows < self.store.row_count:
+                first = self._rows
+                rows = list(range(first, min(self.store.row_count, first + self.update_batch_rows)))
+                for row, record in zip(rows, self.store.get_records(rows)):
+                    metadata = record.get("metadata") or {}
+                    for field in self.fields:
+                        values = metadata.get(field)
+                        for value in values if isinstance(values, list) else [values]:
+                            if value is not None:
+                                self._add(field, value, row)
+                self._rows = rows[-1] + 1
+
+    def _add(self, field: str, value: Any, row: int):
+        postings = self._postings[field]
+        rows = postings.get(value)
+        if isinstance(rows, np.ndarray):
+            rows = postings[value] = rows.tolist()
+        if rows is None:
+            rows = postings[value] = []
+        rows.append(row)
+
+    def _value_rows(self, field: str, value: Any) -> np.ndarray:
+        postings = self._postings[field]
+        rows = postings.get(value)
+        if rows is None:
+            return np.empty(0, dtype=np.int64)
+        if not isinstance(rows, np.ndarray):
+            rows = postings[value] = np.asarray(rows, dtype=np.int64)
+        return rows
+
+    def values(self, field: str) -> List[Any]:
+        """The distinct indexed values of a field (including those of deleted rows)."""
+        with self._lock:
+            return list(self._postings[field])
+
+    def mask(self, filters: Dict[str, Any], base: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Builds a boolean mask over the store's physical rows matching every filter.
+
+        Args:
+            filters (Dict[str, Any]): Field -> required value, or a list of accepted values.
+            base (Optional[np.ndarray]): A mask to intersect with; defaults to the live rows.
+
+        Returns:
+            np.ndarray: The rows whose metadata matches all filters.
+
+        Raises:
+            KeyError: If a filter uses a field that is not indexed.
+        """
+        mask = self.store.live_mask() if base is None else base.copy()
+        with self._lock:
+            for field, accepted in filters.items():
+                if field not in self._postings:
+                    raise KeyError(f"metadata field {field!r} is not indexed; indexed fields are {self.fields}")
+                values: Iterable[Any] = accepted if isinstance(accepted, (list, tuple, set, frozenset)) else [accepted]
+                field_mask = np.zeros(mask.shape[0], dtype=bool)
+                for value in values:
+                    rows = self._value_rows(field, value)
+                    field_mask[rows[rows < mask.shape[0]]] = True
+                mask &= field_mask
+        return mask
@@ -1,95 +1,796 @@
 import asyncio
-from typing import Dict, Any, List
+import hashlib
+import logging
+import random
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, AsyncIterator, Awaitable, Optional, Set, Tuple, Union
 
 from agents import CrawlerAgent
 from agents import ParserAgent
 from agents import ChunkingEmbeddingAgent
 from agents import QueryAgent
+from agents import LocalQueryExpander
+from agents import ContextAssembler
+from agents import MMRReranker
 from agents import RAGAgent
 from agents import ValidationQAAgent
+from agents import AsyncOllamaClient
 
-from vector_database_connector import VectorDatabaseConnector # Connector class
+from answer_cache import SemanticAnswerCache
+from embedding_cache import EmbeddingCache
+from expansion_cache import ExpansionCache
+from ingestion_registry import IngestionRegistry
+from vector_database_connector import VectorDatabaseConnector, DEFAULT_COLLECTION # Connector class
+from search_engine import reciprocal_rank_fusion
 from response_formatter import ResponseFormatter
+from telemetry import RequestTrace, metrics
+
+logger = logging.getLogger(__name__)
 
 class OrchestrationLayer:
     """
     The Orchestration Layer coordinates the workflow between different agents
     and manages communication within the Multi-Agent RAG system.
+
+    Model calls go through one shared `AsyncOllamaClient`, which never blocks the event
+    loop and bounds the requests in flight. CPU- and disk-bound steps (parsing, chunking,
+    vector store reads and writes) run on a bounded thread pool via `_run_blocking`.
+
+    Query handling overlaps independent stages: ingestion of the user's URL, LLM query
+    expansion and embedding of the raw query run concurrently; a search with the raw
+    query starts as soon as ingestion finishes and is merged with the search for the
+    expanded query. In "hybrid" retrieval mode that search combines the vector ranking
+    with a BM25 keyword ranking, and the expansion terms are searched by keyword only,
+    so expansion costs no extra embedding call; the rankings are merged with reciprocal
+    rank fusion. In "vector" mode the expanded query is embedded and searched as well.
+    Validation can run inline ("sync"), after the answer has been
+    returned ("async"), or on a random sample of requests ("sampled").
+
+    Validated answers are kept in a `SemanticAnswerCache`. Once ingestion has finished
+    and the raw query is embedded, a query similar enough to an earlier one is answered
+    from the cache, skipping retrieval, generation and validation. Re-ingesting a
+    changed source invalidates the answers generated from it. Follow-up questions,
+    whose answers depend on the conversation so far, bypass the cache.
+
+    One instance is meant to serve the whole process: it holds the pooled HTTP client,
+    the loaded vector index, the model client and the caches. Per-conversation state
+    lives in a `RAGAgent` session (see `new_session`) passed to the query workflows.
     """
-    def __init__(self):
+    VALIDATION_MODES = ("sync", "async", "sampled")
+    RETRIEVAL_MODES = ("hybrid", "vector")
+
+    def __init__(self, max_concurrent_llm_requests: int = 4, max_blocking_workers: int = 4,
+                 validation_mode: str = "sync", validation_sample_rate: float = 0.1,
+                 expansion_timeout_s: Optional[float] = None, top_k: int = 5,
+                 crawl_depth: int = 0, crawl_max_pages: int = 50, crawl_politeness_delay_s: float = 0.0,
+                 retrieval_mode: str = "hybrid", hybrid_candidates: int = 50,
+                 answer_cache_threshold: float = 0.95, answer_cache_ttl_s: float = 3600.0,
+                 answer_cache_entries: int = 1024, expansion_latency_budget_ms: Optional[float] = None,
+                 expansion_synonyms: Optional[Dict[str, List[str]]] = None,
+                 max_prompt_tokens: int = 3072, max_history_tokens: int = 768,
+                 validator_mode: str = "tiered", validation_audit_rate: float = 0.0,
+                 mmr_lambda: Optional[float] = 0.7, mmr_candidates: int = 20, merge_adjacent_chunks: bool = True,
+                 max_collections: int = 64):
+        """
+        Args:
+            max_concurrent_llm_requests (int): Cap on Ollama requests in flight.
+            max_blocking_workers (int): Size of the thread pool for blocking steps.
+            validation_mode (str): One of "sync", "async" or "sampled".
+            validation_sample_rate (float): Fraction of requests validated in "sampled" mode.
+            expansion_timeout_s (Optional[float]): If set, retrieval stops waiting for LLM
+                                                   query expansion after this many seconds
+                                                   and uses the raw-query results alone.
+            top_k (int): The number of chunks retrieved per query.
+            crawl_depth (int): How many same-site links to follow from URLs given in a query.
+            crawl_max_pages (int): The page budget of one crawl.
+            crawl_politeness_delay_s (float): Minimum delay between requests to one host.
+            retrieval_mode (str): "hybrid" (vector + BM25) or "vector".
+            hybrid_candidates (int): Results taken from each ranking before fusion in "hybrid" mode.
+            answer_cache_threshold (float): Minimum cosine similarity between query embeddings
+                                            for a cached answer to be reused.
+            answer_cache_ttl_s (float): How long a cached answer stays valid.
+            answer_cache_entries (int): Capacity of the answer cache; 0 disables it.
+            expansion_latency_budget_ms (Optional[float]): If set, query expansion never calls
+                                                           the LLM: cached expansions are used,
+                                                           or else a local expansion from
+                                                           `expansion_synonyms` and the corpus
+                                                           vocabulary. It is also the default
+                                                           `expansion_timeout_s`.
+            expansion_synonyms (Optional[Dict[str, List[str]]]): Synonym table for local expansion.
+            max_prompt_tokens (int): Token budget of a generation prompt (system prompt,
+                                     history, retrieved context and query).
+            max_history_tokens (int): The part of that budget earlier turns may use.
+            validator_mode (str): How responses are judged: "tiered" (local faithfulness check,
+                                  escalating ambiguous scores to the LLM), "local" or "llm".
+            validation_audit_rate (float): Fraction of local verdicts also sent to the LLM
+                                           judge to measure agreement.
+            mmr_lambda (Optional[float]): Relevance weight of the maximal-marginal-relevance
+                                          re-ranking of retrieved chunks (see `MMRReranker`);
+                                          None disables re-ranking.
+            mmr_candidates (int): Chunks retrieved for the re-ranking to pick `top_k` from.
+            merge_adjacent_chunks (bool): Whether re-ranking merges neighbouring chunks of a
+                                          document into one span.
+            max_collections (int): How many source collections (see `source_collection`) are
+                                   kept on disk; the least recently used are deleted.
+        """
+        if validation_mode not in self.VALIDATION_MODES:
+            raise ValueError(f"validation_mode must be one of {self.VALIDATION_MODES}, got {validation_mode!r}")
+        if retrieval_mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {self.RETRIEVAL_MODES}, got {retrieval_mode!r}")
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = max(1, hybrid_candidates)
+        self.validation_mode = validation_mode
+        self.validation_sample_rate = validation_sample_rate
+        if expansion_timeout_s is None and expansion_latency_budget_ms is not None:
+            expansion_timeout_s = expansion_latency_budget_ms / 1000
+        self.expansion_timeout_s = expansion_timeout_s
+        self.top_k = top_k
+        self.reranker = (MMRReranker(diversity_lambda=mmr_lambda, merge_adjacent=merge_adjacent_chunks)
+                         if mmr_lambda is not None else None)
+        self.mmr_candidates = max(top_k, mmr_candidates)
+        self.crawl_depth = crawl_depth
+        self.crawl_max_pages = crawl_max_pages
+        self.crawl_politeness_delay_s = crawl_politeness_delay_s
+        self.context_assembler = ContextAssembler(max_prompt_tokens=max_prompt_tokens,
+                                                  max_history_tokens=max_history_tokens)
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.llm_client = AsyncOllamaClient(max_concurrent_requests=max_concurrent_llm_requests)
+        self.blocking_executor = ThreadPoolExecutor(max_workers=max_blocking_workers)
         self.crawler_agent = CrawlerAgent()
         self.parser_agent = ParserAgent()
-        self.chunking_embedding_agent = ChunkingEmbeddingAgent()
-        self.vector_db_connector = VectorDatabaseConnector()
-        self.query_agent = QueryAgent()
-        self.rag_agent = RAGAgent()
-        self.validation_qa_agent = ValidationQAAgent()
+        self.embedding_cache = EmbeddingCache()
+        self.chunking_embedding_agent = ChunkingEmbeddingAgent(cache=self.embedding_cache, llm_client=self.llm_client)
+        self.vector_db_connector = VectorDatabaseConnector(embedding_agent=self.chunking_embedding_agent,
+                                                           max_collections=max_collections,
+                                                           on_evict=self._forget_collection)
+        self.expansion_cache = ExpansionCache()
+        local_expander = LocalQueryExpander(
+            synonyms=expansion_synonyms,
+            vocabulary=lambda collection: self.vector_db_connector.document_frequencies(collection),
+            vocabulary_version=lambda collection: self.vector_db_connector.vocabulary_version(collection))
+        self.query_agent = QueryAgent(llm_client=self.llm_client, cache=self.expansion_cache,
+                                      local_expander=local_expander, latency_budget_ms=expansion_latency_budget_ms)
+        self.rag_agent = self.new_session()
+        self.validation_qa_agent = ValidationQAAgent(llm_client=self.llm_client, mode=validator_mode,
+                                                     audit_sample_rate=validation_audit_rate)
         self.response_formatter = ResponseFormatter()
+        self.ingestion_registry = IngestionRegistry()
+        self.answer_cache = (SemanticAnswerCache(answer_cache_threshold, answer_cache_ttl_s, answer_cache_entries)
+                             if answer_cache_entries > 0 else None)
+        # Held only while some ingestion holds or waits for the lock, so the map does not
+        # grow with every source ever ingested.
+        self._source_locks: "weakref.WeakValueDictionary[Tuple[str, str, str], asyncio.Lock]" = \
+            weakref.WeakValueDictionary()
+
+    def new_session(self, collection: str = DEFAULT_COLLECTION) -> RAGAgent:
+        """
+        Creates the per-conversation state (the RAG agent and its history) for one client.
+        The session's queries ingest into and retrieve from `collection` unless a query
+        names its own (see `source_collection`).
+        """
+        return RAGAgent(llm_client=self.llm_client, context_assembler=self.context_assembler, collection=collection)
+
+    @staticmethod
+    def source_collection(sources: List[str]) -> str:
+        """
+        The collection for queries over a set of source URLs. Every client asking about
+        the same sources shares it, so the pages are ingested once and answers cached for
+        one client are reused for the others, while a query only searches its own sources.
+        """
+        digest = hashlib.blake2b("\n".join(sorted(set(sources))).encode('utf-8'), digest_size=8).hexdigest()
+        return f"sources-{digest}"
+
+    def close_session(self, session: RAGAgent):
+        """
+        Drops a finished session's collection, with its ingestion records and cached answers.
+        Only for a collection private to the session; shared collections must be kept.
+        """
+        if session.collection == DEFAULT_COLLECTION:
+            return
+        self.vector_db_connector.drop_collection(session.collection)
+        for key in [key for key in list(self._source_locks.keys()) if key[0] == session.collection]:
+            self._source_locks.pop(key, None)
+        self._forget_collection(session.collection)
+
+    def _forget_collection(self, collection: str):
+        """
+        Forgets the ingestion records and cached answers of a collection whose files were
+        deleted, so its sources are ingested again when next asked about. Also called by
+        the connector, from a worker thread, when it evicts an idle collection.
+        """
+        self.ingestion_registry.forget_prefix(self._registry_key(collection, ""))
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_scope(collection)
+
+    @staticmethod
+    def _registry_key(collection: str, document_id: str) -> str:
+        """The ingestion registry's document ID for a document of a collection."""
+        return document_id if collection == DEFAULT_COLLECTION else f"{collection}/{document_id}"
+
+    async def aclose(self):
+        """Releases the shared resources: pooled HTTP connections, worker threads and background tasks."""
+        for task in list(self._background_tasks):
+            task.cancel()
+        await self.crawler_agent.aclose()
+        self.blocking_executor.shutdown(wait=False)
+
+    async def _run_blocking(self, func: Callable, *args: Any) -> Any:
+        """Runs a blocking call on the bounded worker pool without stalling the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.blocking_executor, func, *args)
 
-    async def ingest_document_workflow(self, document_source: str, document_id: str) -> bool:
+    async def ingest_document_workflow(self, document_source: str, document_id: str,
+                                       trace: Optional[RequestTrace] = None,
+                                       collection: str = DEFAULT_COLLECTION) -> bool:
         """
         Manages the workflow for ingesting a new document into the RAG system.
         This involves crawling, parsing, chunking, embedding, and storing.
 
+        Ingestion is incremental: the source is fetched with a conditional GET, and a
+        document whose content is unchanged since the last ingestion is not parsed or
+        embedded again. When it has changed, only chunks that are new are embedded and
+        stored, and chunks from the previous version that no longer exist are deleted.
+
         Args:
             document_source (str): The source or URL of the document to ingest.
             document_id (str): A unique ID for the document.
+            trace (Optional[RequestTrace]): The request trace to record stage timings in.
+            collection (str): The vector store collection to ingest into.
 
         Returns:
             bool: True if ingestion was successful, False otherwise.
         """
+        return await self._ingest_locked(document_source, document_id, trace or RequestTrace(), collection)
+
+    async def ingest_sources_workflow(self, sources: List[str], document_id: str,
+                                      trace: Optional[RequestTrace] = None,
+                                      max_depth: Optional[int] = None,
+                                      max_pages: Optional[int] = None,
+                                      collection: str = DEFAULT_COLLECTION) -> bool:
+        """
+        Ingests several sources concurrently, optionally crawling same-site links from
+        them (see `CrawlerAgent.crawl_many`). Each page is parsed, chunked, embedded and
+        stored as soon as it has been fetched, while the rest of the crawl continues.
+        Pages are ingested incrementally, like `ingest_document_workflow`.
+
+        Args:
+            sources (List[str]): The URLs to ingest.
+            document_id (str): The document ID to store the pages under.
+            trace (Optional[RequestTrace]): The request trace to record stage timings in.
+            max_depth (Optional[int]): Link depth to follow; defaults to `crawl_depth`.
+            max_pages (Optional[int]): Page budget; defaults to `crawl_max_pages`.
+            collection (str): The vector store collection to ingest into.
+
+        Returns:
+            bool: True if at least one page was ingested (or found unchanged).
+        """
+        trace = trace or RequestTrace()
+
+        def validators(url: str):
+            previous = self.ingestion_registry.get(self._registry_key(collection, document_id), url)
+            if previous and self.vector_db_connector.has_chunks(previous["chunk_ids"], collection):
+                return previous["etag"], previous["last_modified"]
+            return None, None
+
+        ingestions: List[asyncio.Task] = []
         try:
-            raw_content = await self.crawler_agent.crawl(document_source)
+            with trace.stage("crawl"):
+                async for page in self.crawler_agent.crawl_many(
+                        sources,
+                        max_depth=self.crawl_depth if max_depth is None else max_depth,
+                        max_pages=self.crawl_max_pages if max_pages is None else max_pages,
+                        politeness_delay_s=self.crawl_politeness_delay_s,
+                        decode=False,
+                        validators=validators):
+                    ingestions.append(asyncio.create_task(
+                        self._ingest_locked(page["url"], document_id, trace, collection, fetched=page)))
+            results = await asyncio.gather(*ingestions)
+        finally:
+            # When the request is cancelled (superseded or disconnected), stop the page
+            # ingestions too rather than leaving them to write after the request ended.
+            unfinished = [task for task in ingestions if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+        trace.record("crawl", pages_ingested=sum(results), pages_failed=len(results) - sum(results))
+        return any(results)
+
+    async def _ingest_locked(self, document_source: str, document_id: str, trace: RequestTrace,
+                             collection: str, fetched: Optional[Dict[str, Any]] = None) -> bool:
+        # Serialize ingestions of the same source, so concurrent sessions sharing a URL
+        # neither embed it twice nor interleave their registry updates.
+        key = (collection, document_id, document_source)
+        lock = self._source_locks.get(key)
+        if lock is None:
+            lock = self._source_locks[key] = asyncio.Lock()
+        async with lock:
+            return await self._ingest_document(document_source, document_id, trace, collection, fetched)
+
+    async def _ingest_document(self, document_source: str, document_id: str, trace: RequestTrace,
+                               collection: str, fetched: Optional[Dict[str, Any]] = None) -> bool:
+        """Ingests one source, fetching it first unless a (conditional) fetch result is given."""
+        status = "failed"
+        registry_key = self._registry_key(collection, document_id)
+        try:
+            previous = self.ingestion_registry.get(registry_key, document_source)
+            if previous and not await self._run_blocking(self.vector_db_connector.has_chunks, previous["chunk_ids"],
+                                                         collection):
+                previous = None
+
+            if fetched is None:
+                with trace.stage("crawl"):
+                    fetched = await self.crawler_agent.fetch(
+                        document_source,
+                        etag=previous["etag"] if previous else None,
+                        last_modified=previous["last_modified"] if previous else None,
+                        decode=False,
+                    )
+            if fetched.get("error"):
+                # Leave the registry as it is: the source is fetched again on the next request.
+                trace.error("crawl")
+                return False
+            if previous and fetched["status_code"] == 304:
+                self.ingestion_registry.touch(registry_key, document_source)
+                trace.record("crawl", items=1, not_modified=1)
+                status = "unchanged"
+                return True
+
+            raw_content = fetched["content"]
             if not raw_content:
+                trace.error("crawl")
                 return False
+            trace.record("crawl", items=1, nbytes=len(raw_content))
+
+            if isinstance(raw_content, str):
+                raw_content = raw_content.encode('utf-8')
+            content_hash = hashlib.sha256(raw_content).hexdigest()
+            if previous and previous["content_hash"] == content_hash:
+                self.ingestion_registry.touch(registry_key, document_source,
+                                              fetched["etag"], fetched["last_modified"])
+                status = "unchanged"
+                return True
 
-            parsed_data = self.parser_agent.parse(raw_content)
+            with trace.stage("parse"):
+                parsed_data = await self._run_blocking(self.parser_agent.parse, raw_content, "text/html",
+                                                       fetched.get("encoding"))
             if not parsed_data:
+                trace.error("parse")
                 return False
+            parsed_data["metadata"]["source_url"] = document_source
+            trace.record("parse", nbytes=len(parsed_data.get("text", "")))
 
-            chunks_with_embeddings = self.chunking_embedding_agent.process(parsed_data)
-            if not chunks_with_embeddings:
+            with trace.stage("chunk"):
+                chunks = await self._run_blocking(self.chunking_embedding_agent.prepare_chunks, parsed_data)
+            if not chunks:
+                trace.error("chunk")
                 return False
+            trace.record("chunk", items=len(chunks))
 
-            success = self.vector_db_connector.add_documents(document_id, chunks_with_embeddings)
-            if not success:
-                return False
+            previous_positions = {chunk_id: i for i, chunk_id in enumerate(previous["chunk_ids"])} if previous else {}
+            previous_chunk_ids = set(previous_positions)
+            new_chunks = [chunk for chunk in chunks if chunk["chunk_id"] not in previous_positions]
+            # Kept chunks that moved are stored again under their new 'chunk_index', with
+            # their stored embeddings, so adjacent-chunk merging sees the current order.
+            moved_chunks = [chunk for chunk in chunks
+                            if previous_positions.get(chunk["chunk_id"], chunk["metadata"]["chunk_index"])
+                            != chunk["metadata"]["chunk_index"]]
+            chunks_with_embeddings = []
+            if new_chunks:
+                with trace.stage("embed"):
+                    chunks_with_embeddings = await self.chunking_embedding_agent.attach_embeddings(new_chunks)
+                trace.record("embed", items=len(new_chunks),
+                             cache_hits=self.chunking_embedding_agent.last_run_stats.get("cache_hits", 0))
+                if any(chunk["embedding"] is None for chunk in chunks_with_embeddings):
+                    # The model is unreachable; the source is retried on the next request.
+                    trace.error("embed")
+                    return False
+            if moved_chunks:
+                stored = await self._run_blocking(self.vector_db_connector.get_embeddings,
+                                                  [chunk["chunk_id"] for chunk in moved_chunks], collection)
+                chunks_with_embeddings = chunks_with_embeddings + [
+                    {**chunk, "embedding": embedding.tolist()} for chunk, embedding in zip(moved_chunks, stored)]
+            if chunks_with_embeddings:
+                with trace.stage("store"):
+                    success = await self._run_blocking(self.vector_db_connector.add_documents, document_id,
+                                                   chunks_with_embeddings, collection)
+                if not success:
+                    trace.error("store")
+                    return False
+                trace.record("store", items=len(chunks_with_embeddings))
 
+            current_chunk_ids = [chunk["chunk_id"] for chunk in chunks]
+            stale_chunk_ids = previous_chunk_ids.difference(current_chunk_ids)
+            if stale_chunk_ids:
+                with trace.stage("store"):
+                    deleted = await self._run_blocking(self.vector_db_connector.delete_chunks, list(stale_chunk_ids),
+                                                   collection)
+                if not deleted:
+                    trace.error("store")
+                    return False
+                trace.record("store", deleted=len(stale_chunk_ids))
+            if stale_chunk_ids or moved_chunks:
+                self._spawn_background(self._compact(collection))
+
+            self.ingestion_registry.record(registry_key, document_source, content_hash, current_chunk_ids,
+                                           fetched["etag"], fetched["last_modified"])
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_sources([document_source])
+            status = "success"
             return True
 
-        except Exception as e:
+        except Exception:
+            logger.exception("Ingestion of %s failed", document_source)
+            status = "error"
             return False
+        finally:
+            metrics.inc("rag_requests_total", workflow="ingest", status=status)
+
+    async def _search(self, query_embedding: List[float], collection: str,
+                      filters: Optional[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        return await self._run_blocking(self.vector_db_connector.search, query_embedding, top_k,
+                                        collection, filters)
+
+    async def _hybrid_candidates(self, query_text: str, query_embedding: List[float], collection: str,
+                                 filters: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Runs the vector and BM25 searches for the raw query concurrently; returns both rankings."""
+        vector_results, lexical_results = await asyncio.gather(
+            self._run_blocking(self.vector_db_connector.search, query_embedding, self.hybrid_candidates,
+                               collection, filters),
+            self._run_blocking(self.vector_db_connector.lexical_search_batch, [query_text], self.hybrid_candidates,
+                               collection, filters))
+        return [vector_results] + lexical_results
+
+    def _merge_results(self, top_k: int, *result_lists: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merges search results, keeping each chunk's best score, and returns the `top_k` best."""
+        best: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for chunk in results:
+                current = best.get(chunk["chunk_id"])
+                if current is None or chunk["score"] > current["score"]:
+                    best[chunk["chunk_id"]] = chunk
+        return sorted(best.values(), key=lambda chunk: chunk["score"], reverse=True)[:top_k]
 
-    async def handle_query_workflow(self, user_query: str) -> Dict[str, Any]:
+    async def _rerank(self, candidates: List[Dict[str, Any]], collection: str,
+                      trace: RequestTrace) -> List[Dict[str, Any]]:
+        """Picks `top_k` diverse chunks from the over-fetched candidates and merges neighbouring ones."""
+        if self.reranker is None:
+            return candidates[:self.top_k]
+        with trace.stage("rerank"):
+            embeddings = await self._run_blocking(self.vector_db_connector.get_embeddings,
+                                                  [chunk["chunk_id"] for chunk in candidates], collection)
+            chunks, stats = self.reranker.rerank(candidates, embeddings, self.top_k)
+        trace.record("rerank", items=len(chunks), candidates=stats["candidates"], merged=stats["merged"],
+                     saved_tokens=stats["saved_tokens"])
+        metrics.inc("rag_rerank_saved_tokens_total", stats["saved_tokens"])
+        return chunks
+
+    async def _retrieve(self, user_query: str, trace: RequestTrace,
+                        ingestion: Optional[Awaitable[bool]] = None,
+                        document_source: Union[str, List[str], None] = None,
+                        collection: str = DEFAULT_COLLECTION,
+                        filters: Optional[Dict[str, Any]] = None,
+                        use_answer_cache: bool = True) -> Dict[str, Any]:
+        """
+        Expands the query and retrieves the most relevant chunks of `collection` (matching
+        the metadata `filters`, if any), overlapping the independent stages. With a
+        reranker, `mmr_candidates` chunks are retrieved and re-ranked down to `top_k`
+        diverse ones (see `_rerank`). If `ingestion`
+        is given, it runs concurrently with query expansion and raw-query embedding, and
+        searching starts once it has finished. Cached answers are scoped to the collection
+        and are not used for filtered queries, nor when `use_answer_cache` is False.
+
+        Returns:
+            Dict[str, Any]: On success, {"retrieved_chunks": [...], "query_embedding": [...]};
+                            {"cached_answer": {...}} when the answer cache has a hit; otherwise
+                            a terminal {"response", "status"} result.
+        """
+        cleaned_query = user_query.strip().lower()
+        expansion_task = asyncio.create_task(trace.timed("expand", self.query_agent.process_query(user_query, collection)))
+        raw_embedding_task = asyncio.create_task(
+            trace.timed("embed_query", self.chunking_embedding_agent.embed_query(cleaned_query)))
+        try:
+            if ingestion is not None:
+                ingestion_success = await trace.timed("ingest", ingestion)
+                if not ingestion_success:
+                    if not isinstance(document_source, str):
+                        document_source = ", ".join(document_source or [])
+                    return {"response": f"Could not get data from the provided URL: {document_source}. Please check the URL and try again.",
+                            "status": "ingestion_failed"}
+
+            query_embedding = await raw_embedding_task
+            if self.answer_cache is not None and use_answer_cache and not filters:
+                cached_answer = self.answer_cache.lookup(query_embedding, scope=collection)
+                trace.record("answer_cache", hits=int(cached_answer is not None))
+                if cached_answer is not None:
+                    return {"cached_answer": cached_answer}
+
+            hybrid = self.retrieval_mode == "hybrid"
+            limit = self.mmr_candidates if self.reranker is not None else self.top_k
+            raw_search = (self._hybrid_candidates(cleaned_query, query_embedding, collection, filters) if hybrid
+                          else self._search(query_embedding, collection, filters, limit))
+            raw_search_task = asyncio.create_task(trace.timed("search", raw_search))
+            try:
+                processed_query = await asyncio.wait_for(asyncio.shield(expansion_task), self.expansion_timeout_s)
+            except asyncio.TimeoutError:
+                processed_query = None
+            expansion_mode = processed_query["expansion_mode"] if processed_query else "timeout"
+            metrics.inc("rag_query_expansions_total", mode=expansion_mode)
+            trace.record("expand", mode=expansion_mode)
+            raw_results = await raw_search_task
+
+            enhanced_query = (processed_query or {}).get("enhanced_query", cleaned_query)
+            expanded_terms = (processed_query or {}).get("expanded_terms") or []
+            retrieved_chunks = raw_results
+            if hybrid:
+                rankings = raw_results
+                if expanded_terms:
+                    rankings = rankings + await trace.timed("search", self._run_blocking(
+                        self.vector_db_connector.lexical_search_batch, [" ".join(expanded_terms)],
+                        self.hybrid_candidates, collection, filters))
+                retrieved_chunks = reciprocal_rank_fusion(rankings, top_k=limit)
+            elif enhanced_query != cleaned_query:
+                enhanced_embedding = await trace.timed("embed_query", self.chunking_embedding_agent.embed_query(enhanced_query))
+                enhanced_results = await trace.timed("search", self._search(enhanced_embedding, collection, filters, limit))
+                retrieved_chunks = self._merge_results(limit, raw_results, enhanced_results)
+            trace.record("search", items=len(retrieved_chunks))
+            retrieved_chunks = await self._rerank(retrieved_chunks, collection, trace)
+        finally:
+            for task in (expansion_task, raw_embedding_task):
+                if not task.done():
+                    task.cancel()
+
+        if not retrieved_chunks:
+            return {"response": "I couldn't find any relevant information for your query.", "status": "no_results"}
+        return {"retrieved_chunks": retrieved_chunks, "query_embedding": query_embedding}
+
+    def _cached_result(self, cached_answer: Dict[str, Any], user_query: str, session: RAGAgent) -> Dict[str, Any]:
+        """Builds the workflow result for an answer cache hit and records the turn in the session."""
+        answer = cached_answer["answer"]
+        session.record_turn(user_query, answer["response_text"])
+        return {"response": answer["response"], "status": "success", "source_chunks": answer["source_chunks"],
+                "sources": answer["sources"], "validation": answer["validation"],
+                "answer_cache": {"query": cached_answer["query"], "similarity": round(cached_answer["similarity"], 4)}}
+
+    def _cache_answer(self, query_embedding: List[float], user_query: str, rag_response: Dict[str, Any],
+                      result: Dict[str, Any], collection: str, filters: Optional[Dict[str, Any]]):
+        """Stores a successful answer in the answer cache once it is known to be valid."""
+        if self.answer_cache is None or filters or result.get("status") != "success":
+            return
+
+        def store(validation: Dict[str, Any]):
+            if not validation.get("is_valid"):
+                return
+            source_chunks = result["source_chunks"]
+            answer = {"response": result["response"], "response_text": rag_response.get("response_text", ""),
+                      "source_chunks": source_chunks, "sources": result["sources"], "validation": validation}
+            self.answer_cache.put(query_embedding, user_query, answer,
+                                  (chunk.get("metadata", {}).get("source_url") for chunk in source_chunks),
+                                  scope=collection)
+
+        pending_validation = result.get("pending_validation")
+        if pending_validation is None:
+            store(result.get("validation", {}))
+        else:
+            pending_validation.add_done_callback(
+                lambda task: None if task.cancelled() or task.exception() else store(task.result()))
+
+    def _start_ingestion(self, document_source: Union[str, List[str], None], document_id: str,
+                         trace: RequestTrace, collection: str) -> Optional[Awaitable[bool]]:
+        """Returns the ingestion to run alongside a query: one URL, or a crawl from several."""
+        if not document_source:
+            return None
+        if isinstance(document_source, str) and not self.crawl_depth:
+            return self.ingest_document_workflow(document_source, document_id, trace, collection)
+        sources = [document_source] if isinstance(document_source, str) else list(document_source)
+        return self.ingest_sources_workflow(sources, document_id, trace, collection=collection)
+
+    def _spawn_background(self, coroutine: Awaitable) -> asyncio.Task:
+        """Runs a coroutine after the response is returned, keeping a reference until it finishes."""
+        task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        task.add_done_callback(self._log_background_failure)
+        return task
+
+    @staticmethod
+    def _log_background_failure(task: asyncio.Task):
+        """Retrieves a finished background task's exception, so it is logged once rather than lost."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background task failed", exc_info=task.exception())
+
+    async def _compact(self, collection: str):
+        """Reclaims the rows of deleted chunks once enough of the collection's store is dead."""
+        try:
+            stats = await self._run_blocking(self.vector_db_connector.maybe_compact, collection)
+        except Exception:
+            logger.exception("Compaction of collection %s failed", collection)
+            return
+        if stats is not None:
+            metrics.inc("rag_store_compactions_total")
+            metrics.inc("rag_store_reclaimed_rows_total", stats["rows_before"] - stats["rows_after"])
+
+    async def _validate(self, rag_response: Dict[str, Any], user_query: str,
+                        retrieved_chunks: List[Dict[str, Any]], trace: RequestTrace) -> Dict[str, Any]:
+        with trace.stage("validate"):
+            validation_result = await self.validation_qa_agent.validate(rag_response, user_query, retrieved_chunks)
+        tier = validation_result.get("tier", "llm")
+        trace.record("validate", tier=tier)
+        metrics.inc("rag_validations_total", tier=tier, verdict="valid" if validation_result.get("is_valid") else "invalid")
+        if "audit" in validation_result:
+            metrics.inc("rag_validation_audits_total", result="agree" if validation_result["audit"]["agrees"] else "disagree")
+        return validation_result
+
+    async def _finalize_response(self, rag_response: Dict[str, Any], user_query: str,
+                                 retrieved_chunks: List[Dict[str, Any]], trace: RequestTrace) -> Dict[str, Any]:
+        """
+        Validates (according to `validation_mode`) and formats a generated response into
+        the workflow's final result. In "async" mode the validation task is returned under
+        the "pending_validation" key instead of being awaited.
+        """
+        context = rag_response.get("context")
+        if context:
+            trace.record("generate", prompt_tokens=context["prompt_tokens"], saved_tokens=context["saved_tokens"])
+            metrics.inc("rag_prompt_tokens_total", context["prompt_tokens"], kind="sent")
+            metrics.inc("rag_prompt_tokens_total", context["saved_tokens"], kind="saved")
+
+        pending_validation = None
+        if self.validation_mode == "async":
+            pending_validation = self._spawn_background(self._validate(rag_response, user_query, retrieved_chunks, trace))
+            validation_result = {"status": "pending"}
+        elif self.validation_mode == "sampled" and random.random() >= self.validation_sample_rate:
+            validation_result = {"status": "skipped"}
+        else:
+            validation_result = await self._validate(rag_response, user_query, retrieved_chunks, trace)
+            if not validation_result.get("is_valid"):
+                return {"response": f"Response validation failed. Reason: {validation_result.get('reason', 'Unknown')}. Please rephrase your query.", "status": "validation_failed", "validation": validation_result}
+
+        with trace.stage("format"):
+            final_response = self.response_formatter.format(rag_response)
+        result = {"response": final_response, "status": "success", "source_chunks": retrieved_chunks,
+                  "sources": rag_response.get("sources", []), "validation": validation_result}
+        if pending_validation is not None:
+            result["pending_validation"] = pending_validation
+        return result
+
+    async def handle_query_workflow(self, user_query: str, document_source: Union[str, List[str], None] = None,
+                                    document_id: str = "user_docs",
+                                    session: Optional[RAGAgent] = None, collection: Optional[str] = None,
+                                    filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Manages the workflow for handling a user query.
         This involves querying, RAG processing, validation, and response formatting.
 
         Args:
             user_query (str): The query from the user.
+            document_source (Union[str, List[str], None]): A URL, or several URLs to crawl,
+                                                        to ingest first; ingestion overlaps
+                                                        with query expansion.
+            document_id (str): The document ID to ingest `document_source` under.
+            session (Optional[RAGAgent]): The caller's conversation, from `new_session`;
+                                          defaults to a conversation shared by all callers.
+            collection (Optional[str]): The collection to ingest into and search; defaults to
+                                        the session's collection.
+            filters (Optional[Dict[str, Any]]): Metadata the retrieved chunks must match, e.g.
+                                                {"source_url": [...]}; applied before scoring.
 
         Returns:
-            Dict[str, Any]: A dictionary containing the final response and metadata.
+            Dict[str, Any]: A dictionary containing the final response, metadata and
+                            per-stage "timings" in milliseconds, and the full request "trace".
         """
-        try:
-            processed_query = await self.query_agent.process_query(user_query)
-            if not processed_query:
-                return {"response": "Could not process your query.", "status": "failed"}
+        trace = RequestTrace()
+        session = session or self.rag_agent
+        result = await self._run_query_workflow(user_query, document_source, document_id, trace, session,
+                                                collection or session.collection, filters)
+        # An async-mode validation finishes in the background: the result reports it as
+        # pending, and a valid answer is cached once it completes.
+        result.pop("pending_validation", None)
+        return self._complete(result, trace, "query")
 
-            retrieved_chunks = self.vector_db_connector.search(processed_query.get("enhanced_query", user_query), top_k=5)
-            if not retrieved_chunks:
-                return {"response": "I couldn't find any relevant information for your query.", "status": "no_results"}
+    def _complete(self, result: Dict[str, Any], trace: RequestTrace, workflow: str) -> Dict[str, Any]:
+        """Attaches the request's timings and trace to a final result and counts it."""
+        result["timings"] = trace.as_dict()
+        result["trace"] = trace.to_dict()
+        metrics.inc("rag_requests_total", workflow=workflow, status=result.get("status", "unknown"))
+        return result
 
-            rag_response = self.rag_agent.generate_response(user_query, retrieved_chunks)
+    async def _run_query_workflow(self, user_query: str, document_source: Union[str, List[str], None],
+                                  document_id: str, trace: RequestTrace, session: RAGAgent, collection: str,
+                                  filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            ingestion = self._start_ingestion(document_source, document_id, trace, collection)
+            # An answer may depend on earlier turns, so follow-up questions neither use nor fill the cache.
+            use_answer_cache = not session.has_history
+            retrieval = await self._retrieve(user_query, trace, ingestion, document_source, collection, filters,
+                                             use_answer_cache)
+            if "cached_answer" in retrieval:
+                return self._cached_result(retrieval["cached_answer"], user_query, session)
+            if "retrieved_chunks" not in retrieval:
+                return retrieval
+            retrieved_chunks = retrieval["retrieved_chunks"]
+
+            with trace.stage("generate"):
+                rag_response = await session.generate_response(user_query, retrieved_chunks)
             if not rag_response:
                 return {"response": "An error occurred while generating the response.", "status": "failed"}
 
-            validation_result = await self.validation_qa_agent.validate(rag_response, user_query, retrieved_chunks)
-            if not validation_result.get("is_valid"):
-                return {"response": f"Response validation failed. Reason: {validation_result.get('reason', 'Unknown')}. Please rephrase your query.", "status": "validation_failed"}
+            result = await self._finalize_response(rag_response, user_query, retrieved_chunks, trace)
+            if use_answer_cache:
+                self._cache_answer(retrieval["query_embedding"], user_query, rag_response, result, collection, filters)
+            return result
 
-            final_response = self.response_formatter.format(rag_response)
-            return {"response": final_response, "status": "success", "source_chunks": retrieved_chunks}
+        except Exception as e:
+            logger.exception("Query workflow failed")
+            return {"response": f"An unexpected error occurred: {e}", "status": "error"}
+
+    async def stream_query_workflow(self, user_query: str, document_source: Union[str, List[str], None] = None,
+                                    document_id: str = "user_docs",
+                                    session: Optional[RAGAgent] = None, collection: Optional[str] = None,
+                                    filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of `handle_query_workflow`. Answer tokens are yielded as soon
+        as the model produces them; validation and formatting run after generation.
+
+        Args:
+            user_query (str): The query from the user.
+            document_source (Union[str, List[str], None]): A URL, or several URLs to crawl,
+                                                        to ingest first; ingestion overlaps
+                                                        with query expansion.
+            document_id (str): The document ID to ingest `document_source` under.
+            session (Optional[RAGAgent]): The caller's conversation, from `new_session`;
+                                          defaults to a conversation shared by all callers.
+            collection (Optional[str]): As for `handle_query_workflow`.
+            filters (Optional[Dict[str, Any]]): As for `handle_query_workflow`.
+
+        Yields:
+            Dict[str, Any]: `{"type": "token", "token": str}` frames, then exactly one
+                            `{"type": "final", ...}` frame carrying the same fields as the
+                            result of `handle_query_workflow`. In "async" validation mode a
+                            `{"type": "validation", "validation": {...}}` frame follows once
+                            validation completes.
+        """
+        trace = RequestTrace()
+        session = session or self.rag_agent
+        collection = collection or session.collection
+        try:
+            ingestion = self._start_ingestion(document_source, document_id, trace, collection)
+            # An answer may depend on earlier turns, so follow-up questions neither use nor fill the cache.
+            use_answer_cache = not session.has_history
+            retrieval = await self._retrieve(user_query, trace, ingestion, document_source, collection, filters,
+                                             use_answer_cache)
+            if "cached_answer" in retrieval:
+                result = self._cached_result(retrieval["cached_answer"], user_query, session)
+                yield {"type": "token", "token": retrieval["cached_answer"]["answer"]["response_text"]}
+                yield {"type": "final", **self._complete(result, trace, "stream")}
+                return
+            if "retrieved_chunks" not in retrieval:
+                yield {"type": "final", **self._complete(retrieval, trace, "stream")}
+                return
+            retrieved_chunks = retrieval["retrieved_chunks"]
+
+            rag_response = None
+            with trace.stage("generate"):
+                async for event in session.stream_response(user_query, retrieved_chunks):
+                    if event["type"] == "token":
+                        trace.mark("first_token")
+                        yield event
+                    else:
+                        rag_response = event["response"]
+            if not rag_response:
+                yield {"type": "final", **self._complete({"response": "An error occurred while generating the response.",
+                                                          "status": "failed"}, trace, "stream")}
+                return
+
+            result = await self._finalize_response(rag_response, user_query, retrieved_chunks, trace)
+            if use_answer_cache:
+                self._cache_answer(retrieval["query_embedding"], user_query, rag_response, result, collection, filters)
+            pending_validation = result.pop("pending_validation", None)
+            yield {"type": "final", **self._complete(result, trace, "stream")}
+            if pending_validation is not None:
+                yield {"type": "validation", "validation": await pending_validation}
 
         except Exception as e:
-            return {"response": f"An unexpected error occurred: {e}", "status": "error"}
\ No newline at end of file
+            logger.exception("Streaming query workflow failed")
+            yield {"type": "final", **self._complete({"response": f"An unexpected error occurred: {e}",
+                                                      "status": "error"}, trace, "stream")}
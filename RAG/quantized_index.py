@@ -0,0 +1,338 @@
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from search_engine import ExactSearchEngine, select_top_k
+from vector_store import GrowableArray, MemmapVectorStore, normalize_rows
+
+
+class ScalarQuantizer:
+    """
+    8-bit scalar quantization: each dimension's range over the training sample is split
+    into 256 levels, so a vector is stored in `dim` bytes (4x smaller than float32).
+    """
+    def __init__(self):
+        self.low: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.low.shape[0]
+
+    def train(self, sample: np.ndarray):
+        self.low = sample.min(axis=0).astype(np.float32)
+        self.scale = ((sample.max(axis=0) - self.low) / 255).astype(np.float32)
+        self.scale[self.scale == 0] = 1.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((vectors - self.low) / self.scale), 0, 255).astype(np.uint8)
+
+    def prepare(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # q . x ~= q . (low + code * scale) = (q * scale) . code + q . low
+        return (queries * self.scale).astype(np.float32), queries @ self.low
+
+    def scores(self, prepared: Tuple[np.ndarray, np.ndarray], codes: np.ndarray) -> np.ndarray:
+        weights, bias = prepared
+        return weights @ codes.T.astype(np.float32) + bias[:, np.newaxis]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.low, self.scale = state["low"], state["scale"]
+
+
+class ProductQuantizer:
+    """
+    Product quantization: vectors are split into `subspaces` equal parts and each part is
+    replaced by the id of its nearest centroid in that subspace's k-means codebook of
+    256 entries, so a vector is stored in `subspaces` bytes. Scores are computed from
+    per-query lookup tables of query-part . centroid products.
+    """
+    CODEBOOK_SIZE = 256
+    # k-means on more points per centroid than this barely moves the centroids.
+    MAX_TRAIN_POINTS_PER_CENTROID = 64
+
+    def __init__(self, subspaces: Optional[int] = None, kmeans_iterations: int = 10, seed: int = 0):
+        if subspaces is not None and subspaces < 1:
+            raise ValueError(f"subspaces must be positive, got {subspaces}")
+        self.subspaces = subspaces
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None  # (subspaces, codebook size, dim / subspaces)
+
+    @property
+    def code_size(self) -> int:
+        return self.codebooks.shape[0]
+
+    @staticmethod
+    def default_subspaces(dim: int) -> int:
+        """One subspace per 8 dimensions (or the largest part size below 8 that divides `dim`)."""
+        part = max(size for size in range(1, min(8, dim) + 1) if dim % size == 0)
+        return dim // part
+
+    def subspaces_for(self, dim: int) -> int:
+        """
+        The number of subspaces vectors of `dim` dimensions are split into.
+
+        Raises:
+            ValueError: If the configured `subspaces` do not divide `dim`.
+        """
+        subspaces = self.subspaces or self.default_subspaces(dim)
+        if dim % subspaces:
+            raise ValueError(f"{subspaces} subspaces do not divide the embedding dimension {dim}")
+        return subspaces
+
+    def train(self, sample: np.ndarray):
+        dim = sample.shape[1]
+        subspaces = self.subspaces_for(dim)
+        part = dim // subspaces
+        rng = np.random.default_rng(self.seed)
+        max_points = self.CODEBOOK_SIZE * self.MAX_TRAIN_POINTS_PER_CENTROID
+        if sample.shape[0] > max_points:
+            sample = sample[rng.choice(sample.shape[0], size=max_points, replace=False)]
+        size = min(self.CODEBOOK_SIZE, sample.shape[0])
+        codebooks = np.empty((subspaces, size, part), dtype=np.float32)
+        for s in range(subspaces):
+            vectors = np.ascontiguousarray(sample[:, s * part:(s + 1) * part])
+            centroids = vectors[rng.choice(vectors.shape[0], size=size, replace=False)].copy()
+            for _ in range(self.kmeans_iterations):
+                labels = self._nearest(vectors, centroids)
+                counts = np.bincount(labels, minlength=size)
+                sums = np.stack([np.bincount(labels, weights=vectors[:, d], minlength=size) for d in range(part)], axis=1)
+                empty = counts == 0
+                centroids = (sums / np.maximum(counts, 1)[:, np.newaxis]).astype(np.float32)
+                centroids[empty] = vectors[rng.choice(vectors.shape[0], size=int(empty.sum()))]
+            codebooks[s] = centroids
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin |x - c|^2 = argmin (|c|^2 - 2 x . c)
+        return np.argmin((centroids * centroids).sum(axis=1) - 2 * vectors @ centroids.T, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subspaces, _, part = self.codebooks.shape
+        codes = np.empty((vectors.shape[0], subspaces), dtype=np.uint8)
+        for s in range(subspaces):
+            codes[:, s] = self._nearest(vectors[:, s * part:(s + 1) * part], self.codebooks[s])
+        return codes
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        subspaces, _, part = self.codebooks.shape
+        return np.einsum('bsd,skd->bsk', queries.reshape(queries.shape[0], subspaces, part), self.codebooks)
+
+    def scores(self, tables: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        scores = np.zeros((tables.shape[0], codes.shape[0]), dtype=np.float32)
+        for s in range(codes.shape[1]):
+            scores += tables[:, s, codes[:, s]]
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        self.codebooks = state["codebooks"]
+
+
+class QuantizedIndex:
+    """
+    A search index over compressed copies of a MemmapVectorStore's rows, with exact
+    re-scoring.
+
+    Every row is encoded with `encoding` ("int8", see `ScalarQuantizer`, or "pq", see
+    `ProductQuantizer`) and the codes are kept in memory. A search scores the codes to
+    shortlist `rescore_factor * top_k` rows per query, then re-scores only the shortlist
+    with the float32 rows from the store's memory map, so the returned scores are exact
+    and only the shortlisted rows of the float matrix are paged in. With a
+    `rescore_factor` of 1 the rows returned are the first pass's top_k.
+
+    The codebook is trained on a sample of up to `train_sample_rows` rows once the store
+    holds `min_train_rows` rows (or when `train` is called); until then searches fall
+    back to exact search. Like `IVFIndex`, the index is persisted next to the store
+    (`quant_<encoding>_codebook.npz` and `quant_<encoding>_codes.u8`), codes are appended
+    as `update` runs, codes written by another process are loaded rather than encoded
+    again, and after a compaction the rows of the new generation are re-encoded with
+    the same codebook.
+
+    A `pq_subspaces` that does not divide the dimension of a non-empty store raises
+    ValueError on construction.
+    """
+    ENCODINGS = ("int8", "pq")
+    PREFILTER_FRACTION = ExactSearchEngine.PREFILTER_FRACTION
+
+    def __init__(self, store: MemmapVectorStore, encoding: str = "int8", rescore_factor: int = 4,
+                 pq_subspaces: Optional[int] = None, min_train_rows: int = 10000,
+                 train_sample_rows: int = 65536, kmeans_iterations: int = 10, seed: int = 0):
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"encoding must be one of {self.ENCODINGS}, got {encoding!r}")
+        self.store = store
+        self.encoding = encoding
+        self.rescore_factor = max(1, rescore_factor)
+        self.min_train_rows = min_train_rows
+        self.train_sample_rows = train_sample_rows
+        self.seed = seed
+        self.exact_engine = ExactSearchEngine(store)
+        self.quantizer = ScalarQuantizer() if encoding == "int8" else ProductQuantizer(
+            pq_subspaces, kmeans_iterations=kmeans_iterations, seed=seed)
+        if encoding == "pq" and store.dim:
+            self.quantizer.subspaces_for(store.dim)
+        self.is_trained = False
+        self._generation = store.generation
+        self._codes = GrowableArray(np.uint8, (0,))
+        self.update()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store.data_dir, f"quant_{self.encoding}_{name}")
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Memory held per row: the code size (the float32 rows stay on disk)."""
+        return self.quantizer.code_size if self.is_trained else 4 * (self.store.dim or 0)
+
+    def _load(self):
+        """Loads a persisted codebook and codes; codes beyond the store's committed rows are dropped."""
+        try:
+            with np.load(self._path("codebook.npz")) as state:
+                self.quantizer.load_state({key: state[key] for key in state.files})
+            codes = np.fromfile(self._path("codes.u8"), dtype=np.uint8)
+        except (FileNotFoundError, ValueError, KeyError):
+            return
+        code_size = self.quantizer.code_size
+        rows = min(codes.shape[0] // code_size, self.store.row_count)
+        self._codes = GrowableArray(np.uint8, (code_size,), codes[:rows * code_size].reshape(rows, code_size))
+        self.is_trained = True
+
+    def _load_tail(self):
+        """Loads the codes appended to disk by other processes since the last load."""
+        code_size = self.quantizer.code_size
+        try:
+            codes = np.fromfile(self._path("codes.u8"), dtype=np.uint8, offset=len(self._codes) * code_size)
+        except (FileNotFoundError, ValueError):
+            return
+        rows = min(codes.shape[0] // code_size, self.store.row_count - len(self._codes))
+        if rows > 0:
+            self._codes.extend(codes[:rows * code_size].reshape(rows, code_size))
+
+    def _encode_rows(self, first_row: int, block_rows: int = 65536) -> np.ndarray:
+        matrix = self.store.matrix()
+        blocks = [self.quantizer.encode(np.asarray(matrix[start:start + block_rows]))
+                  for start in range(first_row, matrix.shape[0], block_rows)]
+        return np.concatenate(blocks) if blocks else np.empty((0, self.quantizer.code_size), dtype=np.uint8)
+
+    def _save(self):
+        with open(self._path("codebook.npz"), 'wb') as f:
+            np.savez(f, **self.quantizer.state())
+        self._codes.view.tofile(self._path("codes.u8"))
+
+    def train(self, sample_rows: Optional[int] = None):
+        """
+        (Re)trains the codebook on a random sample of the store's rows and re-encodes
+        every row. Called automatically once the store reaches `min_train_rows`.
+
+        Args:
+            sample_rows (Optional[int]): Training sample size; defaults to `train_sample_rows`.
+        """
+        with self.store.locked():
+            self.store.refresh()
+            matrix = self.store.matrix()
+            n = matrix.shape[0]
+            if n == 0:
+                return
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(n, sample_rows or self.train_sample_rows)
+            self.quantizer.train(np.asarray(matrix[np.sort(rng.choice(n, size=sample_size, replace=False))]))
+            self._codes = GrowableArray(np.uint8, (self.quantizer.code_size,), self._encode_rows(0))
+            self.is_trained = True
+            self._save()
+
+    def update(self):
+        """
+        Encodes the rows appended to the store since the last call and appends their
+        codes to disk.
+        """
+        with self.store.locked():
+            self.store.refresh()
+            if self._generation != self.store.generation:
+                self._generation = self.store.generation
+                self._codes = GrowableArray(np.uint8, (0,))
+                was_trained, self.is_trained = self.is_trained, False
+                self._load()
+                if not self.is_trained and was_trained and self.store.row_count:
+                    self._codes = GrowableArray(np.uint8, (self.quantizer.code_size,), self._encode_rows(0))
+                    self.is_trained = True
+                    self._save()
+            elif not self.is_trained:
+                self._load()
+            else:
+                self._load_tail()
+
+            if not self.is_trained:
+                if self.store.row_count >= self.min_train_rows:
+                    self.train()
+                return
+
+            indexed = len(self._codes)
+            if self.store.row_count <= indexed:
+                return
+            new_codes = self._encode_rows(indexed)
+            with open(self._path("codes.u8"), 'ab') as f:
+                f.write(new_codes.tobytes())
+            self._codes.extend(new_codes)
+
+    def _approximate_scores(self, prepared: Any, rows: Optional[np.ndarray], block_rows: int) -> np.ndarray:
+        codes = self._codes.view if rows is None else self._codes.view[rows]
+        batch = prepared[0].shape[0] if isinstance(prepared, tuple) else prepared.shape[0]
+        scores = np.empty((batch, codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], block_rows):
+            scores[:, start:start + block_rows] = self.quantizer.scores(prepared, codes[start:start + block_rows])
+        return scores
+
+    def search(self, queries: np.ndarray, top_k: int = 5, mask: Optional[np.ndarray] = None,
+               rescore_factor: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Quantized search with the same contract as `ExactSearchEngine.search`.
+
+        Args:
+            queries (np.ndarray): A single query of shape (dim,) or a batch of shape (batch, dim).
+            top_k (int): The number of rows to return per query.
+            mask (Optional[np.ndarray]): Boolean mask over physical rows; defaults to live rows.
+            rescore_factor (Optional[int]): Overrides the configured shortlist size factor.
+
+        Returns:
+            List[List[Tuple[int, float]]]: For each query, (row, exact score) pairs sorted
+                                           by descending score.
+        """
+        if not self.is_trained:
+            return self.exact_engine.search(queries, top_k=top_k, mask=mask)
+
+        queries = normalize_rows(np.atleast_2d(queries))
+        if mask is None:
+            mask = self.store.live_mask()
+        indexed = min(len(self._codes), mask.shape[0])
+        mask = mask[:indexed]
+        rows = np.flatnonzero(mask)
+        if rows.shape[0] == 0 or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        prepared = self.quantizer.prepare(queries)
+        # Bounds the float32 copy of the codes scored at once to about 16 MB.
+        block_rows = max(1, (1 << 22) // self.quantizer.code_size)
+        shortlist_size = top_k * (rescore_factor or self.rescore_factor)
+        if rows.shape[0] < indexed * self.PREFILTER_FRACTION:
+            shortlists = [[int(rows[i]) for i, _ in hits] for hits in
+                          select_top_k(self._approximate_scores(prepared, rows, block_rows), shortlist_size)]
+        else:
+            scores = self._approximate_scores(prepared, None, block_rows)
+            scores[:, ~mask] = -np.inf
+            shortlists = [[row for row, _ in hits] for hits in select_top_k(scores, shortlist_size)]
+
+        matrix = self.store.matrix()
+        results = []
+        for query, shortlist in zip(queries, shortlists):
+            candidates = np.sort(np.asarray(shortlist, dtype=np.int64))
+            exact_scores = matrix[candidates] @ query
+            hits = select_top_k(exact_scores[np.newaxis, :], top_k)[0]
+            results.append([(int(candidates[i]), score) for i, score in hits])
+        return results
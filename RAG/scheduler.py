@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import time
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+from telemetry import metrics
+
+
+class SchedulerBusy(Exception):
+    """Raised by `RequestScheduler.run` when every slot is taken and the queue is full."""
+
+
+class RequestSuperseded(Exception):
+    """Raised by `RequestScheduler.run` when a newer request of the same session replaced this one."""
+
+
+class _Job:
+    def __init__(self, priority: int, sequence: int):
+        self.priority = priority
+        self.sequence = sequence
+        self.enqueued_at = time.monotonic()
+        self.admitted: Optional[asyncio.Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self.holds_slot = False
+        self.superseded = False
+        self.successor: Optional["_Job"] = None
+
+
+class RequestScheduler:
+    """
+    Server-wide admission control for request pipelines.
+
+    At most `max_concurrent` pipelines run at once; further requests wait in a queue of
+    at most `max_queue` entries, and a request arriving when the queue is full is
+    rejected at once with `SchedulerBusy`, so an overloaded server answers "busy"
+    quickly instead of piling work onto the model.
+
+    Each session runs one request at a time: a new request cancels the session's
+    queued or running request (which raises `RequestSuperseded`) and takes over its
+    place in the queue or its slot, starting once the cancelled one has unwound. A user
+    who rephrases a question stops paying for the old crawl, embedding and generation,
+    and the new question is never turned away as busy.
+
+    When a slot frees up, the waiting request with the lowest effective priority runs
+    next. The effective priority is the request's `priority` lowered by one for every
+    `aging_s` seconds it has waited, so expensive requests are not starved. Ties go to
+    the session that was served least recently, then to the oldest request.
+
+    The queue depth, the running pipelines, queue wait times and request outcomes are
+    exported through `telemetry.metrics`.
+    """
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, aging_s: float = 5.0):
+        """
+        Args:
+            max_concurrent (int): The most pipelines running at once.
+            max_queue (int): The most requests waiting for a slot.
+            aging_s (float): Waiting time that raises a request's priority by one level.
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.aging_s = aging_s
+        self._active = 0
+        self._jobs: Dict[str, _Job] = {}
+        self._waiting: Dict[str, _Job] = {}
+        self._last_served: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        metrics.gauge_callback("rag_scheduler_queue_depth", lambda: self.queue_depth)
+        metrics.gauge_callback("rag_scheduler_running", lambda: self.running)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._active
+
+    async def run(self, session_id: str, pipeline: Callable[[], Awaitable[Any]], priority: int = 0) -> Any:
+        """
+        Runs `pipeline()` once admitted and returns its result.
+
+        Args:
+            session_id (str): The session the request belongs to.
+            pipeline (Callable[[], Awaitable[Any]]): Creates the request's coroutine.
+            priority (int): Lower values run first.
+
+        Raises:
+            SchedulerBusy: If the queue is full.
+            RequestSuperseded: If a newer request of the session cancelled this one.
+        """
+        job = _Job(priority, next(self._sequence))
+        previous = self._jobs.get(session_id)
+        outcome = "cancelled"
+        try:
+            if previous is None:
+                self._admit(session_id, job)
+            else:
+                self._take_over(session_id, previous, job)
+            self._jobs[session_id] = job
+            if job.admitted is not None:
+                await job.admitted
+            if job.superseded:
+                raise RequestSuperseded()
+            metrics.observe("rag_scheduler_wait_seconds", time.monotonic() - job.enqueued_at)
+            self._last_served[session_id] = time.monotonic()
+            job.task = asyncio.ensure_future(pipeline())
+            result = await job.task
+            outcome = "completed"
+            return result
+        except SchedulerBusy:
+            outcome = "busy"
+            raise
+        except RequestSuperseded:
+            outcome = "superseded"
+            raise
+        except asyncio.CancelledError:
+            if job.superseded:
+                outcome = "superseded"
+                raise RequestSuperseded() from None
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            metrics.inc("rag_scheduler_requests_total", outcome=outcome)
+            if self._waiting.get(session_id) is job:
+                del self._waiting[session_id]
+            if self._jobs.get(session_id) is job:
+                del self._jobs[session_id]
+            self._release(job)
+
+    def close_session(self, session_id: str):
+        """Cancels the session's request, if any, and forgets the session."""
+        job = self._jobs.get(session_id)
+        if job is not None:
+            if self._waiting.get(session_id) is job:
+                del self._waiting[session_id]
+            if job.task is not None:
+                job.task.cancel()
+            elif job.admitted is not None and not job.admitted.done():
+                job.admitted.cancel()
+        self._last_served.pop(session_id, None)
+
+    def _admit(self, session_id: str, job: _Job):
+        """Gives a request a free slot, or a place in the queue; raises `SchedulerBusy` if the queue is full."""
+        if self._active < self.max_concurrent and not self._waiting:
+            self._active += 1
+            job.holds_slot = True
+            return
+        if len(self._waiting) >= self.max_queue:
+            raise SchedulerBusy(f"{self._active} requests running and {len(self._waiting)} queued")
+        job.admitted = asyncio.get_running_loop().create_future()
+        self._waiting[session_id] = job
+
+    def _take_over(self, session_id: str, previous: _Job, job: _Job):
+        """
+        Supersedes the session's previous request with `job`, which takes over its place
+        in the queue or, once the previous request has unwound, its slot. A superseding
+        request therefore never finds the queue full.
+        """
+        previous.superseded = True
+        job.admitted = asyncio.get_running_loop().create_future()
+        if self._waiting.get(session_id) is previous:
+            job.sequence, job.enqueued_at = previous.sequence, previous.enqueued_at
+            self._waiting[session_id] = job
+            previous.admitted.cancel()
+            return
+        # Running, admitted, or itself waiting to take over a slot: `_release` passes
+        # the slot down the chain of successors.
+        previous.successor = job
+        if previous.task is not None:
+            previous.task.cancel()
+        elif not previous.holds_slot:
+            previous.admitted.cancel()
+
+    def _release(self, job: _Job):
+        if not job.holds_slot:
+            return
+        job.holds_slot = False
+        successor = job.successor
+        while successor is not None and successor.admitted.done():  # superseded or cancelled meanwhile
+            successor = successor.successor
+        if successor is not None:
+            successor.holds_slot = True
+            successor.admitted.set_result(None)
+            return
+        self._active -= 1
+        self._admit_next()
+
+    def _admit_next(self):
+        """Admits the best waiting requests into the free slots."""
+        now = time.monotonic()
+        while self._waiting and self._active < self.max_concurrent:
+            session_id = min(self._waiting, key=lambda key: (
+                self._waiting[key].priority - int((now - self._waiting[key].enqueued_at) / self.aging_s),
+                self._last_served.get(key, 0.0), self._waiting[key].sequence))
+            job = self._waiting.pop(session_id)
+            if job.admitted.done():  # cancelled, not yet unwound
+                continue
+            self._active += 1
+            job.holds_slot = True
+            job.admitted.set_result(None)
@@ -0,0 +1,105 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from vector_store import MemmapVectorStore, normalize_rows
+
+
+class ExactSearchEngine:
+    """
+    Exact (brute-force) cosine similarity search over a MemmapVectorStore.
+
+    The store keeps its rows L2-normalized, so scoring a batch of queries is a single
+    matrix product against the memory-mapped matrix, and the top-k rows per query are
+    picked with `np.argpartition` (linear time) before sorting only those k rows.
+    When a mask selects fewer than `PREFILTER_FRACTION` of the rows (e.g. a metadata
+    filter), only the selected rows are read and scored.
+    """
+    PREFILTER_FRACTION = 0.5
+
+    def __init__(self, store: MemmapVectorStore):
+        self.store = store
+
+    def update(self):
+        """Called after rows are appended to the store; exact search keeps no index."""
+
+    def search(self, queries: np.ndarray, top_k: int = 5,
+               mask: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Scores every row against each query and returns the best rows.
+
+        Args:
+            queries (np.ndarray): A single query of shape (dim,) or a batch of shape (batch, dim).
+            top_k (int): The number of rows to return per query.
+            mask (Optional[np.ndarray]): Boolean mask over physical rows; rows marked False
+                                         are never returned. Defaults to the store's live rows.
+
+        Returns:
+            List[List[Tuple[int, float]]]: For each query, (row, score) pairs sorted by
+                                           descending score.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        matrix = self.store.matrix()
+        if matrix.shape[0] == 0 or top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        if mask is None:
+            mask = self.store.live_mask()
+        rows = np.flatnonzero(mask)
+        if rows.shape[0] < matrix.shape[0] * self.PREFILTER_FRACTION:
+            if rows.shape[0] == 0:
+                return [[] for _ in range(queries.shape[0])]
+            hits = select_top_k(queries @ matrix[rows].T, top_k)
+            return [[(int(rows[i]), score) for i, score in query_hits] for query_hits in hits]
+        scores = queries @ matrix.T
+        scores[:, ~mask] = -np.inf
+        return select_top_k(scores, top_k)
+
+
+def select_top_k(scores: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+    """
+    Picks the top_k columns of each row of a (batch, n) score matrix with a partial
+    selection, sorting only the selected columns. Columns scored -inf are dropped.
+    """
+    n = scores.shape[1]
+    k = min(top_k, n)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), (scores.shape[0], n))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    top_rows = np.take_along_axis(candidates, order, axis=1)
+    top_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    results = []
+    for rows, row_scores in zip(top_rows.tolist(), top_scores.tolist()):
+        results.append([(row, score) for row, score in zip(rows, row_scores) if score != -np.inf])
+    return results
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], top_k: int, k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+    """
+    Fuses ranked result lists (e.g. vector and BM25 results) with reciprocal rank fusion:
+    a chunk scores sum(weight / (k + rank)) over the lists it appears in. Only ranks are
+    used, so lists with incomparable scores can be combined.
+
+    Args:
+        result_lists (List[List[Dict[str, Any]]]): Ranked results, each with a 'chunk_id'.
+        top_k (int): The number of fused results to return.
+        k (int): Damping constant; larger values flatten the contribution of top ranks.
+        weights (Optional[List[float]]): A weight per list; defaults to 1 for every list.
+
+    Returns:
+        List[Dict[str, Any]]: The best chunks, with 'score' replaced by the fused score.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, Dict[str, Any]] = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, chunk in enumerate(results, start=1):
+            fused[chunk["chunk_id"]] = fused.get(chunk["chunk_id"], 0.0) + weight / (k + rank)
+            chunks.setdefault(chunk["chunk_id"], chunk)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [{**chunks[chunk_id], "score": score} for chunk_id, score in ranked]
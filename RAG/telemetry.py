@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Awaitable, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Summary:
+    """
+    Tracks the count and sum of observations and estimates quantiles from a sliding
+    window of the most recent `window` observations.
+    """
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self._recent.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self._recent:
+            return {q: 0.0 for q in self.QUANTILES}
+        values = np.percentile(np.fromiter(self._recent, dtype=np.float64), [q * 100 for q in self.QUANTILES])
+        return dict(zip(self.QUANTILES, values.tolist()))
+
+
+class MetricsRegistry:
+    """
+    An in-process registry of counters, gauges and latency summaries that renders in the
+    Prometheus text exposition format. Safe to update from several threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        self._summaries: Dict[str, Dict[LabelSet, Summary]] = {}
+        self._gauge_callbacks: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1.0, **labels: Any):
+        """Increments a counter."""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: Any):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def gauge_callback(self, name: str, callback: Callable[[], float]):
+        """Registers a gauge whose value is read from `callback` at render time."""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def observe(self, name: str, value: float, **labels: Any):
+        """Records an observation (e.g. a duration in seconds) in a summary."""
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = Summary()
+            series[key].observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the current values as plain dictionaries, e.g. for benchmarks."""
+        with self._lock:
+            return {
+                "counters": {name: {_format_labels(key) or "{}": value for key, value in series.items()}
+                             for name, series in self._counters.items()},
+                "summaries": {name: {_format_labels(key) or "{}": {"count": summary.count, "sum": summary.total,
+                                                            **{f"p{int(q * 100)}": v for q, v in summary.quantiles().items()}}
+                                     for key, summary in series.items()}
+                              for name, series in self._summaries.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            callbacks = dict(self._gauge_callbacks)
+            for name, series in sorted(self._summaries.items()):
+                self._header(lines, name, "summary")
+                for key, summary in sorted(series.items()):
+                    for quantile, value in summary.quantiles().items():
+                        lines.append(f"{name}{_format_labels(key, ('quantile', str(quantile)))} {value}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {summary.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+        for name, callback in callbacks.items():
+            try:
+                gauges.setdefault(name, {})[()] = float(callback())
+            except Exception:
+                logger.exception("Gauge callback for %s failed; the gauge is left out", name)
+        for name, series in sorted(gauges.items()):
+            self._header(lines, name, "gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, metric_type: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+
+metrics = MetricsRegistry()
+metrics.describe("rag_stage_duration_seconds", "Wall-clock duration of each pipeline stage.")
+metrics.describe("rag_stage_items_total", "Items (pages, chunks, results) processed per pipeline stage.")
+metrics.describe("rag_stage_bytes_total", "Bytes processed per pipeline stage.")
+metrics.describe("rag_errors_total", "Errors raised inside a pipeline stage.")
+metrics.describe("rag_requests_total", "Completed workflows by kind and final status.")
+metrics.describe("rag_embedding_cache_lookups_total", "Embedding cache lookups by result tier.")
+metrics.describe("rag_query_expansions_total", "Query expansions by how they were produced (llm, cache, local or timeout).")
+metrics.describe("rag_prompt_tokens_total", "Generation prompt tokens sent, and saved by history and context budgeting.")
+metrics.describe("rag_validations_total", "Response validations by deciding tier (local or llm) and verdict.")
+metrics.describe("rag_validation_audits_total", "Sampled LLM audits of local validation verdicts, by agreement.")
+metrics.describe("rag_rerank_saved_tokens_total", "Context tokens saved by diversity re-ranking and span merging.")
+metrics.describe("rag_store_compactions_total", "Vector store compactions triggered after chunks were deleted.")
+metrics.describe("rag_store_reclaimed_rows_total", "Deleted and superseded vector store rows dropped by compaction.")
+metrics.describe("rag_scheduler_queue_depth", "Requests waiting for a pipeline slot.")
+metrics.describe("rag_scheduler_running", "Request pipelines running.")
+metrics.describe("rag_scheduler_wait_seconds", "Time requests waited in the scheduler queue.")
+metrics.describe("rag_scheduler_requests_total", "Scheduled requests by outcome (completed, busy, superseded, cancelled or error).")
+
+
+class RequestTrace:
+    """
+    Times the pipeline stages of one request. Every stage duration is recorded both in
+    this trace and in the process-wide `rag_stage_duration_seconds` summary, along with
+    optional item counts and byte sizes.
+    """
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.attributes: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a block as stage `name`; an exception inside it is counted as a stage error."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.registry.inc("rag_errors_total", stage=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+            self.registry.observe("rag_stage_duration_seconds", elapsed, stage=name)
+
+    async def timed(self, name: str, awaitable: Awaitable) -> Any:
+        """Awaits `awaitable`, recording its duration under `name`."""
+        with self.stage(name):
+            return await awaitable
+
+    def mark(self, name: str):
+        """Records the time elapsed since the request started under `name`, once."""
+        if name not in self.durations:
+            elapsed = time.perf_counter() - self._start
+            self.durations[name] = elapsed
+            self.registry.observe("rag_stage_duration_seconds", elapsed, stage=name)
+
+    def error(self, stage: str):
+        """Counts a failure of `stage` that was handled without raising (e.g. an empty crawl)."""
+        self.registry.inc("rag_errors_total", stage=stage)
+        self.attributes.setdefault(stage, {})["error"] = True
+
+    def record(self, stage: str, items: Optional[int] = None, nbytes: Optional[int] = None, **attributes: Any):
+        """Attaches counts, byte sizes or other attributes (e.g. cache hits) to a stage."""
+        stage_attributes = self.attributes.setdefault(stage, {})
+        if items is not None:
+            stage_attributes["items"] = stage_attributes.get("items", 0) + items
+            self.registry.inc("rag_stage_items_total", items, stage=stage)
+        if nbytes is not None:
+            stage_attributes["bytes"] = stage_attributes.get("bytes", 0) + nbytes
+            self.registry.inc("rag_stage_bytes_total", nbytes, stage=stage)
+        for key, value in attributes.items():
+            stage_attributes[key] = stage_attributes.get(key, 0) + value if isinstance(value, (int, float)) else value
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, plus the total elapsed time so far."""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.durations.items()}
+        timings["total"] = round((time.perf_counter() - self._start) * 1000, 2)
+        return timings
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The full trace: per-stage timings plus the recorded stage attributes."""
+        return {"timings_ms": self.as_dict(), "stages": self.attributes}
+
@@ -2,13 +2,61 @@ const chatMessages = document.getElementById('chatMessages');
 const messageInput = document.getElementById('messageInput');
 const socket = new WebSocket('ws://127.0.0.1:8000/chat');
 
+// The bubble currently receiving streamed tokens, if an answer is in progress.
+let streamingBubble = null;
+
 socket.onopen = () => {
     console.log('Connection established');
 };
 
+socket.onmessage = (event) => {
+    try {
+        const response = JSON.parse(event.data);
+
+        if (response.type === 'token') {
+            if (!streamingBubble) {
+                streamingBubble = appendLLMBubble('');
+            }
+            streamingBubble.textContent += response.token;
+        } else if (response.type === 'validation') {
+            // Validation may finish after the answer was shown; flag answers that failed it.
+            if (response.validation && response.validation.is_valid === false) {
+                appendLLMBubble(`Note: the previous answer could not be verified against the sources (${response.validation.reason}).`);
+            }
+        } else {
+            // A final frame (or a plain {"message": ...} frame) replaces the streamed
+            // text with the formatted answer, including sources.
+            if (streamingBubble) {
+                streamingBubble.textContent = response.message;
+            } else {
+                appendLLMBubble(response.message);
+            }
+            streamingBubble = null;
+        }
+
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    } catch (e) {
+        console.error('Error parsing JSON from WebSocket message:', e);
+        console.log('Received data was not valid JSON:', event.data);
+    }
+};
+
+function appendLLMBubble(text) {
+    const messageRow = document.createElement('div');
+    messageRow.classList.add('message-row-start');
+
+    const bubbleDiv = document.createElement('div');
+    bubbleDiv.classList.add('message-bubble', 'llm');
+    bubbleDiv.textContent = text;
+
+    messageRow.appendChild(bubbleDiv);
+    chatMessages.appendChild(messageRow);
+    return bubbleDiv;
+}
+
 function sendMessage() {
     const messageText = messageInput.value.trim();
-    console.log("hi")
     if (messageText) {
         const messageRow = document.createElement('div');
         messageRow.classList.add('message-row-end');
@@ -24,42 +72,18 @@ function sendMessage() {
 
         messageInput.value = '';
 
-        setTimeout(() => {
-            LLMResponse(messageText);
-        }, 1000);
+        LLMResponse(messageText);
     }
 }
 
-async function LLMResponse(userMessage) {
+function LLMResponse(userMessage) {
     const message = {
-        "query": userMessage
+        "query": userMessage,
+        "stream": true
     };
     socket.send(JSON.stringify(message));
-
-    socket.onmessage = (event) => {
-        try {
-            const response = JSON.parse(event.data);
-            const responseText = response.message
-
-            const messageRow = document.createElement('div');
-            messageRow.classList.add('message-row-start');
-
-            const bubbleDiv = document.createElement('div');
-            bubbleDiv.classList.add('message-bubble', 'llm');
-            bubbleDiv.textContent = responseText;
-
-            messageRow.appendChild(bubbleDiv);
-            chatMessages.appendChild(messageRow);
-
-            chatMessages.scrollTop = chatMessages.scrollHeight;
-
-        } catch (e) {
-            console.error('Error parsing JSON from WebSocket message:', e);
-            console.log('Received data was not valid JSON:', event.data);
-        }
-    };
 }
 
 window.onload = () => {
     chatMessages.scrollTop = chatMessages.scrollHeight;
-};
\ No newline at end of file
+};
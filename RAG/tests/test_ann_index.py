@@ -0,0 +1,77 @@
+import numpy as np
+
+from ann_index import IVFIndex, recall_at_k
+from search_engine import ExactSearchEngine
+from vector_store import MemmapVectorStore
+
+
+CENTERS = np.random.default_rng(42).normal(size=(10, 16))
+
+
+def _vectors(rng, rows):
+    return CENTERS[rng.integers(len(CENTERS), size=rows)] + 0.4 * rng.normal(size=(rows, CENTERS.shape[1]))
+
+
+def _append(store, vectors, start=0):
+    store.append([(f"c{start + i}", vector.tolist(), f"text {start + i}", {}) for i, vector in enumerate(vectors)])
+
+
+def _list_rows(index):
+    return np.sort(np.concatenate([rows.view for rows in index._lists]))
+
+
+def test_untrained_index_searches_exactly(tmp_path):
+    rng = np.random.default_rng(0)
+    store = MemmapVectorStore(str(tmp_path))
+    _append(store, _vectors(rng, 50))
+    index = IVFIndex(store, min_train_rows=100)
+    query = rng.normal(size=store.dim)
+
+    assert not index.is_trained
+    assert index.search(query, top_k=5) == ExactSearchEngine(store).search(query, top_k=5)
+
+
+def test_index_trains_grows_and_retrains(tmp_path):
+    rng = np.random.default_rng(0)
+    store = MemmapVectorStore(str(tmp_path))
+    _append(store, _vectors(rng, 400))
+    index = IVFIndex(store, min_train_rows=400, nprobe=4, retrain_growth=2.0)
+    assert index.is_trained and index._trained_rows == 400
+    nlist = index.centroids.shape[0]
+    queries = _vectors(rng, 20)
+    exact = ExactSearchEngine(store)
+    assert recall_at_k(index, exact, queries, nprobe=nlist) == 1.0
+    assert recall_at_k(index, exact, queries) >= 0.8
+
+    _append(store, _vectors(rng, 300), start=400)
+    index.update()  # below the growth threshold: the new rows join the existing lists
+    assert index._trained_rows == 400 and index.centroids.shape[0] == nlist
+    np.testing.assert_array_equal(_list_rows(index), np.arange(700))
+
+    _append(store, _vectors(rng, 100), start=700)
+    index.update()  # twice the trained rows: retrained with more lists
+    assert index._trained_rows == 800 and index.centroids.shape[0] > nlist
+    np.testing.assert_array_equal(_list_rows(index), np.arange(800))
+    assert recall_at_k(index, exact, queries, nprobe=index.centroids.shape[0]) == 1.0
+
+    reopened = IVFIndex(MemmapVectorStore(str(tmp_path)), min_train_rows=400, retrain_growth=2.0)
+    assert reopened._trained_rows == 800
+    np.testing.assert_array_equal(reopened.centroids, index.centroids)
+    np.testing.assert_array_equal(reopened._assignments.view, index._assignments.view)
+
+
+def test_compaction_reassigns_rows_to_the_same_centroids(tmp_path):
+    rng = np.random.default_rng(1)
+    store = MemmapVectorStore(str(tmp_path))
+    _append(store, _vectors(rng, 300))
+    index = IVFIndex(store, min_train_rows=300)
+    centroids = index.centroids.copy()
+
+    store.delete([f"c{i}" for i in range(100)])
+    store.compact()
+    index.update()
+
+    np.testing.assert_array_equal(index.centroids, centroids)
+    np.testing.assert_array_equal(_list_rows(index), np.arange(200))
+    hits = index.search(store.matrix()[0], top_k=1, nprobe=centroids.shape[0])[0]
+    assert hits[0][0] == 0
@@ -0,0 +1,59 @@
+import asyncio
+
+from answer_cache import SemanticAnswerCache
+from orchestration_layer import OrchestrationLayer
+
+
+def test_lookup_is_scoped_and_thresholded():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.put([1.0, 0.0], "what is x", {"response": "x"}, ["https://a"], scope="docs")
+    assert cache.lookup([1.0, 0.05], scope="docs")["answer"] == {"response": "x"}
+    assert cache.lookup([1.0, 0.05], scope="other") is None
+    assert cache.lookup([0.0, 1.0], scope="docs") is None
+
+
+def test_invalidate_sources_drops_only_answers_using_them():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.put([1.0, 0.0], "q1", {"response": "1"}, ["https://a", "https://b"])
+    cache.put([0.0, 1.0], "q2", {"response": "2"}, ["https://b"])
+    cache.put([1.0, 1.0], "q3", {"response": "3"}, ["https://c"])
+
+    assert cache.invalidate_sources(["https://a"]) == 1
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0])["query"] == "q2"
+    assert cache.invalidate_sources(["https://b", "https://a"]) == 1
+    assert len(cache) == 1 and cache.lookup([1.0, 1.0])["query"] == "q3"
+
+
+def test_invalidate_scope():
+    cache = SemanticAnswerCache()
+    cache.put([1.0, 0.0], "q", {}, ["https://a"], scope="sources-1")
+    cache.put([1.0, 0.0], "q", {}, ["https://a"], scope="default")
+    assert cache.invalidate_scope("sources-1") == 1
+    assert cache.lookup([1.0, 0.0], scope="sources-1") is None
+    assert cache.lookup([1.0, 0.0], scope="default") is not None
+
+
+def test_follow_up_questions_bypass_the_answer_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    layer = OrchestrationLayer()
+
+    async def embed_query(text):
+        return [1.0, 0.0]
+
+    async def process_query(query, collection="default"):
+        return None
+
+    layer.chunking_embedding_agent.embed_query = embed_query
+    layer.query_agent.process_query = process_query
+    answer = {"response": "cached", "response_text": "cached", "source_chunks": [], "sources": [], "validation": {}}
+    layer.answer_cache.put([1.0, 0.0], "what is x", answer, [], scope="default")
+    session = layer.new_session()
+    try:
+        first = asyncio.run(layer.handle_query_workflow("what is x", session=session))
+        assert first["response"] == "cached" and "answer_cache" in first and session.has_history
+
+        follow_up = asyncio.run(layer.handle_query_workflow("what is x", session=session))
+        assert "answer_cache" not in follow_up and follow_up["status"] == "no_results"
+    finally:
+        asyncio.run(layer.aclose())
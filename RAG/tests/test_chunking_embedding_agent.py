@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from agents.chunking_embedding_agent import ChunkingEmbeddingAgent
+from benchmarks.fake_ollama import fake_embedding
+
+
+class RecordingClient:
+    """Embeds with `fake_embedding`, recording each request's batch and the requests in flight."""
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def embed(self, model, input):
+        self.batches.append(list(input))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail:
+                raise ConnectionError("model unreachable")
+            return {"embeddings": [fake_embedding(text) for text in input]}
+        finally:
+            self.in_flight -= 1
+
+
+def test_chunks_are_embedded_in_concurrent_batches_in_input_order():
+    client = RecordingClient()
+    agent = ChunkingEmbeddingAgent(embedding_batch_size=2, llm_client=client)
+    texts = [f"chunk number {i}" for i in range(5)]
+
+    embeddings = asyncio.run(agent.embed_chunks(texts))
+
+    assert embeddings == [fake_embedding(text) for text in texts]
+    assert sorted(map(len, client.batches)) == [1, 2, 2]
+    assert client.max_in_flight == 3
+    assert agent.last_run_stats["chunks"] == 5
+
+
+def test_failed_batch_is_logged_and_yields_no_embeddings(caplog):
+    agent = ChunkingEmbeddingAgent(embedding_batch_size=2, llm_client=RecordingClient(fail=True))
+
+    with caplog.at_level(logging.ERROR, logger="agents.chunking_embedding_agent"):
+        embeddings = asyncio.run(agent.embed_chunks(["one", "two", "three"]))
+
+    assert embeddings == [None, None, None]
+    assert len([r for r in caplog.records if "Embedding a batch" in r.getMessage()]) == 2
+    query_embedding = asyncio.run(agent.embed_query("one"))
+    assert query_embedding == agent._fallback_embedding("one")
+
+
+def test_blocking_embedding_failure_is_logged_and_falls_back(caplog):
+    class UnreachableClient:
+        def embed(self, model, input):
+            raise ConnectionError("model unreachable")
+
+    agent = ChunkingEmbeddingAgent(llm_client=RecordingClient())
+    agent.client = UnreachableClient()
+
+    with caplog.at_level(logging.ERROR, logger="agents.chunking_embedding_agent"):
+        embedding = agent._generate_embedding("a query")
+
+    assert embedding == agent._fallback_embedding("a query")
+    assert any("placeholder" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,82 @@
+from agents.context_assembler import ContextAssembler
+from agents.rag_agent import RAGAgent
+from agents.text_chunker import approximate_token_count
+
+
+def _turns(count, words=10):
+    turns = []
+    for i in range(count):
+        turns.append({"role": "user", "content": f"question {i}?"})
+        turns.append({"role": "assistant", "content": " ".join(f"answer{i}" for _ in range(words))})
+    return turns
+
+
+def test_history_keeps_recent_turns_and_summarizes_older_questions():
+    assembler = ContextAssembler(max_summary_tokens=40)
+    turns = _turns(5, words=30)  # 33 tokens per turn
+
+    selected, dropped = assembler.select_history(turns, ["first question?"], budget=120)
+
+    assert selected[1:] == turns[-6:] and dropped == 3
+    assert selected[0] == {"role": "system", "content": "Earlier in this conversation the user asked: "
+                                                        "first question?; question 0?; question 1?"}
+    assert sum(approximate_token_count(message["content"]) for message in selected) <= 120
+
+
+def test_summary_keeps_the_most_recent_questions_that_fit():
+    turns = _turns(3, words=30)
+    selected, dropped = ContextAssembler().select_history(turns, [], budget=45)
+
+    assert dropped == 2 and selected[1:] == turns[-2:]
+    assert selected[0]["content"] == "Earlier in this conversation the user asked: question 1?"
+
+
+def test_assembled_prompt_fits_the_budget():
+    assembler = ContextAssembler(max_prompt_tokens=120, max_history_tokens=30)
+    chunks = [{"text": " ".join(f"fact{i}w{j}." for j in range(20)), "score": 1.0 - i / 10} for i in range(5)]
+
+    messages, used_chunks, stats = assembler.assemble(
+        {"role": "system", "content": "Answer from the context."}, _turns(4), [],
+        lambda context: f"Context:\n{context}\n\nQuestion: what?", chunks, full_history_tokens=56)
+
+    assert stats["prompt_tokens"] == sum(approximate_token_count(message["content"]) for message in messages) <= 120
+    assert stats["history_turns_dropped"] == 2 and stats["saved_tokens"] > 0
+    assert messages[0]["role"] == "system" and messages[-1]["content"].endswith("Question: what?")
+    assert used_chunks == chunks[:len(used_chunks)] and 0 < len(used_chunks) < len(chunks)
+
+
+def test_session_history_is_bounded():
+    agent = RAGAgent(max_stored_turns=2)
+    for i in range(5):
+        agent.record_turn(f"question {i}?", f"answer {i}")
+
+    assert [message["content"] for message in agent.conversation_history[1:]] == \
+        ["question 3?", "answer 3", "question 4?", "answer 4"]
+    assert agent.earlier_questions == ["question 1?", "question 2?"]
+    assert agent.has_history
+    agent.clear_conversation_history()
+    assert not agent.has_history and len(agent.conversation_history) == 1
+
+
+def test_context_keeps_the_given_order_and_drops_repeated_sentences():
+    chunks = [{"chunk_id": "low", "score": 0.1, "text": "Alpha beta gamma. Delta epsilon zeta."},
+              {"chunk_id": "high", "score": 0.9, "text": "Delta epsilon zeta.\nEta theta iota."}]
+
+    used, texts, stats = ContextAssembler(min_chunk_tokens=0).select_context(chunks, budget=100)
+
+    assert [chunk["chunk_id"] for chunk in used] == ["low", "high"]
+    assert texts == ["Alpha beta gamma. Delta epsilon zeta.", "Eta theta iota."]
+    assert stats == {"chunks_dropped": 0, "chunks_trimmed": 0, "duplicate_tokens": 4}
+
+
+def test_context_is_trimmed_or_dropped_at_the_budget():
+    chunks = [{"chunk_id": "first", "text": "Alpha beta gamma. Delta epsilon zeta."},
+              {"chunk_id": "second", "text": "Eta theta iota. Kappa lambda mu."}]
+
+    used, texts, stats = ContextAssembler(min_chunk_tokens=0).select_context(chunks, budget=6)
+    assert [chunk["chunk_id"] for chunk in used] == ["first"] and texts == ["Alpha beta gamma."]
+    assert stats == {"chunks_dropped": 1, "chunks_trimmed": 1, "duplicate_tokens": 0}
+
+    # A trimmed chunk shorter than `min_chunk_tokens` is dropped rather than sent.
+    used, texts, stats = ContextAssembler(min_chunk_tokens=5).select_context(chunks, budget=12)
+    assert [chunk["chunk_id"] for chunk in used] == ["first"] and stats["chunks_dropped"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+
+from agents.crawler_agent import CrawlerAgent
+
+
+def _agent(handler, **kwargs):
+    return CrawlerAgent(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), **kwargs)
+
+
+def _fetch(agent, url, **kwargs):
+    return asyncio.run(agent.fetch(url, **kwargs))
+
+
+def test_fetch_returns_the_page_and_its_validators():
+    agent = _agent(lambda request: httpx.Response(200, text="<p>hello</p>",
+                                                  headers={"Content-Type": "text/html; charset=utf-8", "ETag": '"v1"'}))
+
+    page = _fetch(agent, "https://example.com/")
+
+    assert page["status_code"] == 200 and page["error"] is None
+    assert page["content"] == "<p>hello</p>" and page["content_type"] == "text/html" and page["etag"] == '"v1"'
+
+
+def test_fetch_reports_failures():
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        if request.url.path == "/large":
+            return httpx.Response(200, content=b"x" * 100)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    agent = _agent(handler, max_response_bytes=50)
+
+    missing = _fetch(agent, "https://example.com/missing")
+    assert missing["status_code"] == 404 and missing["error"] == "HTTP 404" and missing["content"] == ""
+    unreachable = _fetch(agent, "https://example.com/down", decode=False)
+    assert unreachable["status_code"] == 0 and "connection refused" in unreachable["error"]
+    assert unreachable["content"] == b""
+    large = _fetch(agent, "https://example.com/large")
+    assert large["content"] == "" and "exceeds 50 bytes" in large["error"]
+
+
+def _crawl(agent, seeds, **kwargs):
+    async def collect():
+        return [page async for page in agent.crawl_many(seeds, **kwargs)]
+    return asyncio.run(collect())
+
+
+SITE = {
+    "/": '<a href="/a">a</a> <a href="/private/b">b</a> <a href="https://other.example.com/">other</a>',
+    "/a": '<a href="/">home</a>',
+    "/private/b": "secret",
+}
+
+
+def _site(robots, requests):
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text=robots) if robots is not None else httpx.Response(404)
+        if request.url.path in SITE:
+            return httpx.Response(200, text=SITE[request.url.path], headers={"Content-Type": "text/html"})
+        return httpx.Response(404)
+    return handler
+
+
+def test_crawl_follows_same_site_links_allowed_by_robots():
+    requests = []
+    agent = _agent(_site("User-agent: *\nDisallow: /private/\n", requests))
+
+    pages = _crawl(agent, ["https://example.com"], max_depth=1)
+
+    assert sorted(page["url"] for page in pages) == ["https://example.com/", "https://example.com/a"]
+    assert requests.count("/robots.txt") == 1 and "/private/b" not in requests
+
+
+def test_oversized_robots_txt_is_treated_as_missing():
+    requests = []
+    agent = _agent(_site("User-agent: *\nDisallow: /\n" + "#" * 200, requests), max_response_bytes=150)
+
+    pages = _crawl(agent, ["https://example.com/"], max_depth=1)
+
+    assert len(pages) == 3
+
+
+def test_robots_cache_is_bounded_and_expires():
+    requests = []
+    agent = _agent(_site(None, requests), max_robots=2, robots_ttl_s=60)
+
+    async def check(*urls):
+        for url in urls:
+            await agent._robots_for(url)
+
+    asyncio.run(check("https://one.example.com/x", "https://two.example.com/x", "https://one.example.com/y",
+                      "https://three.example.com/x"))
+    assert list(agent._robots) == ["https://one.example.com", "https://three.example.com"]
+    assert requests.count("/robots.txt") == 3
+
+    agent.robots_ttl_s = 0
+    asyncio.run(check("https://one.example.com/x"))
+    assert requests.count("/robots.txt") == 4
@@ -0,0 +1,42 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def test_memory_tier_is_an_lru():
+    cache = EmbeddingCache(disk_path=None, memory_entries=2)
+    cache.put_many("m", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    assert cache.get("m", "a") == [1.0, 0.0]  # "b" is now the least recently used
+    cache.put("m", "c", [0.5, 0.5])
+
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0, 0.0], None, [0.5, 0.5]]
+    assert cache.get("other-model", "a") is None
+    assert all(isinstance(vector, np.ndarray) and vector.dtype == np.float32 for vector in cache._memory.values())
+    assert cache.stats()["memory_entries"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(disk_path=path).put_many("m", ["a", "b"], [[0.25, 0.5], [1.0, 2.0]])
+
+    reopened = EmbeddingCache(disk_path=path)
+    assert reopened.get_many("m", ["b", "a", "c"]) == [[1.0, 2.0], [0.25, 0.5], None]
+    assert reopened.stats()["disk_hits"] == 2
+    assert reopened.get("m", "a") == [0.25, 0.5] and reopened.stats()["memory_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    entry_bytes = 4 * 4
+    cache = EmbeddingCache(disk_path=path, memory_entries=0, max_disk_bytes=4 * entry_bytes)
+    texts = [f"text {i}" for i in range(4)]
+    cache.put_many("m", texts, [[float(i)] * 4 for i in range(4)])
+    cache.put("m", "text 0", [0.0] * 4)  # a replacement does not grow the tier
+    assert cache._disk_bytes == 4 * entry_bytes
+    cache.get("m", "text 0")  # texts 1-3 are now the least recently used
+
+    cache.put("m", "text 4", [4.0] * 4)
+
+    assert cache._disk_bytes == cache._stored_bytes() <= 4 * entry_bytes
+    assert cache.get_many("m", ["text 1", "text 2", "text 3"]).count(None) == 2
+    assert cache.get_many("m", ["text 0", "text 4"]) == [[0.0] * 4, [4.0] * 4]
@@ -0,0 +1,132 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from benchmarks.fake_ollama import fake_embedding
+from orchestration_layer import OrchestrationLayer
+
+URL = "https://docs.example.com/guide"
+SECTIONS = ["install", "configure", "deploy", "monitor"]
+
+
+def page(changed_section=None, sections=SECTIONS):
+    parts = ["<html><head><title>Guide</title></head><body>"]
+    for section in sections:
+        words = " ".join(f"{section}{i}" for i in range(300))
+        if section == changed_section:
+            words = "revised " + words
+        parts.append(f"<h2>{section}</h2><p>{words}.</p>")
+    return ("".join(parts) + "</body></html>").encode("utf-8")
+
+
+class FakeEmbeddingClient:
+    async def embed(self, model, input):
+        return {"embeddings": [fake_embedding(text) for text in input]}
+
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    layer = OrchestrationLayer()
+    layer.chunking_embedding_agent.llm_client = FakeEmbeddingClient()
+    layer.embedded = []
+    attach_embeddings = layer.chunking_embedding_agent.attach_embeddings
+
+    async def recording_attach_embeddings(chunks):
+        chunks = list(chunks)
+        layer.embedded.extend(chunk["chunk_id"] for chunk in chunks)
+        return await attach_embeddings(chunks)
+
+    layer.chunking_embedding_agent.attach_embeddings = recording_attach_embeddings
+    yield layer
+    asyncio.run(layer.aclose())
+
+
+def serve(orchestrator, content, status_code=200, error=None):
+    """Makes the crawler return `content` for every fetch."""
+    async def fetch(url, etag=None, last_modified=None, decode=True):
+        return {"status_code": status_code, "content": content, "content_type": "text/html",
+                "encoding": "utf-8", "etag": '"v"', "last_modified": None, "error": error}
+    orchestrator.crawler_agent.fetch = fetch
+
+
+def ingest(orchestrator):
+    return asyncio.run(orchestrator.ingest_document_workflow(URL, "docs"))
+
+
+def test_unchanged_source_is_skipped(orchestrator):
+    serve(orchestrator, page())
+    assert ingest(orchestrator)
+    record = orchestrator.ingestion_registry.get("docs", URL)
+    assert len(record["chunk_ids"]) > 1 and sorted(orchestrator.embedded) == sorted(record["chunk_ids"])
+
+    orchestrator.embedded.clear()
+    assert ingest(orchestrator)  # same content
+    serve(orchestrator, b"", status_code=304)
+    assert ingest(orchestrator)  # not modified
+    assert orchestrator.embedded == []
+    assert orchestrator.ingestion_registry.get("docs", URL)["chunk_ids"] == record["chunk_ids"]
+
+
+def test_changed_source_embeds_new_chunks_and_deletes_stale_ones(orchestrator):
+    serve(orchestrator, page())
+    assert ingest(orchestrator)
+    old_ids = set(orchestrator.ingestion_registry.get("docs", URL)["chunk_ids"])
+
+    orchestrator.embedded.clear()
+    serve(orchestrator, page(changed_section="deploy"))
+    assert ingest(orchestrator)
+    new_ids = set(orchestrator.ingestion_registry.get("docs", URL)["chunk_ids"])
+
+    added, stale = new_ids - old_ids, old_ids - new_ids
+    assert added and stale and new_ids & old_ids
+    assert set(orchestrator.embedded) == added
+    assert orchestrator.vector_db_connector.has_chunks(list(new_ids))
+    assert not any(orchestrator.vector_db_connector.has_chunks([chunk_id]) for chunk_id in stale)
+
+
+def test_reingesting_changed_content_invalidates_cached_answers(orchestrator):
+    serve(orchestrator, page())
+    assert ingest(orchestrator)
+    cache = orchestrator.answer_cache
+    cache.put([1.0, 0.0], "how to deploy", {"response": "..."}, [URL])
+    cache.put([0.0, 1.0], "unrelated", {"response": "..."}, ["https://other.example.com"])
+
+    assert ingest(orchestrator)  # unchanged: the answer stays valid
+    assert cache.lookup([1.0, 0.0]) is not None
+
+    serve(orchestrator, page(changed_section="deploy"))
+    assert ingest(orchestrator)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0]) is not None
+
+
+def test_failed_fetch_leaves_the_source_to_be_retried(orchestrator):
+    serve(orchestrator, page())
+    assert ingest(orchestrator)
+    record = orchestrator.ingestion_registry.get("docs", URL)
+
+    serve(orchestrator, b"", status_code=503, error="HTTP 503")
+    assert not ingest(orchestrator)
+    assert orchestrator.ingestion_registry.get("docs", URL)["ingested_at"] == record["ingested_at"]
+
+
+def test_kept_chunks_get_their_new_position(orchestrator):
+    serve(orchestrator, page())
+    assert ingest(orchestrator)
+    old_ids = orchestrator.ingestion_registry.get("docs", URL)["chunk_ids"]
+
+    orchestrator.embedded.clear()
+    serve(orchestrator, page(sections=["intro"] + SECTIONS))
+    assert ingest(orchestrator)
+    new_ids = orchestrator.ingestion_registry.get("docs", URL)["chunk_ids"]
+
+    kept = set(old_ids) & set(new_ids)
+    assert kept and not kept & set(orchestrator.embedded)
+    assert any(old_ids.index(chunk_id) != new_ids.index(chunk_id) for chunk_id in kept)
+    store = orchestrator.vector_db_connector.store
+    rows = np.flatnonzero(store.live_mask()).tolist()
+    stored_index = {store.row_chunk_id(row): record["metadata"]["chunk_index"]
+                    for row, record in zip(rows, store.get_records(rows))}
+    assert stored_index == {chunk_id: i for i, chunk_id in enumerate(new_ids)}
@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+import pytest
+
+from lexical_index import BM25Index, tokenize
+from search_engine import reciprocal_rank_fusion
+from vector_store import MemmapVectorStore
+
+TEXTS = [
+    "the server returned ERR_TIMEOUT after retrying",
+    "configure the retry policy of the server",
+    "deploy the server behind a load balancer",
+    "error 0x80070005 means access denied",
+    "the load balancer retries failed requests",
+    "unrelated text about gardening",
+]
+
+
+def _reference_bm25(texts, query, k1=1.2, b=0.75):
+    documents = [tokenize(text) for text in texts]
+    average_length = sum(map(len, documents)) / len(documents)
+    scores = {}
+    for row, document in enumerate(documents):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in documents)
+            frequency = document.count(term)
+            if frequency:
+                idf = math.log1p((len(documents) - df + 0.5) / (df + 0.5))
+                score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(document) / average_length))
+        if score:
+            scores[row] = score
+    return sorted(scores.items(), key=lambda hit: -hit[1])
+
+
+def _store(path, texts):
+    store = MemmapVectorStore(str(path))
+    store.append([(f"c{i}", [1.0, float(i)], text, {}) for i, text in enumerate(texts)])
+    return store
+
+
+@pytest.mark.parametrize("query", ["server load balancer", "ERR_TIMEOUT", "0x80070005 access", "retry the server",
+                                   "nothing matches"])
+def test_scores_match_a_reference_bm25(tmp_path, query):
+    index = BM25Index(_store(tmp_path, TEXTS))
+
+    hits = index.search([query], top_k=10)[0]
+
+    expected = _reference_bm25(TEXTS, query)
+    assert [row for row, _ in hits] == [row for row, _ in expected]
+    np.testing.assert_allclose([score for _, score in hits], [score for _, score in expected], rtol=1e-5)
+
+
+def test_deleted_rows_are_neither_returned_nor_counted(tmp_path):
+    store = _store(tmp_path, TEXTS)
+    index = BM25Index(store)
+    store.delete(["c0", "c5"])
+    live_texts = TEXTS[1:5]
+
+    hits = index.search(["server load balancer"], top_k=10)[0]
+
+    expected = _reference_bm25(live_texts, "server load balancer")
+    assert [row for row, _ in hits] == [row + 1 for row, _ in expected]
+    np.testing.assert_allclose([score for _, score in hits], [score for _, score in expected], rtol=1e-5)
+
+
+def test_index_is_appended_and_reloaded(tmp_path):
+    store = _store(tmp_path, TEXTS[:3])
+    index = BM25Index(store)
+    store.append([(f"c{i}", [1.0, float(i)], text, {}) for i, text in enumerate(TEXTS) if i >= 3])
+    index.update()
+    assert index.row_count == len(TEXTS) and index.document_frequencies()["server"] == 3
+
+    reopened = BM25Index(MemmapVectorStore(str(tmp_path)))
+    assert reopened.search(["load balancer retries"], top_k=3) == index.search(["load balancer retries"], top_k=3)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [{"chunk_id": "a"}, {"chunk_id": "b"}, {"chunk_id": "c"}]
+    lexical = [{"chunk_id": "b"}, {"chunk_id": "d"}, {"chunk_id": "c"}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=3)
+
+    assert [result["chunk_id"] for result in fused] == ["b", "c", "a"]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
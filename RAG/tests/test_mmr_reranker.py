@@ -0,0 +1,61 @@
+import numpy as np
+
+from agents.mmr_reranker import MMRReranker
+from agents.text_chunker import approximate_token_count
+
+OVERLAP = "the overlap the chunker repeats between neighbouring chunks."
+
+
+def _candidate(chunk_id, score, chunk_index=None, text=None, document_id="doc"):
+    metadata = {"document_id": document_id, "source_url": f"https://example.com/{document_id}"}
+    if chunk_index is not None:
+        metadata["chunk_index"] = chunk_index
+    return {"chunk_id": chunk_id, "score": score, "text": text or f"text of {chunk_id}.", "metadata": metadata}
+
+
+def _unit(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+# "copy" nearly duplicates "best"; "other" is less relevant but about something else.
+CANDIDATES = [_candidate("best", 1.0), _candidate("copy", 0.95), _candidate("other", 0.5), _candidate("weak", 0.0)]
+EMBEDDINGS = _unit([[1, 0, 0], [1, 0.05, 0], [0, 1, 0], [0, 0, 1]])
+
+
+def test_pure_relevance_keeps_the_retrieval_order():
+    picked = MMRReranker(diversity_lambda=1.0).select(CANDIDATES, EMBEDDINGS, top_k=3)
+
+    assert [chunk["chunk_id"] for chunk in picked] == ["best", "copy", "other"]
+
+
+def test_diversity_skips_near_duplicates():
+    picked = MMRReranker(diversity_lambda=0.5).select(CANDIDATES, EMBEDDINGS, top_k=2)
+
+    assert [chunk["chunk_id"] for chunk in picked] == ["best", "other"]
+
+
+def test_adjacent_chunks_are_merged_without_their_overlap():
+    candidates = [_candidate("c0", 0.9, 0, "An opening sentence. " + OVERLAP),
+                  _candidate("c3", 0.8, 3),
+                  _candidate("c1", 0.7, 1, OVERLAP + " A closing sentence."),
+                  _candidate("x1", 0.6, 2, document_id="other")]
+
+    chunks, stats = MMRReranker(diversity_lambda=1.0).rerank(candidates, _unit(np.eye(4)), top_k=4)
+
+    assert [chunk["chunk_id"] for chunk in chunks] == ["c0", "c3", "x1"]
+    span = chunks[0]
+    assert span["text"] == "An opening sentence. " + OVERLAP + " A closing sentence."
+    assert span["metadata"]["chunk_span"] == [0, 1] and span["merged_chunk_ids"] == ["c0", "c1"]
+    assert span["score"] == 0.9 and "chunk_span" not in chunks[1]["metadata"]
+    assert stats == {"candidates": 4, "selected": 4, "merged": 1,
+                     "saved_tokens": approximate_token_count(OVERLAP)}
+
+
+def test_merging_can_be_disabled():
+    candidates = [_candidate("c0", 0.9, 0), _candidate("c1", 0.8, 1)]
+
+    chunks, stats = MMRReranker(merge_adjacent=False).rerank(candidates, _unit(np.eye(2)), top_k=2)
+
+    assert [chunk["chunk_id"] for chunk in chunks] == ["c0", "c1"]
+    assert stats["merged"] == 0 and stats["saved_tokens"] == 0
@@ -0,0 +1,28 @@
+import pytest
+
+from agents.parser_agent import ParserAgent
+from benchmarks.parser_bench import documentation_page
+
+PAGES = [
+    documentation_page(40, seed=1),
+    documentation_page(40, seed=2),
+    "<html><head><title> Edge &amp; cases </title></head><body>"
+    "<h1>Un<b>closed<p>Nested <i>inline</i> text &copy; &#169; &#x263A; &bogus; &#</p>"
+    "<p>Second <br>line</p><script>var p = '<p>not text</p>';</script>"
+    "<h2>Café — naïve</h2><!-- <p>comment</p> --><p>Tail",
+    "<p>No document structure at all</p><p></p><h3>  spaced   out  </h3>",
+]
+
+
+@pytest.mark.parametrize("page", PAGES)
+def test_streaming_backend_matches_bs4(page):
+    reference = ParserAgent(backend="bs4").parse(page)
+    streaming = ParserAgent(backend="streaming")
+    assert streaming.parse(page) == reference
+    assert streaming.parse(page.encode("utf-8"), encoding="utf-8") == reference
+
+
+def test_streaming_backend_sniffs_the_encoding_of_bytes():
+    page = '<html><head><meta charset="iso-8859-1"><title>Café</title></head><body><p>Crème brûlée</p></body></html>'
+    reference = ParserAgent(backend="bs4").parse(page)
+    assert ParserAgent(backend="streaming").parse(page.encode("iso-8859-1")) == reference
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from quantized_index import QuantizedIndex
+from search_engine import ExactSearchEngine
+from vector_store import MemmapVectorStore
+
+
+def _clustered_store(path, rows=2000, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=rows)] + 0.3 * rng.normal(size=(rows, dim))
+    store = MemmapVectorStore(str(path))
+    store.append([(f"c{i}", vector.tolist(), f"text {i}", {}) for i, vector in enumerate(vectors)])
+    return store, rng
+
+
+def _recall(found, expected):
+    return np.mean([len({row for row, _ in f} & {row for row, _ in e}) / len(e) for f, e in zip(found, expected)])
+
+
+@pytest.mark.parametrize("encoding, rescore_factor", [("int8", 4), ("pq", 16)])
+def test_rescoring_recovers_the_exact_neighbours(tmp_path, encoding, rescore_factor):
+    store, rng = _clustered_store(tmp_path)
+    index = QuantizedIndex(store, encoding=encoding, rescore_factor=rescore_factor, min_train_rows=1000)
+    assert index.is_trained and index.bytes_per_vector < 4 * store.dim
+    queries = store.matrix()[rng.choice(store.row_count, size=30, replace=False)] + 0.1 * rng.normal(size=(30, store.dim))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    expected = ExactSearchEngine(store).search(queries, top_k=10)
+    rescored = index.search(queries, top_k=10)
+    first_pass = index.search(queries, top_k=10, rescore_factor=1)
+
+    assert _recall(rescored, expected) >= max(0.95, _recall(first_pass, expected))
+    for row, score in rescored[0]:
+        assert score == pytest.approx(float(store.matrix()[row] @ queries[0]), abs=1e-4)
+
+
+def test_untrained_index_searches_exactly(tmp_path):
+    store, rng = _clustered_store(tmp_path, rows=50)
+    index = QuantizedIndex(store, min_train_rows=1000)
+    query = rng.normal(size=store.dim)
+
+    assert not index.is_trained
+    assert index.search(query, top_k=5) == ExactSearchEngine(store).search(query, top_k=5)
+
+
+@pytest.mark.parametrize("subspaces", [5, 0])
+def test_invalid_pq_subspaces_fail_on_construction(tmp_path, subspaces):
+    store, _ = _clustered_store(tmp_path, rows=10)
+    with pytest.raises(ValueError):
+        QuantizedIndex(store, encoding="pq", pq_subspaces=subspaces)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from agents.query_agent import LocalQueryExpander, QueryAgent
+from expansion_cache import ExpansionCache
+
+
+class FakeChatClient:
+    def __init__(self, terms):
+        self.terms = terms
+        self.calls = 0
+
+    async def chat(self, model, messages, **kwargs):
+        self.calls += 1
+        return {"message": {"content": json.dumps({"expanded_terms": self.terms})}}
+
+
+def _process(agent, query, collection="default"):
+    return asyncio.run(agent.process_query(query, collection))
+
+
+def test_llm_expansions_are_memoized_across_restarts(tmp_path):
+    path = str(tmp_path / "expansions.sqlite3")
+    client = FakeChatClient(["Timeout error", "request timed out"])
+    agent = QueryAgent(llm_client=client, cache=ExpansionCache(disk_path=path))
+
+    first = _process(agent, "  Connection Timeout ")
+    second = _process(agent, "connection timeout")
+    restarted = _process(QueryAgent(llm_client=client, cache=ExpansionCache(disk_path=path)), "connection timeout")
+
+    assert client.calls == 1
+    assert [first["expansion_mode"], second["expansion_mode"], restarted["expansion_mode"]] == ["llm", "cache", "cache"]
+    assert first["expanded_terms"] == second["expanded_terms"] == ["timeout error", "request timed out"]
+
+
+def test_empty_expansions_are_not_cached():
+    client = FakeChatClient([])
+    agent = QueryAgent(llm_client=client, cache=ExpansionCache(disk_path=None))
+
+    _process(agent, "query")
+    _process(agent, "query")
+
+    assert client.calls == 2
+
+
+def test_fast_mode_expands_locally_from_synonyms_and_the_corpus():
+    versions = {"docs": 1}
+    loads = []
+
+    def vocabulary(collection):
+        loads.append(collection)
+        return {"configuration": 5, "configured": 2, "configures": 1, "deploy": 3}
+
+    client = FakeChatClient(["never used"])
+    expander = LocalQueryExpander(synonyms={"deploy": ["release", "ship"]}, vocabulary=vocabulary,
+                                  vocabulary_version=versions.get)
+    agent = QueryAgent(llm_client=client, cache=ExpansionCache(disk_path=None), local_expander=expander,
+                       latency_budget_ms=5)
+
+    result = _process(agent, "deploy configuring", "docs")
+    _process(agent, "deploy", "docs")
+    versions["docs"] = 2
+    _process(agent, "deploy", "docs")
+
+    assert client.calls == 0 and result["expansion_mode"] == "local"
+    assert result["expanded_terms"] == ["release", "ship", "configuration", "configured"]
+    assert loads == ["docs", "docs"]  # reloaded only when the vocabulary version changed
+
+
+def test_expansion_cache_expires_and_evicts(tmp_path):
+    cache = ExpansionCache(disk_path=str(tmp_path / "expansions.sqlite3"), memory_entries=1, max_disk_entries=10)
+    for i in range(11):
+        cache.put("m", 0.7, f"query {i}", [f"term {i}"])
+
+    assert cache._db.execute("SELECT COUNT(*) FROM expansions").fetchone()[0] == 9
+    assert cache.get("m", 0.7, "query 10") == ["term 10"]
+    assert cache.get("m", 0.1, "query 10") is None
+
+    cache.ttl_s = -1
+    assert cache.get("m", 0.7, "query 10") is None
+    assert cache._db.execute("SELECT COUNT(*) FROM expansions WHERE key = ?",
+                             (cache.make_key("m", 0.7, "query 10"),)).fetchone()[0] == 0
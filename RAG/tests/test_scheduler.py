@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from scheduler import RequestScheduler, RequestSuperseded, SchedulerBusy
+
+
+async def _until(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+def test_rejects_when_slots_and_queue_are_full():
+    async def scenario():
+        scheduler = RequestScheduler(max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def pipeline():
+            await release.wait()
+            return "done"
+
+        running = asyncio.ensure_future(scheduler.run("s1", pipeline))
+        queued = asyncio.ensure_future(scheduler.run("s2", pipeline))
+        await _until(lambda: scheduler.running == 1 and scheduler.queue_depth == 1)
+        with pytest.raises(SchedulerBusy):
+            await scheduler.run("s3", pipeline)
+        release.set()
+        assert await asyncio.gather(running, queued) == ["done", "done"]
+        assert scheduler.running == 0 and scheduler.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_request_supersedes_the_running_one_and_takes_its_slot():
+    async def scenario():
+        scheduler = RequestScheduler(max_concurrent=1, max_queue=1)
+        started = asyncio.Event()
+        order = []
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        def pipeline(name):
+            async def run():
+                order.append(name)
+                return name
+            return run
+
+        first = asyncio.ensure_future(scheduler.run("s1", slow))
+        await started.wait()
+        other = asyncio.ensure_future(scheduler.run("s2", pipeline("other")))
+        await _until(lambda: scheduler.queue_depth == 1)
+        # The queue is full, yet the session's new request is admitted, ahead of "s2".
+        assert await scheduler.run("s1", pipeline("second")) == "second"
+        with pytest.raises(RequestSuperseded):
+            await first
+        assert await other == "other"
+        assert order == ["second", "other"] and scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_request_takes_over_a_queued_request():
+    async def scenario():
+        scheduler = RequestScheduler(max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await release.wait()
+
+        def pipeline(name):
+            async def run():
+                order.append(name)
+                return name
+            return run
+
+        running = asyncio.ensure_future(scheduler.run("s1", blocker))
+        queued = asyncio.ensure_future(scheduler.run("s2", pipeline("old")))
+        await _until(lambda: scheduler.queue_depth == 1)
+        replacement = asyncio.ensure_future(scheduler.run("s2", pipeline("new")))
+        with pytest.raises(RequestSuperseded):
+            await queued
+        assert scheduler.queue_depth == 1
+        release.set()
+        await running
+        assert await replacement == "new" and order == ["new"]
+
+    asyncio.run(scenario())
+
+
+def test_close_session_cancels_its_request():
+    async def scenario():
+        scheduler = RequestScheduler(max_concurrent=1)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        request = asyncio.ensure_future(scheduler.run("s1", slow))
+        await started.wait()
+        scheduler.close_session("s1")
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from search_engine import ExactSearchEngine, select_top_k
+from vector_store import MemmapVectorStore
+
+
+def _brute_force(scores, top_k):
+    return [sorted(((row, score) for row, score in enumerate(row_scores) if score != -np.inf),
+                   key=lambda hit: -hit[1])[:top_k]
+            for row_scores in scores.tolist()]
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 40, 100])
+def test_select_top_k_matches_a_full_sort(top_k):
+    rng = np.random.default_rng(top_k)
+    scores = rng.normal(size=(8, 40)).astype(np.float32)
+    scores[:, ::7] = -np.inf
+
+    assert select_top_k(scores, top_k) == _brute_force(scores, top_k)
+
+
+def _store(path, rows=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    store = MemmapVectorStore(str(path))
+    store.append([(f"c{i}", rng.normal(size=dim).tolist(), f"text {i}", {}) for i in range(rows)])
+    return store, rng
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    store, rng = _store(tmp_path)
+    store.delete([f"c{i}" for i in range(0, 300, 3)])
+    queries = rng.normal(size=(4, store.dim))
+
+    hits = ExactSearchEngine(store).search(queries, top_k=10)
+
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = normalized @ np.asarray(store.matrix()).T
+    scores[:, ~store.live_mask()] = -np.inf
+    for query_hits, expected in zip(hits, _brute_force(scores, 10)):
+        assert [row for row, _ in query_hits] == [row for row, _ in expected]
+        np.testing.assert_allclose([score for _, score in query_hits], [score for _, score in expected], rtol=1e-5)
+
+
+@pytest.mark.parametrize("selected", [5, 250])  # scores only the selected rows / masks the full scores
+def test_exact_search_honours_the_mask(tmp_path, selected):
+    store, rng = _store(tmp_path)
+    mask = np.zeros(store.row_count, dtype=bool)
+    mask[rng.choice(store.row_count, size=selected, replace=False)] = True
+    engine = ExactSearchEngine(store)
+    query = rng.normal(size=store.dim)
+
+    hits = engine.search(query, top_k=10, mask=mask)[0]
+
+    assert len(hits) == min(10, selected) and all(mask[row] for row, _ in hits)
+    expected = [hit for hit in engine.search(query, top_k=store.row_count)[0] if mask[hit[0]]][:10]
+    assert [row for row, _ in hits] == [row for row, _ in expected]
+    np.testing.assert_allclose([score for _, score in hits], [score for _, score in expected], rtol=1e-5, atol=1e-6)
+    assert engine.search(query, top_k=10, mask=np.zeros_like(mask)) == [[]]
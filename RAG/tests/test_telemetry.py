@@ -0,0 +1,46 @@
+import logging
+
+import pytest
+
+from telemetry import MetricsRegistry, RequestTrace
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry()
+    registry.describe("requests_total", "Requests.")
+    registry.inc("requests_total", status="ok")
+    registry.inc("requests_total", 2, status="ok")
+    registry.set_gauge("queue_depth", 3)
+    registry.gauge_callback("cache_entries", lambda: 7)
+
+    text = registry.render_prometheus()
+
+    assert "# HELP requests_total Requests.\n# TYPE requests_total counter\n" in text
+    assert 'requests_total{status="ok"} 3.0' in text
+    assert "queue_depth 3" in text and "cache_entries 7.0" in text
+
+
+def test_failing_gauge_callback_is_logged_and_left_out(caplog):
+    registry = MetricsRegistry()
+    registry.gauge_callback("broken", lambda: 1 / 0)
+    registry.gauge_callback("working", lambda: 1)
+
+    with caplog.at_level(logging.ERROR, logger="telemetry"):
+        text = registry.render_prometheus()
+
+    assert "broken" not in text and "working 1.0" in text
+    assert any("broken" in record.getMessage() and record.exc_info for record in caplog.records)
+
+
+def test_trace_counts_stage_errors():
+    registry = MetricsRegistry()
+    trace = RequestTrace(registry)
+    with pytest.raises(RuntimeError):
+        with trace.stage("parse"):
+            raise RuntimeError("bad page")
+    trace.error("crawl")
+    trace.record("crawl", items=2, nbytes=100)
+
+    snapshot = registry.snapshot()
+    assert "parse" in trace.durations and trace.to_dict()["stages"]["crawl"] == {"error": True, "items": 2, "bytes": 100}
+    assert snapshot["counters"]["rag_errors_total"] == {'{stage="parse"}': 1.0, '{stage="crawl"}': 1.0}
@@ -0,0 +1,45 @@
+from agents.text_chunker import TextChunker, approximate_token_count
+
+
+def _paragraph(word, count):
+    return " ".join(f"{word}{i}" for i in range(count)) + "."
+
+
+def test_chunks_fit_the_budget_and_follow_headings():
+    blocks = [("h1", "Install"), ("p", _paragraph("a", 30)), ("p", _paragraph("b", 30)),
+              ("h2", "Configure"), ("p", _paragraph("c", 30))]
+    chunks = list(TextChunker(max_tokens=50, overlap_tokens=0).chunks("", blocks))
+
+    assert all(approximate_token_count(text) <= 50 for text, _ in chunks)
+    assert [heading for _, heading in chunks] == ["Install", "Install", "Configure"]
+    assert chunks[0][0].startswith("Install\na0") and chunks[2][0].startswith("Configure\nc0")
+    assert "c0" not in chunks[1][0]  # a chunk never spans a heading
+
+
+def test_oversized_paragraphs_split_into_sentences_then_words():
+    sentences = " ".join(_paragraph(f"s{n}w", 9) for n in range(6))  # six sentences of 10 tokens
+    run_on = " ".join(f"w{i}" for i in range(45))
+    chunks = [text for text, _ in TextChunker(max_tokens=20, overlap_tokens=0).chunks("", [("p", sentences),
+                                                                                          ("p", run_on)])]
+
+    assert all(approximate_token_count(text) <= 20 for text in chunks)
+    assert chunks[:3] == [f"{_paragraph(f's{n}w', 9)} {_paragraph(f's{n + 1}w', 9)}" for n in (0, 2, 4)]
+    assert " ".join(chunks[3:]).split() == run_on.split()
+
+
+def test_consecutive_chunks_overlap_by_trailing_paragraphs():
+    paragraphs = [_paragraph(f"p{n}w", 9) for n in range(6)]
+    chunker = TextChunker(max_tokens=30, overlap_tokens=12)
+    chunks = [text for text, _ in chunker.chunks("", [("p", paragraph) for paragraph in paragraphs])]
+
+    assert chunks[0] == "\n".join(paragraphs[:3])
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split("\n")[0] == previous.split("\n")[-1]
+    assert chunks[-1].endswith(paragraphs[-1])
+
+
+def test_duplicate_chunks_are_dropped_and_lines_are_paragraphs():
+    text = "\n".join(["Same boilerplate line.", "Unique content here.", "Same boilerplate line."])
+    chunks = [chunk for chunk, _ in TextChunker(max_tokens=5, overlap_tokens=0).chunks(text)]
+
+    assert chunks == ["Same boilerplate line.", "Unique content here."]
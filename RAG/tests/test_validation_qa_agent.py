@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+
+from agents.faithfulness import FaithfulnessScorer
+from agents.validation_qa_agent import ValidationQAAgent
+
+QUERY = "When was the Eiffel Tower completed?"
+CHUNKS = [{"text": "The Eiffel Tower is located in Paris. It was completed in 1889 for the World Fair."}]
+SUPPORTED = "The Eiffel Tower was completed in 1889 for the World Fair."
+UNSUPPORTED = "Bananas grow quickly in warm volcanic soil near tropical beaches."
+PARTLY_SUPPORTED = f"{SUPPORTED} {UNSUPPORTED}"
+
+
+class JudgeClient:
+    """Answers every chat request with the same verdict, counting the requests."""
+    def __init__(self, is_valid=True, reason="judged by the model"):
+        self.content = json.dumps({"is_valid": is_valid, "reason": reason})
+        self.calls = 0
+
+    async def chat(self, model, messages, format=None, options=None):
+        self.calls += 1
+        return {"message": {"content": self.content}}
+
+
+def _validate(agent, answer):
+    return asyncio.run(agent.validate({"response_text": answer, "sources": []}, QUERY, CHUNKS))
+
+
+def test_scorer_separates_supported_from_unsupported_answers():
+    scorer = FaithfulnessScorer()
+
+    supported = scorer.score(SUPPORTED, QUERY, CHUNKS)
+    unsupported = scorer.score(UNSUPPORTED, QUERY, CHUNKS)
+    partly = scorer.score(PARTLY_SUPPORTED, QUERY, CHUNKS)
+
+    assert supported["faithfulness_score"] >= 0.9 and supported["unsupported_sentences"] == []
+    assert supported["relevance_score"] == 1.0 and supported["context_coverage"] == 1.0
+    assert unsupported["faithfulness_score"] == 0.0 and unsupported["unsupported_sentences"] == [UNSUPPORTED]
+    assert 0.35 <= partly["faithfulness_score"] < 0.7
+    assert partly["unsupported_sentences"] == [UNSUPPORTED]
+
+
+def test_abstentions_are_recognized():
+    assert FaithfulnessScorer.is_abstention("I don't have enough information to answer that.")
+    assert FaithfulnessScorer.is_abstention("The opening hours are not mentioned in the provided context.")
+    assert not FaithfulnessScorer.is_abstention(SUPPORTED)
+
+
+def test_local_mode_never_calls_the_model():
+    client = JudgeClient(is_valid=False)
+    agent = ValidationQAAgent(llm_client=client, mode="local")
+
+    supported, unsupported, partly = (_validate(agent, answer) for answer in (SUPPORTED, UNSUPPORTED, PARTLY_SUPPORTED))
+
+    assert supported["is_valid"] is True and supported["tier"] == "local"
+    assert unsupported["is_valid"] is False and UNSUPPORTED in unsupported["reason"]
+    # Ambiguous scores pass only if they reach the midpoint of the two thresholds.
+    assert partly["is_valid"] is (partly["faithfulness_score"] >= (0.7 + 0.35) / 2)
+    assert client.calls == 0
+
+
+def test_tiered_mode_escalates_only_ambiguous_scores():
+    client = JudgeClient(is_valid=False, reason="the second sentence is made up")
+    agent = ValidationQAAgent(llm_client=client)
+
+    assert _validate(agent, SUPPORTED)["tier"] == "local"
+    assert _validate(agent, UNSUPPORTED)["tier"] == "local"
+    assert client.calls == 0
+
+    result = _validate(agent, PARTLY_SUPPORTED)
+
+    assert client.calls == 1
+    assert result["tier"] == "llm" and result["is_valid"] is False
+    assert result["reason"] == "the second sentence is made up"
+    assert 0.35 <= result["local_faithfulness_score"] < 0.7
+
+
+def test_abstention_is_escalated_when_the_context_covers_the_query():
+    client = JudgeClient(is_valid=False)
+    agent = ValidationQAAgent(llm_client=client)
+
+    covered = _validate(agent, "I don't have enough information to answer that.")
+    uncovered = asyncio.run(agent.validate({"response_text": "I don't have enough information to answer that."},
+                                           "What is the ticket price for the Louvre?", CHUNKS))
+
+    assert covered["tier"] == "llm" and covered["is_valid"] is False
+    assert uncovered["tier"] == "local" and uncovered["is_valid"] is True
+    assert client.calls == 1
+
+
+def test_llm_mode_and_audits_ask_the_model():
+    client = JudgeClient(is_valid=False)
+    assert _validate(ValidationQAAgent(llm_client=client, mode="llm"), SUPPORTED)["tier"] == "llm"
+
+    audited = _validate(ValidationQAAgent(llm_client=client, audit_sample_rate=1.0), SUPPORTED)
+
+    assert client.calls == 2
+    assert audited["is_valid"] is True and audited["audit"]["agrees"] is False
+    assert _validate(ValidationQAAgent(llm_client=client), "  ")["is_valid"] is False
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ValidationQAAgent(llm_client=JudgeClient(), mode="strict")
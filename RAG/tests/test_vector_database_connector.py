@@ -0,0 +1,93 @@
+import os
+import threading
+
+import pytest
+
+from vector_database_connector import VectorDatabaseConnector
+
+
+def _chunk(chunk_id, values, source_url="https://example.com/a"):
+    return {"chunk_id": chunk_id, "embedding": list(values), "text": f"text of {chunk_id}",
+            "metadata": {"source_url": source_url}}
+
+
+def _connector(tmp_path, **kwargs):
+    return VectorDatabaseConnector(db_path=str(tmp_path / "db"), legacy_json_path=str(tmp_path / "none.json"), **kwargs)
+
+
+def test_least_recently_used_collection_is_evicted(tmp_path):
+    evicted = []
+    connector = _connector(tmp_path, max_collections=2, on_evict=evicted.append)
+    for name in ("one", "two"):
+        assert connector.add_documents("doc", [_chunk(f"{name}-0", [1, 0])], collection=name)
+    connector.search([1, 0], collection="one")  # "two" is now the least recently used
+    one_dir, two_dir = connector._collection_dir("one"), connector._collection_dir("two")
+
+    assert connector.add_documents("doc", [_chunk("three-0", [0, 1])], collection="three")
+
+    assert evicted == ["two"] and not os.path.exists(two_dir) and os.path.isdir(one_dir)
+    assert [r["chunk_id"] for r in connector.search([1, 0], collection="one")] == ["one-0"]
+    assert connector.search([1, 0], collection="two") == []  # recreated, empty
+
+
+def test_collections_left_on_disk_count_toward_the_limit(tmp_path):
+    connector = _connector(tmp_path, max_collections=2)
+    for name in ("old", "newer"):
+        connector.add_documents("doc", [_chunk(f"{name}-0", [1, 0])], collection=name)
+    old_dir = connector._collection_dir("old")
+    os.utime(old_dir, (1, 1))
+
+    evicted = []
+    restarted = _connector(tmp_path, max_collections=2, on_evict=evicted.append)
+    restarted.add_documents("doc", [_chunk("new-0", [1, 0])], collection="new")
+
+    assert evicted == ["old"] and not os.path.exists(old_dir)
+    assert [r["chunk_id"] for r in restarted.search([1, 0], collection="newer")] == ["newer-0"]
+
+
+def test_drop_waits_for_a_running_search(tmp_path):
+    connector = _connector(tmp_path)
+    connector.add_documents("doc", [_chunk("a", [1, 0])], collection="session")
+    target = connector.collection("session")
+    searching, dropped = threading.Event(), threading.Event()
+    original_refresh = target.refresh
+
+    def slow_refresh():
+        searching.set()
+        assert not dropped.wait(0.2)  # the drop waits for this search to finish
+        original_refresh()
+
+    target.refresh = slow_refresh
+    results = []
+    search = threading.Thread(target=lambda: results.append(connector.search([1, 0], collection="session")))
+    search.start()
+    searching.wait(5)
+    assert connector.drop_collection("session")
+    dropped.set()
+    search.join(5)
+
+    assert [r["chunk_id"] for r in results[0]] == ["a"]
+    assert not os.path.exists(target.store.db_dir)
+    with pytest.raises(ValueError):
+        connector.search([1, 0], collection="session")
+    assert not connector.add_documents("doc", [_chunk("b", [1, 0])], collection="session")
+
+
+def test_search_reopens_a_collection_deleted_by_another_process(tmp_path):
+    connector = _connector(tmp_path)
+    connector.add_documents("doc", [_chunk("a", [1, 0])], collection="shared")
+    other = _connector(tmp_path)
+    assert other.drop_collection("shared")
+
+    assert connector.search([1, 0], collection="shared") == []
+
+
+def test_metadata_filters_restrict_the_search(tmp_path):
+    connector = _connector(tmp_path)
+    connector.add_documents("doc-a", [_chunk("a", [1, 0], "https://example.com/a")])
+    connector.add_documents("doc-b", [_chunk("b", [1, 0.1], "https://example.com/b")])
+
+    assert [r["chunk_id"] for r in connector.search([1, 0])] == ["a", "b"]
+    assert [r["chunk_id"] for r in connector.search([1, 0], filters={"source_url": "https://example.com/b"})] == ["b"]
+    assert [r["chunk_id"] for r in connector.search([1, 0], filters={"document_id": ["doc-a"]})] == ["a"]
+    assert connector.search([1, 0], filters={"source_url": "https://example.com/none"}) == []
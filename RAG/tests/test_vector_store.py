@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from vector_store import MemmapVectorStore
+
+
+def _item(chunk_id, values, text=None):
+    return (chunk_id, list(values), text or f"text of {chunk_id}", {"source_url": "https://example.com"})
+
+
+def _live(store):
+    rows = np.flatnonzero(store.live_mask()).tolist()
+    return {store.row_chunk_id(row): record for row, record in zip(rows, store.get_records(rows))}
+
+
+def test_append_delete_round_trip(tmp_path):
+    store = MemmapVectorStore(str(tmp_path))
+    store.append([_item("a", [3, 4]), _item("b", [0, 2]), _item("c", [1, 0])])
+    store.append([_item("b", [2, 0], "new text of b")])  # supersedes the first "b"
+    assert store.delete(["c", "missing"]) == 1
+
+    assert len(store) == 2 and store.row_count == 4 and store.dead_row_count == 2
+    assert set(_live(store)) == {"a", "b"}
+    np.testing.assert_allclose(store.get_embeddings(["a", "b"]), [[0.6, 0.8], [1.0, 0.0]], rtol=1e-6)
+
+    reopened = MemmapVectorStore(str(tmp_path))
+    assert set(_live(reopened)) == {"a", "b"} and reopened.row_count == 4
+
+
+@pytest.mark.parametrize("embedding", [[1.0, 0.0, 0.0], [], None])
+def test_append_rejects_embeddings_of_the_wrong_dimension(tmp_path, embedding):
+    store = MemmapVectorStore(str(tmp_path))
+    store.append([_item("a", [1, 0])])
+    with pytest.raises(ValueError):
+        store.append([_item("b", [0, 1]), ("c", embedding, "text", {})])
+    assert store.row_count == 1 and "b" not in store
+
+
+def test_compact_drops_dead_rows(tmp_path):
+    store = MemmapVectorStore(str(tmp_path))
+    store.append([_item("a", [3, 4]), _item("b", [0, 2]), _item("c", [1, 0])])
+    store.append([_item("b", [2, 0], "new text of b")])
+    store.delete(["c"])
+
+
+    stats = store.compact()
+    assert stats == {"generation": 1, "rows_before": 4, "rows_after": 2}
+    assert store.generation == 1 and store.row_count == 2 and store.dead_row_count == 0
+    live = _live(store)
+    assert set(live) == {"a", "b"}
+    assert live["b"]["text"] == "new text of b"
+    np.testing.assert_allclose(store.get_embeddings(["a", "b"]), [[0.6, 0.8], [1.0, 0.0]], rtol=1e-6)
+
+    reopened = MemmapVectorStore(str(tmp_path))
+    assert reopened.generation == 1 and set(_live(reopened)) == {"a", "b"}
+    reopened.append([_item("d", [0, 1])])
+    assert set(_live(reopened)) == {"a", "b", "d"}
+
+
+def test_refresh_sees_other_writers(tmp_path):
+    writer, reader = MemmapVectorStore(str(tmp_path)), MemmapVectorStore(str(tmp_path))
+    writer.append([_item("a", [1, 0]), _item("b", [0, 1])])
+    writer.delete(["a"])
+    writer.compact()
+    assert reader.is_stale()
+    reader.refresh()
+    assert reader.generation == 1 and set(_live(reader)) == {"b"}
@@ -1,82 +1,400 @@
-import json
-import math
+import hashlib
+import logging
 import os
-from typing import List, Dict, Any
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple
+
+import numpy as np
 
 from agents import ChunkingEmbeddingAgent
+from ann_index import IVFIndex
+from lexical_index import BM25Index
+from metadata_index import MetadataIndex
+from quantized_index import QuantizedIndex
+from search_engine import ExactSearchEngine, reciprocal_rank_fusion
+from vector_store import MemmapVectorStore, ReadWriteLock, migrate_json_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = "default"
+
+
+class VectorCollection:
+    """
+    One collection of a VectorDatabaseConnector: its own vector store with the vector
+    index, the BM25 index and the metadata index built over it.
+
+    Several processes may open the same collection: `refresh` brings this process's
+    view up to date with what the others committed, and is cheap when nothing changed.
+    Searches hold the store's `state_lock` for reading, and every change to the store
+    and its indexes holds it for writing, so a search sees one consistent state even
+    while the collection is compacted.
+
+    Every operation of the connector holds `lifecycle` for reading; dropping the
+    collection holds it for writing and marks it `closed`, so its files are never
+    deleted under an operation, and an operation that starts later sees it closed.
+    """
+    def __init__(self, name: str, db_dir: str, index: str = "exact", nprobe: int = 8,
+                 rescore_factor: int = 4, pq_subspaces: Optional[int] = None):
+        self.name = name
+        self.store = MemmapVectorStore(db_dir)
+        if index == "ivf":
+            self.search_engine = IVFIndex(self.store, nprobe=nprobe)
+        elif index in QuantizedIndex.ENCODINGS:
+            self.search_engine = QuantizedIndex(self.store, encoding=index, rescore_factor=rescore_factor,
+                                                pq_subspaces=pq_subspaces)
+        else:
+            self.search_engine = ExactSearchEngine(self.store)
+        self.lexical_index = BM25Index(self.store)
+        self.metadata_index = MetadataIndex(self.store)
+        self.write_lock = threading.Lock()
+        self.lifecycle = ReadWriteLock()
+        self.closed = False
+        self._indexed = (self.store.generation, self.store.row_count)
+
+    def update(self):
+        """Brings every index up to date after rows are appended to the store, or after it is compacted."""
+        with self.store.locked(), self.store.state_lock.writing():
+            self.store.refresh()
+            self._update_indexes()
+
+    def _update_indexes(self):
+        self.search_engine.update()
+        self.lexical_index.update()
+        self.metadata_index.update()
+        self._indexed = (self.store.generation, self.store.row_count)
+
+    def refresh(self):
+        """Picks up the rows, deletions and compactions other processes committed to the store."""
+        if self.store.is_stale() or (self.store.generation, self.store.row_count) != self._indexed:
+            self.update()
+
+    def reading(self):
+        """Holds off changes to the store and its indexes while a search uses row numbers."""
+        return self.store.state_lock.reading()
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Compacts the store (see `MemmapVectorStore.compact`) and rebuilds the indexes over
+        it; searches only wait for the switch to the new generation and the rebuild.
+        """
+        with self.write_lock, self.store.locked():
+            return self.store.compact(on_switch=self._update_indexes)
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """The live rows matching `filters`, or None (all live rows) without filters."""
+        return self.metadata_index.mask(filters) if filters else None
+
 
 class VectorDatabaseConnector:
     """
     Connects to and interacts with a vector database.
     It provides methods for adding documents (embeddings) and performing semantic searches.
-    This version uses a JSON file for persistent storage and cosine similarity for search.
+    This version stores embeddings in a memory-mapped float32 matrix (see `MemmapVectorStore`)
+    and uses vectorized cosine similarity (see `ExactSearchEngine`) for search. A legacy `vector_db.json` is migrated on first use.
+    A BM25 inverted index over the chunk text (see `BM25Index`) is kept alongside the vectors,
+    for keyword search and for hybrid search that fuses both rankings.
+
+    Chunks are partitioned into named collections, each a separate store with its own
+    indexes (see `VectorCollection`), so a search only scores the chunks of one
+    collection. The "default" collection lives directly in `db_path` (where stores
+    created before collections existed are found); the others live in
+    `db_path/collections/`. Searches can also be restricted by metadata
+    (`source_url`, `document_id` or `title`); the filter is applied to the rows before
+    they are scored (see `MetadataIndex`).
+
+    At most `max_collections` collections besides the default one are kept: opening
+    another one evicts the least recently used, deleting its files (a later use creates
+    it again, empty) and calling `on_evict` with its name. Collections left on disk by
+    an earlier run count too, oldest first.
+
+    The database can be shared by several processes (e.g. uvicorn workers): writes are
+    serialized by the store's file lock, and every search first picks up what other
+    processes committed. Deleted and superseded rows are reclaimed by `compact`.
     """
-    def __init__(self, db_file_path: str = "vector_db.json"):
-        self.db_file_path = db_file_path
-        if not os.path.exists(self.db_file_path):
-            with open(self.db_file_path, 'w', encoding='utf-8') as f:
-                json.dump({}, f)
-
-    def _load_db(self) -> Dict[str, Dict[str, Any]]:
-        """Loads the entire database from the JSON file."""
-        try:
-            with open(self.db_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-        except FileNotFoundError:
-            return {}
-
-    def _save_db(self, db_data: Dict[str, Dict[str, Any]]):
-        """Saves the entire database to the JSON file."""
-        try:
-            with open(self.db_file_path, 'w', encoding='utf-8') as f:
-                json.dump(db_data, f, indent=4)
-        except Exception as e:
-            pass
+    def __init__(self, db_path: str = "vector_db", legacy_json_path: str = "vector_db.json",
+                 index: str = "exact", nprobe: int = 8, rescore_factor: int = 4,
+                 pq_subspaces: Optional[int] = None,
+                 embedding_agent: Optional[ChunkingEmbeddingAgent] = None,
+                 max_collections: int = 64, on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            db_path (str): Directory of the vector store.
+            legacy_json_path (str): A `vector_db.json` to migrate from, if present.
+            index (str): "exact" for brute-force search, "ivf" for the approximate
+                         IVF index (see `IVFIndex`), which pays off past ~100k chunks, or
+                         "int8" / "pq" to search compressed vectors held in memory and
+                         re-score a shortlist exactly (see `QuantizedIndex`).
+            nprobe (int): Number of IVF lists probed per query when `index` is "ivf".
+            rescore_factor (int): With "int8" or "pq", rows re-scored per result requested.
+            pq_subspaces (Optional[int]): With "pq", bytes per vector; one per 8 dimensions by default.
+            embedding_agent (Optional[ChunkingEmbeddingAgent]): Embeds raw-text queries; pass the
+                                                                ingestion agent to share its embedding cache.
+            max_collections (int): The most collections kept besides the default one.
+            on_evict (Optional[Callable[[str], None]]): Called with the name of each evicted
+                                                        collection, e.g. to forget what was
+                                                        ingested into it.
+        """
+        self.db_path = db_path
+        self.index = index
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        self.pq_subspaces = pq_subspaces
+        self.embedding_agent = embedding_agent or ChunkingEmbeddingAgent()
+        self.max_collections = max(1, max_collections)
+        self.on_evict = on_evict
+        self._collections: Dict[str, VectorCollection] = {}
+        self._collections_lock = threading.Lock()
+        self._dropped: Set[str] = set()
+        # Directories of the collections other than the default one, least recently used
+        # first, with the collection's name (None for one left on disk whose name is unknown).
+        self._recent: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        collections_dir = os.path.join(self.db_path, "collections")
+        if os.path.isdir(collections_dir):
+            directories = sorted(os.scandir(collections_dir), key=lambda entry: entry.stat().st_mtime)
+            for entry in directories:
+                if entry.is_dir():
+                    known = self._collection_dir(entry.name) == entry.path
+                    self._recent[entry.path] = entry.name if known else None
+        default = self.collection(DEFAULT_COLLECTION)
+        if len(default.store) == 0 and os.path.exists(legacy_json_path):
+            migrate_json_db(legacy_json_path, default.store)
+            default.update()
+
+    @property
+    def store(self) -> MemmapVectorStore:
+        """The store of the default collection."""
+        return self.collection(DEFAULT_COLLECTION).store
+
+    @property
+    def search_engine(self) -> Any:
+        """The vector index of the default collection."""
+        return self.collection(DEFAULT_COLLECTION).search_engine
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        """The BM25 index of the default collection."""
+        return self.collection(DEFAULT_COLLECTION).lexical_index
+
+    def _collection_dir(self, name: str) -> str:
+        if name == DEFAULT_COLLECTION:
+            return self.db_path
+        directory = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        if directory != name or directory.startswith("."):
+            directory = f"{directory.lstrip('.')[:64]}-{hashlib.blake2b(name.encode('utf-8'), digest_size=6).hexdigest()}"
+        return os.path.join(self.db_path, "collections", directory)
+
+    def collection(self, name: Optional[str] = None, reopen: bool = False) -> VectorCollection:
+        """
+        Returns a collection, opening it (and creating it if new) on first use. Opening
+        one may evict the least recently used collection.
+
+        A collection dropped by `drop_collection` is not recreated, so a late write from
+        a cancelled request cannot bring its files back; pass `reopen` to create it anew.
+
+        Raises:
+            ValueError: If the collection was dropped and `reopen` is False.
+        """
+        name = name or DEFAULT_COLLECTION
+        evicted: List[Tuple[str, Optional[str], Optional[VectorCollection]]] = []
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if name in self._dropped and not reopen:
+                    raise ValueError(f"collection {name!r} was dropped")
+                self._dropped.discard(name)
+                collection = self._collections[name] = VectorCollection(
+                    name, self._collection_dir(name), self.index, self.nprobe,
+                    self.rescore_factor, self.pq_subspaces)
+            if name != DEFAULT_COLLECTION:
+                directory = self._collection_dir(name)
+                self._recent[directory] = name
+                self._recent.move_to_end(directory)
+                while len(self._recent) > self.max_collections:
+                    victim_directory, victim = self._recent.popitem(last=False)
+                    victim_collection = self._collections.pop(victim, None) if victim is not None else None
+                    evicted.append((victim_directory, victim, victim_collection))
+        for victim_directory, victim, victim_collection in evicted:
+            self._delete_files(victim_directory, victim_collection)
+            if victim is not None and self.on_evict is not None:
+                self.on_evict(victim)
+        return collection
+
+    @staticmethod
+    def _delete_files(directory: str, collection: Optional[VectorCollection]):
+        """Closes a collection, once no operation uses it any more, and deletes its directory."""
+        if collection is None:
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+        with collection.lifecycle.writing():
+            collection.closed = True
+            shutil.rmtree(directory, ignore_errors=True)
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
+    @contextmanager
+    def _using(self, name: Optional[str]) -> Iterator[VectorCollection]:
         """
-        Calculates the cosine similarity between two vectors.
-        Cosine similarity is a measure of similarity between two non-zero vectors
-        of an inner product space that measures the cosine of the angle between them.
+        Holds a collection open for one operation. A collection closed meanwhile, or whose
+        files another process deleted, is opened again (unless it was dropped).
         """
-        dot_product = sum(v1 * v2 for v1, v2 in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(v1**2 for v1 in vec1))
-        magnitude2 = math.sqrt(sum(v2**2 for v2 in vec2))
+        name = name or DEFAULT_COLLECTION
+        while True:
+            target = self.collection(name)
+            with target.lifecycle.reading():
+                if not target.closed and os.path.isdir(target.store.db_dir):
+                    yield target
+                    return
+            with self._collections_lock:
+                target.closed = True
+                if self._collections.get(name) is target:
+                    del self._collections[name]
 
-        if not magnitude1 or not magnitude2:
-            return 0.0
-        return dot_product / (magnitude1 * magnitude2)
+    def drop_collection(self, name: str) -> bool:
+        """
+        Deletes a collection and its files, once the operations using it have finished.
+        The default collection cannot be dropped, and a dropped one is only created again
+        through `collection(name, reopen=True)`.
+
+        Returns:
+            bool: True if the collection existed and was deleted.
+        """
+        if name == DEFAULT_COLLECTION:
+            raise ValueError("the default collection cannot be dropped")
+        directory = self._collection_dir(name)
+        with self._collections_lock:
+            collection = self._collections.pop(name, None)
+            self._recent.pop(directory, None)
+            self._dropped.add(name)
+        if collection is None and not os.path.isdir(directory):
+            return False
+        self._delete_files(directory, collection)
+        return True
+
+    def document_frequencies(self, collection: Optional[str] = None) -> Dict[str, int]:
+        """
+        Document frequencies of every term in a collection (see
+        `BM25Index.document_frequencies`). Building them walks the collection's postings,
+        so call this off the event loop when `vocabulary_version` has changed.
+        """
+        with self._using(collection) as target:
+            return target.lexical_index.document_frequencies()
+
+    def vocabulary_version(self, collection: Optional[str] = None) -> Tuple[int, int]:
+        """
+        A cheap key of a collection's vocabulary: its store generation and indexed row
+        count, or (-1, -1) if it is not open. It never opens a collection, so it can be
+        called on the event loop.
+        """
+        target = self._collections.get(collection or DEFAULT_COLLECTION)
+        if target is None or target.closed:
+            return -1, -1
+        return target.store.generation, target.lexical_index.row_count
 
-    def add_documents(self, document_id: str, chunks_with_embeddings: List[Dict[str, Any]]) -> bool:
+    def add_documents(self, document_id: str, chunks_with_embeddings: List[Dict[str, Any]],
+                      collection: Optional[str] = None) -> bool:
         """
         Adds multiple document chunks and their embeddings to the vector database.
-        Stores the data in the JSON file.
+        Rows are appended to the store; existing data is never rewritten.
 
         Args:
             document_id (str): The ID of the original document.
             chunks_with_embeddings (List[Dict[str, Any]]): A list of dictionaries,
                                                            each containing 'chunk_id', 'text', 'embedding' (List[float]), and 'metadata'.
+            collection (Optional[str]): The collection to add to; defaults to "default".
 
         Returns:
             bool: True if documents were added successfully, False otherwise.
         """
         try:
-            db_data = self._load_db()
-            for chunk_info in chunks_with_embeddings:
-                chunk_id = chunk_info['chunk_id']
-                db_data[chunk_id] = {
-                    "text": chunk_info["text"],
-                    "embedding": chunk_info["embedding"],
-                    "metadata": {**chunk_info["metadata"], "document_id": document_id}
-                }
-            self._save_db(db_data)
+            items = [
+                (chunk_info["chunk_id"], chunk_info["embedding"], chunk_info["text"],
+                 {**chunk_info["metadata"], "document_id": document_id})
+                for chunk_info in chunks_with_embeddings
+            ]
+            with self._using(collection) as target:
+                with target.write_lock, target.store.locked(), target.store.state_lock.writing():
+                    target.store.append(items)
+                    target.update()
+            return True
+        except Exception:
+            logger.exception("Adding chunks of %s to collection %s failed", document_id, collection or DEFAULT_COLLECTION)
+            return False
+
+    def delete_chunks(self, chunk_ids: List[str], collection: Optional[str] = None) -> bool:
+        """
+        Removes chunks from the vector database.
+
+        Args:
+            chunk_ids (List[str]): The IDs of the chunks to remove.
+            collection (Optional[str]): The collection holding them; defaults to "default".
+
+        Returns:
+            bool: True if the chunks were removed successfully, False otherwise.
+        """
+        try:
+            with self._using(collection) as target, target.write_lock:
+                target.store.delete(chunk_ids)
             return True
-        except Exception as e:
+        except Exception:
+            logger.exception("Deleting chunks from collection %s failed", collection or DEFAULT_COLLECTION)
             return False
 
-    def search(self, query_embedding_or_text: Any, top_k: int = 5) -> List[Dict[str, Any]]:
+    def has_chunks(self, chunk_ids: List[str], collection: Optional[str] = None) -> bool:
+        """Returns True if every given chunk is currently stored in the collection."""
+        with self._using(collection) as target:
+            target.refresh()
+            with target.reading():
+                return all(chunk_id in target.store for chunk_id in chunk_ids)
+
+    def get_embeddings(self, chunk_ids: List[str], collection: Optional[str] = None) -> np.ndarray:
+        """Returns the stored (unit-norm) embeddings of chunks, one row each; unknown chunks get zeros."""
+        with self._using(collection) as target, target.reading():
+            return target.store.get_embeddings(chunk_ids)
+
+    def compact(self, collection: Optional[str] = None) -> Dict[str, int]:
+        """
+        Rewrites a collection's store without its deleted and superseded rows and rebuilds
+        its indexes. Writers wait for the compaction; searches only wait for the switch
+        to the new generation.
+
+        Args:
+            collection (Optional[str]): The collection to compact; defaults to "default".
+
+        Returns:
+            Dict[str, int]: The store's new 'generation' and its physical rows before and after.
+        """
+        with self._using(collection) as target:
+            return target.compact()
+
+    def maybe_compact(self, collection: Optional[str] = None, min_dead_fraction: float = 0.3,
+                      min_dead_rows: int = 1000) -> Optional[Dict[str, int]]:
+        """
+        Compacts a collection once at least `min_dead_rows` of its rows, and at least
+        `min_dead_fraction` of them, are deleted or superseded.
+
+        Returns:
+            Optional[Dict[str, int]]: The result of `compact`, or None if it was not needed.
+        """
+        with self._using(collection) as target:
+            target.refresh()
+            dead_rows = target.store.dead_row_count
+            if dead_rows < min_dead_rows or dead_rows < min_dead_fraction * target.store.row_count:
+                return None
+            return target.compact()
+
+    def _resolve_query_embedding(self, query_embedding_or_text: Any) -> List[float]:
+        """Returns the query embedding, embedding the query first if it is raw text."""
+        if isinstance(query_embedding_or_text, (list, np.ndarray)) and all(isinstance(x, (float, int, np.floating)) for x in query_embedding_or_text):
+            return [float(x) for x in query_embedding_or_text]
+        elif isinstance(query_embedding_or_text, str):
+            return self.embedding_agent._generate_embedding(query_embedding_or_text)
+        return []
+
+    def search(self, query_embedding_or_text: Any, top_k: int = 5, collection: Optional[str] = None,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Performs a semantic search in the vector database to find the most relevant chunks
         using cosine similarity.
@@ -84,46 +402,115 @@ class VectorDatabaseConnector:
         Args:
             query_embedding_or_text (Any): The query (either raw text or its pre-generated embedding).
             top_k (int): The number of top relevant chunks to retrieve.
+            collection (Optional[str]): The collection to search; defaults to "default".
+            filters (Optional[Dict[str, Any]]): Metadata field -> value (or list of values)
+                                                that every result must match.
 
         Returns:
             List[Dict[str, Any]]: A list of dictionaries, each representing a retrieved chunk
                                   with its text, metadata, and score.
         """
-        retrieved_chunks = []
-        db_data = self._load_db()
+        return self.search_batch([query_embedding_or_text], top_k=top_k, collection=collection, filters=filters)[0]
 
-        if not db_data:
-            return []
+    def search_batch(self, queries: List[Any], top_k: int = 5, collection: Optional[str] = None,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Searches for several queries at once. All queries are scored against the
+        collection (or the rows of it matching `filters`) with a single matrix product.
 
-        query_embedding = None
-        if isinstance(query_embedding_or_text, list) and all(isinstance(x, (float, int)) for x in query_embedding_or_text):
-            query_embedding = [float(x) for x in query_embedding_or_text]
-        elif isinstance(query_embedding_or_text, str):
-            temp_chunk_embedder = ChunkingEmbeddingAgent()
-            query_embedding = temp_chunk_embedder._generate_embedding(query_embedding_or_text)
-        else:
-            return []
-
-        if not query_embedding:
-            return []
-
-        scores = []
-        for chunk_id, chunk_data in db_data.items():
-            db_embedding = chunk_data["embedding"]
-            if len(query_embedding) != len(db_embedding):
-                continue
-            similarity = self._cosine_similarity(query_embedding, db_embedding)
-            scores.append((similarity, chunk_id, chunk_data))
-
-        scores.sort(key=lambda x: x[0], reverse=True)
-
-        for i in range(min(top_k, len(scores))):
-            similarity, chunk_id, chunk_data = scores[i]
-            retrieved_chunks.append({
-                "chunk_id": chunk_id,
-                "text": chunk_data["text"],
-                "metadata": chunk_data["metadata"],
-                "score": similarity
-            })
-
-        return retrieved_chunks
\ No newline at end of file
+        Args:
+            queries (List[Any]): Queries, each either raw text or a pre-generated embedding.
+            top_k (int): The number of top relevant chunks to retrieve per query.
+            collection (Optional[str]): The collection to search; defaults to "default".
+            filters (Optional[Dict[str, Any]]): Metadata filters, as for `search`.
+
+        Returns:
+            List[List[Dict[str, Any]]]: One result list per query, in the same order as `queries`.
+        """
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        embeddings = [self._resolve_query_embedding(query) for query in queries]
+        with self._using(collection) as target:
+            target.refresh()
+            if len(target.store) == 0:
+                return results
+            with target.reading():
+                return self._search_embeddings(target, embeddings, top_k, filters, results)
+
+    def _search_embeddings(self, target: VectorCollection, embeddings: List[List[float]], top_k: int,
+                           filters: Optional[Dict[str, Any]],
+                           results: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Searches a collection, already held for reading, with the given query embeddings."""
+        valid_positions = [i for i, embedding in enumerate(embeddings)
+                           if embedding and len(embedding) == target.store.dim and any(embedding)]
+        if not valid_positions:
+            return results
+
+        query_matrix = np.asarray([embeddings[i] for i in valid_positions], dtype=np.float32)
+        hits_per_query = target.search_engine.search(query_matrix, top_k=top_k, mask=target.mask(filters))
+        for position, hits in zip(valid_positions, hits_per_query):
+            results[position] = self._hits_to_results(target, hits)
+        return results
+
+    @staticmethod
+    def _hits_to_results(target: VectorCollection, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        records = target.store.get_records([row for row, _ in hits])
+        return [
+            {
+                "chunk_id": record["chunk_id"],
+                "text": record["text"],
+                "metadata": record["metadata"],
+                "score": score
+            }
+            for (_, score), record in zip(hits, records)
+        ]
+
+    def lexical_search_batch(self, queries: List[str], top_k: int = 5, collection: Optional[str] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Keyword search with BM25. No embeddings are computed, so this is cheap enough to
+        run for every expansion of a query.
+
+        Args:
+            queries (List[str]): The query texts.
+            top_k (int): The number of top matching chunks to retrieve per query.
+            collection (Optional[str]): The collection to search; defaults to "default".
+            filters (Optional[Dict[str, Any]]): Metadata filters, as for `search`.
+
+        Returns:
+            List[List[Dict[str, Any]]]: One result list per query, scored by BM25; chunks
+                                        sharing no term with the query are not returned.
+        """
+        with self._using(collection) as target:
+            target.refresh()
+            if len(target.store) == 0:
+                return [[] for _ in queries]
+            with target.reading():
+                return [self._hits_to_results(target, hits)
+                        for hits in target.lexical_index.search(queries, top_k=top_k, mask=target.mask(filters))]
+
+    def hybrid_search(self, query_text: str, query_embedding: Optional[List[float]] = None, top_k: int = 5,
+                      expanded_terms: Optional[List[str]] = None, candidates: int = 50,
+                      collection: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Combines semantic and keyword search: the `candidates` best chunks by cosine
+        similarity and by BM25 for `query_text` (and, if given, BM25 for the expansion
+        terms as one extra keyword query) are fused with reciprocal rank fusion.
+
+        Args:
+            query_text (str): The query.
+            query_embedding (Optional[List[float]]): The query's embedding; computed if omitted.
+            top_k (int): The number of fused results to return.
+            expanded_terms (Optional[List[str]]): Expansion terms, searched lexically only.
+            candidates (int): How many results of each ranking take part in the fusion.
+            collection (Optional[str]): The collection to search; defaults to "default".
+            filters (Optional[Dict[str, Any]]): Metadata filters, as for `search`.
+
+        Returns:
+            List[Dict[str, Any]]: The best chunks, with their fused 'score'.
+        """
+        vector_results = self.search(query_embedding if query_embedding is not None else query_text, top_k=candidates,
+                                     collection=collection, filters=filters)
+        lexical_queries = [query_text] + ([" ".join(expanded_terms)] if expanded_terms else [])
+        return reciprocal_rank_fusion([vector_results] + self.lexical_search_batch(lexical_queries, top_k=candidates,
+                                                                                   collection=collection, filters=filters),
+                                      top_k=top_k)
@@ -0,0 +1,601 @@
+import json
+import os
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scales each row to unit L2 norm; all-zero rows are left as zeros."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class GrowableArray:
+    """
+    An array grown by appending rows. Its buffer doubles in capacity when it fills up,
+    so appends cost amortised O(1) per row instead of copying the whole array each time.
+    `view` is the filled part; a view taken earlier stays valid after later appends.
+    """
+    def __init__(self, dtype: Any, row_shape: Tuple[int, ...] = (), values: Optional[np.ndarray] = None):
+        self._buffer = np.empty((0,) + tuple(row_shape), dtype=dtype)
+        self._size = 0
+        if values is not None:
+            self.extend(values)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._buffer[:self._size]
+
+    def extend(self, values: np.ndarray):
+        values = np.asarray(values, dtype=self._buffer.dtype)
+        end = self._size + values.shape[0]
+        if end > self._buffer.shape[0]:
+            grown = np.empty((max(end, 2 * self._buffer.shape[0], 16),) + self._buffer.shape[1:],
+                             dtype=self._buffer.dtype)
+            grown[:self._size] = self.view
+            self._buffer = grown
+        self._buffer[self._size:end] = values
+        self._size = end
+
+
+class ReadWriteLock:
+    """
+    A lock held shared by readers and exclusively by one writer. Waiting writers go
+    before new readers. The writing thread may take the lock again, to read or write.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._writer_depth += 1
+                shared = False
+            else:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+                shared = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                if shared:
+                    self._readers -= 1
+                else:
+                    self._writer_depth -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._writer = None
+                self._condition.notify_all()
+
+
+class MemmapVectorStore:
+    """
+    A binary, append-only vector store backed by a directory of flat files.
+
+    Embeddings live in a contiguous float32 matrix file (`embeddings.f32`) which is
+    opened with `numpy.memmap`, so a search only pages in the rows it touches.
+    Rows are L2-normalized on write, so a dot product with a unit query is the
+    cosine similarity.
+    Chunk text and metadata live in a JSON-lines sidecar (`records.jsonl`) with a
+    fixed-width offset index (`records.idx`), so fetching the top-k results reads
+    exactly k records instead of the whole database.
+
+    Deleting a chunk appends its row number to `tombstones.i64`; deleted rows stay on disk
+    but are excluded from `live_mask` until `compact` drops them.
+
+    The data files form a log: appends only ever write past the end of each file.
+    `meta.json` is the manifest: it holds the committed row count and byte sizes and
+    is replaced atomically after the data files are written, so a crash mid-append
+    leaves the previous state intact and the next writer truncates the torn tail.
+
+    Several processes (e.g. uvicorn workers) can share a store. Writers serialize on
+    an exclusive `fcntl` lock on `store.lock` (where `fcntl` is unavailable, only
+    threads of one process are serialized), and re-read the manifest before
+    appending, so no writer overwrites rows committed by another. Readers call
+    `refresh` to pick up rows and deletions committed by other processes.
+
+    `compact` rewrites the live rows into a new generation of data files (in
+    `gen-<n>/`; generation 0 is the directory itself) and switches the manifest to it
+    atomically. Row numbers change, so indexes over the store are rebuilt when they
+    see a new `generation`. The files of the previous generation are kept until the
+    next compaction, so readers in other processes that have not refreshed yet can
+    finish.
+
+    Within a process, threads that use row numbers across several calls (a search
+    followed by `get_records`) hold `state_lock.reading()` meanwhile. Every change to
+    the in-memory state (refresh, append, delete, the switch to a compacted
+    generation) holds `state_lock.writing()`, so a reader never mixes the rows, live
+    mask or records of two states.
+    """
+    META_FILE = "meta.json"
+    LOCK_FILE = "store.lock"
+    EMBEDDINGS_FILE = "embeddings.f32"
+    RECORDS_FILE = "records.jsonl"
+    INDEX_FILE = "records.idx"
+    IDS_FILE = "ids.txt"
+    TOMBSTONES_FILE = "tombstones.i64"
+    FORMAT_VERSION = 2
+
+    def __init__(self, db_dir: str = "vector_db"):
+        self.db_dir = db_dir
+        os.makedirs(self.db_dir, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self.state_lock = ReadWriteLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        self._meta_stat: Optional[Tuple[int, int, int]] = None
+        self._chunk_rows: Dict[str, int] = {}
+        self._row_ids: List[str] = []
+        self._matrix: Optional[np.memmap] = None
+        self._offsets: Optional[np.ndarray] = None
+        with self.locked():
+            self._meta = self._load_meta()
+            os.makedirs(self.data_dir, exist_ok=True)
+            self._repair_tails()
+            self._normalize_legacy_rows()
+            self._load_ids()
+
+    @property
+    def generation(self) -> int:
+        """The data file generation; it changes when the store is compacted."""
+        return self._meta.get("generation", 0)
+
+    @property
+    def data_dir(self) -> str:
+        """The directory of the current generation's data files; indexes keep their files here too."""
+        return self._generation_dir(self.generation)
+
+    def _generation_dir(self, generation: int) -> str:
+        return self.db_dir if generation == 0 else os.path.join(self.db_dir, f"gen-{generation}")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name)
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds the store's write lock: exclusive across the threads of this process and,
+        where `fcntl` is available, across processes. Re-entrant.
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(os.path.join(self.db_dir, self.LOCK_FILE), 'a+b')
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _stat_meta(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(os.path.join(self.db_dir, self.META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_meta(self) -> Dict[str, Any]:
+        """Loads the committed store metadata, or an empty layout for a new store."""
+        self._meta_stat = self._stat_meta()
+        try:
+            with open(os.path.join(self.db_dir, self.META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"format": self.FORMAT_VERSION, "normalized": True, "dim": None, "count": 0,
+                    "records_bytes": 0, "ids_bytes": 0, "tombstones": 0, "generation": 0}
+
+    def _save_meta(self):
+        """Atomically replaces `meta.json`; this is the commit point of an append."""
+        tmp_path = os.path.join(self.db_dir, self.META_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.db_dir, self.META_FILE))
+        self._meta_stat = self._stat_meta()
+
+    def is_stale(self) -> bool:
+        """True if another process committed changes that `refresh` would pick up."""
+        return self._stat_meta() != self._meta_stat
+
+    def refresh(self) -> bool:
+        """
+        Picks up appends, deletions and compactions committed by other processes since
+        the manifest was last read. Cheap when nothing changed (one `stat` call).
+
+        Returns:
+            bool: True if the store changed.
+        """
+        if not self.is_stale():
+            return False
+        with self._thread_lock, self.state_lock.writing():
+            previous = self._meta
+            self._meta = self._load_meta()
+            if self.generation != previous.get("generation", 0):
+                self._matrix, self._offsets = None, None
+                self._load_ids()
+                return True
+            with open(self._path(self.IDS_FILE), 'rb') as f:
+                f.seek(previous["ids_bytes"])
+                new_ids = f.read(self._meta["ids_bytes"] - previous["ids_bytes"]).decode('utf-8').splitlines()
+            first_row = len(self._row_ids)
+            self._row_ids.extend(new_ids)
+            for i, chunk_id in enumerate(new_ids):
+                self._chunk_rows[chunk_id] = first_row + i
+            known_tombstones = previous.get("tombstones", 0)
+            self._apply_tombstones(np.fromfile(self._path(self.TOMBSTONES_FILE), dtype=np.int64,
+                                               count=self._meta.get("tombstones", 0) - known_tombstones,
+                                               offset=known_tombstones * 8))
+            return True
+
+    def _repair_tails(self):
+        """Truncates any bytes written after the last committed append (e.g. after a crash)."""
+        dim = self._meta["dim"] or 0
+        expected_sizes = {
+            self.EMBEDDINGS_FILE: self._meta["count"] * dim * 4,
+            self.INDEX_FILE: self._meta["count"] * 8,
+            self.RECORDS_FILE: self._meta["records_bytes"],
+            self.IDS_FILE: self._meta["ids_bytes"],
+            self.TOMBSTONES_FILE: self._meta.get("tombstones", 0) * 8,
+        }
+        for name, size in expected_sizes.items():
+            path = self._path(name)
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            elif os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def _normalize_legacy_rows(self, block_rows: int = 65536):
+        """Normalizes, in place, the rows of a store written before rows were kept at unit norm."""
+        if self._meta.get("normalized"):
+            return
+        if self._meta["count"]:
+            matrix = np.memmap(self._path(self.EMBEDDINGS_FILE), dtype=np.float32, mode='r+',
+                               shape=(self._meta["count"], self._meta["dim"]))
+            for start in range(0, matrix.shape[0], block_rows):
+                matrix[start:start + block_rows] = normalize_rows(matrix[start:start + block_rows])
+            matrix.flush()
+            del matrix
+        self._meta.update({"format": self.FORMAT_VERSION, "normalized": True})
+        self._save_meta()
+
+    def _load_ids(self):
+        """
+        Loads the chunk_id -> live row mapping. Later rows supersede earlier rows with the
+        same id, and tombstoned rows are dropped. Only committed bytes are read.
+        """
+        with open(self._path(self.IDS_FILE), 'rb') as f:
+            self._row_ids = f.read(self._meta["ids_bytes"]).decode('utf-8').splitlines()
+        self._chunk_rows = {chunk_id: row for row, chunk_id in enumerate(self._row_ids)}
+        self._apply_tombstones(np.fromfile(self._path(self.TOMBSTONES_FILE), dtype=np.int64,
+                                           count=self._meta.get("tombstones", 0)))
+
+    def _apply_tombstones(self, tombstones: np.ndarray):
+        for row in tombstones.tolist():
+            chunk_id = self._row_ids[row]
+            if self._chunk_rows.get(chunk_id) == row:
+                del self._chunk_rows[chunk_id]
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._meta["dim"]
+
+    def __len__(self) -> int:
+        return len(self._chunk_rows)
+
+    @property
+    def row_count(self) -> int:
+        """Number of physical rows, including rows superseded by a later write."""
+        return self._meta["count"]
+
+    def matrix(self) -> np.ndarray:
+        """
+        Returns the unit-normalized embedding matrix as a read-only memory map of shape (row_count, dim).
+        The map is cached and only re-opened after the store grows.
+        """
+        count, dim = self._meta["count"], self._meta["dim"]
+        if not count:
+            return np.empty((0, dim or 0), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != count:
+            self._matrix = np.memmap(self._path(self.EMBEDDINGS_FILE), dtype=np.float32,
+                                     mode='r', shape=(count, dim))
+        return self._matrix
+
+    def _record_offsets(self) -> np.ndarray:
+        count = self._meta["count"]
+        if self._offsets is None or self._offsets.shape[0] != count:
+            self._offsets = np.fromfile(self._path(self.INDEX_FILE), dtype=np.uint64, count=count)
+        return self._offsets
+
+    def live_mask(self) -> np.ndarray:
+        """Boolean mask over physical rows marking the latest row for each chunk_id."""
+        mask = np.zeros(self._meta["count"], dtype=bool)
+        if self._chunk_rows:
+            mask[np.fromiter(self._chunk_rows.values(), dtype=np.int64)] = True
+        return mask
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._chunk_rows
+
+    def row_chunk_id(self, row: int) -> str:
+        return self._row_ids[row]
+
+    def get_embeddings(self, chunk_ids: List[str]) -> np.ndarray:
+        """The unit-norm embeddings of the given live chunks, one row each; unknown chunks get zeros."""
+        rows = np.asarray([self._chunk_rows.get(chunk_id, -1) for chunk_id in chunk_ids], dtype=np.int64)
+        embeddings = np.zeros((rows.shape[0], self.dim or 0), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            embeddings[known] = self.matrix()[rows[known]]
+        return embeddings
+
+    def get_records(self, rows: List[int]) -> List[Dict[str, Any]]:
+        """
+        Reads the text/metadata records for the given physical rows, in the given order.
+        Only the requested records are read from disk.
+        """
+        offsets = self._record_offsets()
+        end_of_records = self._meta["records_bytes"]
+        records = []
+        with open(self._path(self.RECORDS_FILE), 'rb') as f:
+            for row in rows:
+                start = int(offsets[row])
+                end = int(offsets[row + 1]) if row + 1 < len(offsets) else end_of_records
+                f.seek(start)
+                records.append(json.loads(f.read(end - start)))
+        return records
+
+    def append(self, items: List[Tuple[str, List[float], str, Dict[str, Any]]]) -> int:
+        """
+        Appends (chunk_id, embedding, text, metadata) items without rewriting existing data.
+        Embeddings are stored L2-normalized.
+        Re-adding an existing chunk_id appends a new row which supersedes the old one.
+        The first append fixes the store's embedding dimension.
+
+        Args:
+            items: The rows to append.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            ValueError: If an embedding is empty or its dimension differs from the
+                        store's (or, for a new store, from the first item's); nothing
+                        is written then.
+        """
+        if not items:
+            return 0
+        with self.locked():
+            self.refresh()
+            self._repair_tails()
+            return self._append(items)
+
+    def _append(self, items: List[Tuple[str, List[float], str, Dict[str, Any]]]) -> int:
+        dim = self._meta["dim"] or len(items[0][1] or ())
+        mismatched = sum(1 for item in items if item[1] is None or len(item[1]) != dim)
+        if not dim or mismatched:
+            raise ValueError(f"{mismatched or len(items)} of {len(items)} embeddings do not have "
+                             f"the store's dimension {dim}")
+
+        embeddings = normalize_rows([item[1] for item in items])
+        record_lines = [
+            (json.dumps({"chunk_id": chunk_id, "text": text, "metadata": metadata}) + "\n").encode('utf-8')
+            for chunk_id, _, text, metadata in items
+        ]
+        offsets = np.empty(len(record_lines), dtype=np.uint64)
+        position = self._meta["records_bytes"]
+        for i, line in enumerate(record_lines):
+            offsets[i] = position
+            position += len(line)
+        ids_blob = "".join(chunk_id + "\n" for chunk_id, _, _, _ in items).encode('utf-8')
+
+        self._write_durably(self.EMBEDDINGS_FILE, embeddings.tobytes())
+        self._write_durably(self.RECORDS_FILE, b"".join(record_lines))
+        self._write_durably(self.INDEX_FILE, offsets.tobytes())
+        self._write_durably(self.IDS_FILE, ids_blob)
+
+        with self.state_lock.writing():
+            first_row = self._meta["count"]
+            self._meta.update({
+                "dim": dim,
+                "count": first_row + len(items),
+                "records_bytes": position,
+                "ids_bytes": self._meta["ids_bytes"] + len(ids_blob),
+            })
+            self._save_meta()
+
+            for i, (chunk_id, _, _, _) in enumerate(items):
+                self._row_ids.append(chunk_id)
+                self._chunk_rows[chunk_id] = first_row + i
+        return len(items)
+
+    def delete(self, chunk_ids: List[str]) -> int:
+        """
+        Deletes chunks by appending their live rows to the tombstone file.
+
+        Args:
+            chunk_ids (List[str]): The chunks to delete; unknown ids are ignored.
+
+        Returns:
+            int: The number of chunks deleted.
+        """
+        with self.locked():
+            self.refresh()
+            self._repair_tails()
+            return self._delete(chunk_ids)
+
+    def _delete(self, chunk_ids: List[str]) -> int:
+        rows = [self._chunk_rows[chunk_id] for chunk_id in dict.fromkeys(chunk_ids) if chunk_id in self._chunk_rows]
+        if not rows:
+            return 0
+        self._write_durably(self.TOMBSTONES_FILE, np.asarray(rows, dtype=np.int64).tobytes())
+        with self.state_lock.writing():
+            self._meta["tombstones"] = self._meta.get("tombstones", 0) + len(rows)
+            self._save_meta()
+            for row in rows:
+                del self._chunk_rows[self._row_ids[row]]
+        return len(rows)
+
+    def _write_durably(self, name: str, data: bytes, directory: Optional[str] = None):
+        """Appends to a data file and flushes it to disk, so the manifest never commits unsynced rows."""
+        with open(os.path.join(directory or self.data_dir, name), 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def dead_row_count(self) -> int:
+        """Physical rows that are deleted or superseded, i.e. what `compact` would reclaim."""
+        return self.row_count - len(self._chunk_rows)
+
+    def compact(self, block_rows: int = 65536, on_switch: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+        """
+        Rewrites the live rows, in row order, into a new generation of data files and
+        switches the manifest to it, dropping deleted and superseded rows. Appends and
+        deletes from every process wait for the compaction to finish; readers only wait
+        for the switch.
+
+        Args:
+            block_rows (int): Rows copied at a time.
+            on_switch (Optional[Callable[[], None]]): Called right after the switch while
+                                                      readers are still held off, e.g. to
+                                                      move indexes to the new generation.
+
+        Returns:
+            Dict[str, int]: The 'generation' and the physical rows before and after.
+        """
+        with self.locked():
+            self.refresh()
+            self._repair_tails()
+            rows_before = self.row_count
+            if self.dead_row_count == 0:
+                return {"generation": self.generation, "rows_before": rows_before, "rows_after": rows_before}
+
+            old_generation = self.generation
+            new_dir = self._generation_dir(old_generation + 1)
+            shutil.rmtree(new_dir, ignore_errors=True)  # left over from an interrupted compaction
+            os.makedirs(new_dir)
+            for name in (self.EMBEDDINGS_FILE, self.RECORDS_FILE, self.INDEX_FILE, self.IDS_FILE, self.TOMBSTONES_FILE):
+                open(os.path.join(new_dir, name), 'wb').close()
+
+            live_rows = np.sort(np.fromiter(self._chunk_rows.values(), dtype=np.int64, count=len(self._chunk_rows)))
+            matrix = self.matrix()
+            offsets = self._record_offsets()
+            records_bytes = ids_bytes = 0
+            with open(self._path(self.RECORDS_FILE), 'rb') as records:
+                for start in range(0, live_rows.shape[0], block_rows):
+                    block = live_rows[start:start + block_rows]
+                    lines = []
+                    for row in block.tolist():
+                        end = int(offsets[row + 1]) if row + 1 < offsets.shape[0] else self._meta["records_bytes"]
+                        records.seek(int(offsets[row]))
+                        lines.append(records.read(end - int(offsets[row])))
+                    new_offsets = np.cumsum([records_bytes] + [len(line) for line in lines[:-1]], dtype=np.uint64)
+                    ids_blob = "".join(self._row_ids[row] + "\n" for row in block.tolist()).encode('utf-8')
+                    self._write_durably(self.EMBEDDINGS_FILE, np.ascontiguousarray(matrix[block]).tobytes(), new_dir)
+                    self._write_durably(self.RECORDS_FILE, b"".join(lines), new_dir)
+                    self._write_durably(self.INDEX_FILE, new_offsets.tobytes(), new_dir)
+                    self._write_durably(self.IDS_FILE, ids_blob, new_dir)
+                    records_bytes += sum(len(line) for line in lines)
+                    ids_bytes += len(ids_blob)
+
+            with self.state_lock.writing():
+                self._meta = {**self._meta, "generation": old_generation + 1, "count": int(live_rows.shape[0]),
+                              "records_bytes": records_bytes, "ids_bytes": ids_bytes, "tombstones": 0}
+                self._save_meta()
+                self._matrix, self._offsets = None, None
+                self._load_ids()
+                if on_switch is not None:
+                    on_switch()
+            # Readers that have not refreshed yet may still use the previous generation.
+            for generation in range(old_generation):
+                self._remove_generation(generation)
+            return {"generation": self.generation, "rows_before": rows_before, "rows_after": self.row_count}
+
+    def _remove_generation(self, generation: int):
+        directory = self._generation_dir(generation)
+        if generation > 0:
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+        # Generation 0 shares the store's directory with the manifest, the lock and
+        # any subdirectories (later generations, other collections).
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name not in (self.META_FILE, self.LOCK_FILE) and os.path.isfile(path):
+                os.remove(path)
+
+
+def migrate_json_db(json_path: str, store: MemmapVectorStore) -> int:
+    """
+    One-shot migration from the legacy `vector_db.json` format
+    ({chunk_id: {"text", "embedding", "metadata"}}) into a MemmapVectorStore.
+    The JSON file is renamed to `<json_path>.migrated` once its rows are committed.
+    Legacy databases may mix in placeholder embeddings written while the model was
+    unreachable; only rows with the most common embedding dimension are migrated.
+
+    Args:
+        json_path (str): Path to the legacy JSON database.
+        store (MemmapVectorStore): The destination store.
+
+    Returns:
+        int: The number of rows migrated.
+    """
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            legacy_data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+    items = [
+        (chunk_id, chunk_data["embedding"], chunk_data["text"], chunk_data.get("metadata", {}))
+        for chunk_id, chunk_data in legacy_data.items() if chunk_data.get("embedding")
+    ]
+    dims = Counter(len(item[1]) for item in items)
+    dim = store.dim or (dims.most_common(1)[0][0] if dims else 0)
+    migrated = store.append([item for item in items if len(item[1]) == dim])
+    os.replace(json_path, json_path + ".migrated")
+    return migrated